@@ -141,6 +141,18 @@ export const deviceService = {
   }
 };
 
+// ============= DASHBOARD =============
+export const dashboardService = {
+  // Dispositivos, status do selecionado, mensagens, última leitura RFID, servo
+  // e contadores de 24h em uma única requisição
+  get: async (raspberryId = null, messages = 50) => {
+    const params = { messages };
+    if (raspberryId !== null && raspberryId !== undefined) params.raspberry_id = raspberryId;
+    const response = await api.get('/api/dashboard', { params });
+    return response.data;
+  }
+};
+
 // ============= SERVIÇOS DE DADOS EM TEMPO REAL =============
 export const realtimeService = {
   // Buscar dados em tempo real
@@ -176,6 +188,35 @@ export const rfidService = {
   }
 };
 
+// ============= EVENTOS EM TEMPO REAL (SSE) =============
+export const eventService = {
+  // Abre o stream /api/events. O EventSource reconecta sozinho e retoma pelo
+  // Last-Event-ID; "reset" indica que o estado deve ser recarregado pela API.
+  // Retorna null se o navegador não suportar EventSource (usar polling).
+  subscribe: ({ topics = [], raspberryId = null, onEvent, onReset, onStatus } = {}) => {
+    if (typeof window === 'undefined' || !window.EventSource) return null;
+    const params = new URLSearchParams();
+    if (topics.length) params.set('topics', topics.join(','));
+    if (raspberryId !== null && raspberryId !== undefined) params.set('raspberry_id', raspberryId);
+    const source = new EventSource(`${getApiBaseURL()}/api/events?${params.toString()}`);
+    topics.forEach((topic) => {
+      source.addEventListener(topic, (event) => {
+        if (onEvent) onEvent(topic, JSON.parse(event.data));
+      });
+    });
+    source.addEventListener('reset', () => {
+      if (onReset) onReset();
+    });
+    source.onopen = () => {
+      if (onStatus) onStatus(true);
+    };
+    source.onerror = () => {
+      if (onStatus) onStatus(false);
+    };
+    return source;
+  }
+};
+
 // ============= EXPORT =============
 export const exportService = {
   downloadDatabaseZip: async () => {
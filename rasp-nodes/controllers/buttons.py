@@ -1,6 +1,9 @@
-import RPi.GPIO as GPIO
 import time
 
+from controllers.hw import load_gpio
+
+GPIO = load_gpio()
+
 BUTTON_GPIO = {'left': 23, 'right': 27, 'ok': 22}
 GPIO.setmode(GPIO.BCM)
 
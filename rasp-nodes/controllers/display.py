@@ -1,10 +1,10 @@
 from PIL import Image, ImageDraw, ImageFont
-import adafruit_ssd1306
-import busio
-from board import SCL, SDA
+from controllers.hw import load_ssd1306
+
+adafruit_ssd1306, busio, board = load_ssd1306()
 
 # Inicializa display
-i2c = busio.I2C(SCL, SDA)
+i2c = busio.I2C(board.SCL, board.SDA)
 disp = adafruit_ssd1306.SSD1306_I2C(128, 64, i2c, addr=0x3C)
 
 disp.fill(0)
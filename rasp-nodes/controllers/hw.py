@@ -0,0 +1,36 @@
+"""
+Seleção do backend de hardware do nó (variável HW_BACKEND)
+
+HW_BACKEND=real (padrão) importa RPi.GPIO e as bibliotecas da Adafruit.
+HW_BACKEND=fake usa os simuladores de server/hardware (GPIO, display SSD1306),
+permitindo rodar a aplicação do nó em uma máquina Linux comum.
+"""
+
+import os
+import sys
+
+HW_BACKEND = os.getenv("HW_BACKEND", "real").lower()
+
+if HW_BACKEND == "fake":
+    _SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "server")
+    sys.path.insert(0, os.path.abspath(_SERVER_DIR))
+
+
+def load_gpio():
+    """Retorna o módulo RPi.GPIO (ou o GPIO simulado)"""
+    if HW_BACKEND == "fake":
+        from hardware import load_gpio as _load_gpio
+        return _load_gpio()
+    import RPi.GPIO as GPIO
+    return GPIO
+
+
+def load_ssd1306():
+    """Retorna (adafruit_ssd1306, busio, board) ou os equivalentes simulados"""
+    if HW_BACKEND == "fake":
+        from hardware import load_ssd1306 as _load_ssd1306
+        return _load_ssd1306()
+    import adafruit_ssd1306
+    import busio
+    import board
+    return adafruit_ssd1306, busio, board
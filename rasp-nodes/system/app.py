@@ -47,8 +47,8 @@ def run_system():
         disp.fill(0)
         disp.show()
         try:
-            import RPi.GPIO as GPIO
-            GPIO.cleanup()
+            from controllers.hw import load_gpio
+            load_gpio().cleanup()
         except ImportError:
             pass  # GPIO não disponível
 
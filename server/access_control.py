@@ -0,0 +1,337 @@
+"""
+Motor de decisão de acesso para tags RFID
+
+Compila as permissões cadastradas (regras por porta, grupos, janelas de
+validade e agendas semanais) em estruturas em memória, de forma que a decisão
+no momento da leitura seja feita apenas com buscas O(1) em dicionários e um
+acesso indexado à agenda semanal pré-computada.
+
+A porta é identificada pelo raspberry_id da leitora. Regras com door_id "*"
+valem para todas as portas.
+"""
+
+import calendar
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from database import SessionLocal, AccessRule, AccessGroupMember, RFIDTag
+
+WILDCARD_DOOR = "*"
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+ALL_WEEKDAYS = 0b1111111
+
+
+def _to_epoch(value: Optional[datetime]) -> Optional[float]:
+    """Converte datetime UTC (naive) em timestamp epoch"""
+    if value is None:
+        return None
+    return calendar.timegm(value.utctimetuple()) + value.microsecond / 1e6
+
+
+class _CompiledRule:
+    """Regra compilada: janela de validade em epoch e agenda semanal indexada"""
+
+    __slots__ = ("rule_id", "valid_from", "valid_until", "schedule")
+
+    def __init__(self, rule_id: int, valid_from: Optional[float],
+                 valid_until: Optional[float], schedule: Optional[bytes]):
+        self.rule_id = rule_id
+        self.valid_from = valid_from
+        self.valid_until = valid_until
+        # None significa 24/7; caso contrário, um byte por minuto da semana
+        self.schedule = schedule
+
+    def matches(self, ts: float, minute_of_week: int) -> bool:
+        if self.valid_from is not None and ts < self.valid_from:
+            return False
+        if self.valid_until is not None and ts >= self.valid_until:
+            return False
+        return self.schedule is None or self.schedule[minute_of_week] == 1
+
+
+class AccessEngine:
+    """
+    Motor de decisão de acesso compilado em memória
+
+    Índices mantidos:
+        _uid_rules:   door_id -> uid -> (regras compiladas)
+        _group_rules: door_id -> grupo -> (regras compiladas)
+        _uid_groups:  uid -> frozenset de grupos
+
+    Leitores (thread de polling, endpoints) não usam lock: os índices são
+    substituídos por tuplas/frozensets novos a cada alteração. Escritas são
+    serializadas por um lock e atualizam apenas as chaves afetadas.
+    """
+
+    def __init__(self, default_allow: bool = False, log_decisions: bool = True,
+                 history_size: int = 500):
+        """
+        Args:
+            default_allow: Decisão para portas sem nenhuma regra cadastrada
+            log_decisions: Exibe cada decisão no terminal
+            history_size: Quantidade de decisões recentes mantidas em memória
+        """
+        self.default_allow = default_allow
+        self.log_decisions = log_decisions
+        self.decisions = deque(maxlen=history_size)
+        self.tag_names: Dict[str, str] = {}
+
+        self._lock = threading.Lock()
+        self._uid_rules: Dict[str, Dict[str, Tuple[_CompiledRule, ...]]] = {}
+        self._group_rules: Dict[str, Dict[str, Tuple[_CompiledRule, ...]]] = {}
+        self._uid_groups: Dict[str, FrozenSet[str]] = {}
+        # rule_id -> (door_id, kind, key) para remoção/atualização incremental
+        self._rule_index: Dict[int, Tuple[str, str, str]] = {}
+        self._schedules: Dict[Tuple[int, int, int], Optional[bytes]] = {}
+
+    # ---------- Compilação ----------
+
+    def _compile_schedule(self, weekdays: int, start_minute: int, end_minute: int) -> Optional[bytes]:
+        """Pré-computa a agenda semanal como índice de minutos (compartilhado entre regras)"""
+        weekdays &= ALL_WEEKDAYS
+        start_minute = max(0, min(MINUTES_PER_DAY, start_minute))
+        end_minute = max(0, min(MINUTES_PER_DAY, end_minute))
+        if weekdays == ALL_WEEKDAYS and start_minute == 0 and end_minute == MINUTES_PER_DAY:
+            return None
+
+        key = (weekdays, start_minute, end_minute)
+        cached = self._schedules.get(key)
+        if cached is not None:
+            return cached
+
+        index = bytearray(MINUTES_PER_WEEK)
+        for day in range(7):
+            if not weekdays & (1 << day):
+                continue
+            base = day * MINUTES_PER_DAY
+            if start_minute <= end_minute:
+                index[base + start_minute:base + end_minute] = b"\x01" * (end_minute - start_minute)
+            else:
+                # Janela que cruza a meia-noite continua no dia seguinte
+                index[base + start_minute:base + MINUTES_PER_DAY] = b"\x01" * (MINUTES_PER_DAY - start_minute)
+                next_base = ((day + 1) % 7) * MINUTES_PER_DAY
+                index[next_base:next_base + end_minute] = b"\x01" * end_minute
+
+        compiled = bytes(index)
+        self._schedules[key] = compiled
+        return compiled
+
+    def add_rule(self, rule_id: int, door_id: Optional[str] = None, tag_uid: Optional[str] = None,
+                 group_name: Optional[str] = None, weekdays: int = ALL_WEEKDAYS,
+                 start_minute: int = 0, end_minute: int = MINUTES_PER_DAY,
+                 valid_from: Optional[datetime] = None, valid_until: Optional[datetime] = None,
+                 enabled: bool = True):
+        """Compila (ou recompila) uma regra e atualiza apenas a chave afetada"""
+        with self._lock:
+            self._remove_rule_locked(rule_id)
+            if not enabled or not (tag_uid or group_name):
+                return
+
+            door_id = door_id or WILDCARD_DOOR
+            compiled = _CompiledRule(
+                rule_id,
+                _to_epoch(valid_from),
+                _to_epoch(valid_until),
+                self._compile_schedule(
+                    ALL_WEEKDAYS if weekdays is None else weekdays,
+                    0 if start_minute is None else start_minute,
+                    MINUTES_PER_DAY if end_minute is None else end_minute,
+                ),
+            )
+
+            if tag_uid:
+                kind, key, index = "uid", tag_uid, self._uid_rules
+            else:
+                kind, key, index = "group", group_name, self._group_rules
+
+            door_map = index.setdefault(door_id, {})
+            door_map[key] = door_map.get(key, ()) + (compiled,)
+            self._rule_index[rule_id] = (door_id, kind, key)
+
+    def add_rule_from_row(self, rule: AccessRule):
+        """Compila uma regra a partir da linha do banco"""
+        self.add_rule(
+            rule.id,
+            door_id=rule.door_id,
+            tag_uid=rule.tag_uid,
+            group_name=rule.group_name,
+            weekdays=rule.weekdays,
+            start_minute=rule.start_minute,
+            end_minute=rule.end_minute,
+            valid_from=rule.valid_from,
+            valid_until=rule.valid_until,
+            enabled=rule.enabled if rule.enabled is not None else True,
+        )
+
+    def remove_rule(self, rule_id: int):
+        """Remove uma regra compilada"""
+        with self._lock:
+            self._remove_rule_locked(rule_id)
+
+    def _remove_rule_locked(self, rule_id: int):
+        location = self._rule_index.pop(rule_id, None)
+        if location is None:
+            return
+        door_id, kind, key = location
+        index = self._uid_rules if kind == "uid" else self._group_rules
+        door_map = index.get(door_id)
+        if not door_map:
+            return
+        remaining = tuple(r for r in door_map.get(key, ()) if r.rule_id != rule_id)
+        if remaining:
+            door_map[key] = remaining
+        else:
+            door_map.pop(key, None)
+            if not door_map:
+                index.pop(door_id, None)
+
+    def add_member(self, group_name: str, tag_uid: str):
+        """Adiciona uma tag a um grupo"""
+        with self._lock:
+            self._uid_groups[tag_uid] = self._uid_groups.get(tag_uid, frozenset()) | {group_name}
+
+    def remove_member(self, group_name: str, tag_uid: str):
+        """Remove uma tag de um grupo"""
+        with self._lock:
+            groups = self._uid_groups.get(tag_uid, frozenset()) - {group_name}
+            if groups:
+                self._uid_groups[tag_uid] = groups
+            else:
+                self._uid_groups.pop(tag_uid, None)
+
+    def set_tag_name(self, tag_uid: str, name: str):
+        """Atualiza o cache de nomes de tags"""
+        self.tag_names[tag_uid] = name
+
+    def remove_tag(self, tag_uid: str):
+        """Remove uma tag: nome, grupos e regras diretas"""
+        with self._lock:
+            self.tag_names.pop(tag_uid, None)
+            self._uid_groups.pop(tag_uid, None)
+            rule_ids = [rid for rid, (_, kind, key) in self._rule_index.items()
+                        if kind == "uid" and key == tag_uid]
+            for rule_id in rule_ids:
+                self._remove_rule_locked(rule_id)
+
+    def load_from_db(self):
+        """Recompila todo o motor a partir do banco de dados"""
+        db = SessionLocal()
+        try:
+            rules = db.query(AccessRule).all()
+            members = db.query(AccessGroupMember).all()
+            tags = db.query(RFIDTag.uid, RFIDTag.name).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            self._uid_rules = {}
+            self._group_rules = {}
+            self._uid_groups = {}
+            self._rule_index = {}
+            self.tag_names = {uid: name for uid, name in tags}
+        for rule in rules:
+            self.add_rule_from_row(rule)
+        for member in members:
+            self.add_member(member.group_name, member.tag_uid)
+        print(f"[Access] Motor compilado: {len(rules)} regras, {len(members)} membros de grupo, {len(tags)} tags")
+
+    # ---------- Decisão ----------
+
+    def has_rules(self, door_id: str) -> bool:
+        """Indica se existe alguma regra aplicável à porta"""
+        return bool(
+            self._uid_rules.get(door_id) or self._group_rules.get(door_id)
+            or self._uid_rules.get(WILDCARD_DOOR) or self._group_rules.get(WILDCARD_DOOR)
+        )
+
+    def evaluate(self, tag_uid: str, door_id: str, ts: Optional[float] = None) -> Tuple[bool, str, Optional[int]]:
+        """
+        Avalia o acesso sem registrar a decisão
+
+        Returns:
+            (permitido, motivo, rule_id)
+        """
+        if ts is None:
+            ts = time.time()
+        local = time.localtime(ts)
+        minute_of_week = local.tm_wday * MINUTES_PER_DAY + local.tm_hour * 60 + local.tm_min
+
+        groups = self._uid_groups.get(tag_uid)
+        for door in (door_id, WILDCARD_DOOR):
+            door_map = self._uid_rules.get(door)
+            if door_map:
+                for rule in door_map.get(tag_uid, ()):
+                    if rule.matches(ts, minute_of_week):
+                        return True, "tag", rule.rule_id
+            if groups:
+                door_map = self._group_rules.get(door)
+                if door_map:
+                    for group in groups:
+                        for rule in door_map.get(group, ()):
+                            if rule.matches(ts, minute_of_week):
+                                return True, f"group:{group}", rule.rule_id
+
+        if not self.has_rules(door_id):
+            return self.default_allow, "default", None
+        return False, "no_matching_rule", None
+
+    def decide(self, tag_uid: str, door_id: str, ts: Optional[float] = None) -> dict:
+        """Avalia o acesso e registra a decisão com o tempo de avaliação"""
+        start = time.perf_counter_ns()
+        allowed, reason, rule_id = self.evaluate(tag_uid, door_id, ts)
+        eval_us = (time.perf_counter_ns() - start) / 1000.0
+
+        decision = {
+            "uid": tag_uid,
+            "door_id": door_id,
+            "allowed": allowed,
+            "reason": reason,
+            "rule_id": rule_id,
+            "eval_us": round(eval_us, 2),
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+        self.decisions.append(decision)
+        if self.log_decisions:
+            print(f"[Access] UID={tag_uid} Porta={door_id} "
+                  f"{'PERMITIDO' if allowed else 'NEGADO'} ({reason}) em {eval_us:.1f}µs")
+        return decision
+
+    def recent_decisions(self, limit: int = 50) -> list:
+        """Retorna as decisões mais recentes (mais novas primeiro)"""
+        items = list(self.decisions)[-limit:]
+        items.reverse()
+        return items
+
+    def stats(self) -> dict:
+        return {
+            "rules": len(self._rule_index),
+            "tags_with_groups": len(self._uid_groups),
+            "known_tags": len(self.tag_names),
+            "compiled_schedules": len(self._schedules),
+            "default_allow": self.default_allow,
+        }
+
+
+# Instância global
+_access_engine: Optional[AccessEngine] = None
+
+def init_access_engine() -> AccessEngine:
+    """Inicializa o motor global de acesso e compila as regras do banco"""
+    global _access_engine
+    # Sem regra para a porta, nega por padrão; ACCESS_DEFAULT_POLICY=allow mantém o comportamento antigo
+    default_allow = os.getenv("ACCESS_DEFAULT_POLICY", "deny").lower() == "allow"
+    _access_engine = AccessEngine(default_allow=default_allow)
+    _access_engine.load_from_db()
+    if default_allow and not _access_engine._rule_index:
+        print("[Access] ⚠️  ACCESS_DEFAULT_POLICY=allow e nenhuma regra cadastrada: "
+              "qualquer tag abre qualquer porta")
+    return _access_engine
+
+def get_access_engine() -> Optional[AccessEngine]:
+    """Retorna a instância global do motor de acesso"""
+    return _access_engine
@@ -0,0 +1,640 @@
+"""
+Motor de regras de alerta avaliado na ingestão
+
+Regras cadastradas pela API (tabela alert_rules) são compiladas em índices
+em memória:
+
+- "threshold": métrica do health check comparada a um limite, opcionalmente
+  por duration_s segundos ("cpu_temp_c > 75 por 60s em qualquer nó");
+- "silence": nó sem heartbeat por duration_s segundos;
+- "rate": mais de threshold eventos (rfid_reads) em window_s segundos na
+  mesma porta.
+
+Para cada (escopo, métrica) os limites de disparo e de liberação ficam em uma
+lista ordenada. Uma mensagem só reavalia as regras cujo limite está entre o
+valor anterior e o novo do dispositivo (busca binária): regras que não
+mudariam de estado nem são visitadas, então o custo por mensagem não cresce
+com o número de regras. Os prazos ("por 60s", silêncio, fim da janela de
+taxa) ficam em um único heap de deadlines atendido por uma thread.
+
+Histerese: um alerta disparado só é liberado quando o valor cruza
+clear_threshold (padrão: o próprio limite). Deduplicação: no máximo um
+alerta aberto por (regra, dispositivo); o disparo e a liberação são gravados
+em alerts por uma thread de escrita e publicados no tópico SSE "alert".
+"""
+
+import heapq
+import itertools
+import operator
+import queue
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from database import SessionLocal, AlertRule, Alert
+from event_bus import publish_event
+
+WILDCARD_DEVICE = "*"
+KINDS = ("threshold", "silence", "rate")
+THRESHOLD_METRICS = ("cpu_temp_c", "cpu_percent", "mem_percent", "mem_used_mb")
+RATE_METRICS = ("rfid_reads",)
+OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+FIRING = "firing"
+PENDING = "pending"
+RESOLVED = "resolved"
+
+_STOP = object()
+
+
+class _CompiledAlertRule:
+    """Regra compilada; clears() é o inverso do disparo avaliado em clear_threshold"""
+
+    __slots__ = ("rule_id", "name", "kind", "metric", "op", "threshold", "clear",
+                 "duration", "window", "scope", "_compare")
+
+    def __init__(self, rule_id: int, name: str, kind: str, metric: Optional[str], op: str,
+                 threshold: float, clear: Optional[float], duration: float, window: float, scope: str):
+        self.rule_id = rule_id
+        self.name = name
+        self.kind = kind
+        self.metric = metric
+        self.op = op
+        self.threshold = threshold
+        self.clear = threshold if clear is None else clear
+        self.duration = duration
+        self.window = window
+        self.scope = scope
+        self._compare = OPS[op]
+
+    def triggers(self, value: float) -> bool:
+        return self._compare(value, self.threshold)
+
+    def clears(self, value: float) -> bool:
+        return not self._compare(value, self.clear)
+
+
+class _AlertState:
+    """Estado de uma regra em um dispositivo (ausente = normal)"""
+
+    __slots__ = ("status", "token", "value", "since")
+
+    def __init__(self, status: str, value: Optional[float], since: float, token: int = 0):
+        self.status = status
+        self.token = token  # geração do episódio: deadlines de episódios anteriores são ignorados
+        self.value = value
+        self.since = since
+
+
+class _ThresholdIndex:
+    """Limites de disparo e liberação de um (escopo, métrica) em ordem"""
+
+    __slots__ = ("keys", "rule_ids", "all_ids")
+
+    def __init__(self, rules: List[_CompiledAlertRule]):
+        points = sorted(
+            {(rule.threshold, rule.rule_id) for rule in rules} | {(rule.clear, rule.rule_id) for rule in rules}
+        )
+        self.keys = [point for point, _ in points]
+        self.rule_ids = [rule_id for _, rule_id in points]
+        self.all_ids = tuple(rule.rule_id for rule in rules)
+
+    def between(self, previous: Optional[float], value: float):
+        """Regras cujo limite está em [anterior, novo]: as únicas que podem mudar de estado"""
+        if previous is None:
+            return self.all_ids
+        low, high = (previous, value) if previous <= value else (value, previous)
+        # Disparo e liberação da mesma regra no intervalo: uma única avaliação
+        return dict.fromkeys(self.rule_ids[bisect_left(self.keys, low):bisect_right(self.keys, high)])
+
+
+def validate_rule(kind: str, metric: Optional[str], op: str, threshold: Optional[float],
+                  clear_threshold: Optional[float], duration_s: float, window_s: float) -> Optional[str]:
+    """Mensagem de erro para uma regra inválida (None se válida)"""
+    if kind not in KINDS:
+        return f"kind deve ser um de: {', '.join(KINDS)}"
+    if kind == "silence":
+        return None if duration_s and duration_s > 0 else "Regras silence exigem duration_s > 0"
+    if kind == "threshold" and metric not in THRESHOLD_METRICS:
+        return f"metric deve ser um de: {', '.join(THRESHOLD_METRICS)}"
+    if kind == "rate":
+        if metric not in RATE_METRICS:
+            return f"metric deve ser um de: {', '.join(RATE_METRICS)}"
+        if op != ">":
+            return "Regras rate usam op '>' (mais de N eventos na janela)"
+        if not window_s or window_s <= 0:
+            return "Regras rate exigem window_s > 0"
+    if op not in OPS:
+        return f"op deve ser um de: {', '.join(OPS)}"
+    if threshold is None:
+        return "threshold é obrigatório"
+    if clear_threshold is not None:
+        # A liberação fica do lado "normal" do limite (histerese)
+        if op in (">", ">=") and clear_threshold > threshold:
+            return "clear_threshold deve ser <= threshold para op > / >="
+        if op in ("<", "<=") and clear_threshold < threshold:
+            return "clear_threshold deve ser >= threshold para op < / <="
+    if duration_s is not None and duration_s < 0:
+        return "duration_s não pode ser negativo"
+    return None
+
+
+class AlertEngine:
+    """
+    Regras compiladas, estado por (regra, dispositivo) e heap de deadlines
+
+    Índices mantidos:
+        _thresholds: (escopo, métrica) -> _ThresholdIndex
+        _silence:    escopo -> (regras silence)
+        _rate:       (escopo, métrica) -> (regras rate)
+
+    Toda a avaliação acontece sob um lock (consumer, pipeline RFID e a thread
+    do heap); as transições são gravadas fora dele pela thread de escrita.
+    """
+
+    def __init__(self, persist: bool = True):
+        self.persist = persist
+        self._rules: Dict[int, _CompiledAlertRule] = {}
+        self._thresholds: Dict[Tuple[str, str], _ThresholdIndex] = {}
+        self._silence: Dict[str, Tuple[_CompiledAlertRule, ...]] = {}
+        self._rate: Dict[Tuple[str, str], Tuple[_CompiledAlertRule, ...]] = {}
+        self._rate_history = 1  # eventos guardados por dispositivo (maior limite + 1)
+
+        self._states: Dict[Tuple[int, str], _AlertState] = {}
+        self._last_values: Dict[Tuple[str, str], float] = {}  # (dispositivo, métrica) -> valor
+        self._last_seen: Dict[str, float] = {}
+        self._armed: Dict[Tuple[int, str], int] = {}  # (regra, dispositivo) silence -> geração do deadline
+        self._events: Dict[Tuple[str, str], deque] = {}  # (dispositivo, métrica) -> horários
+
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._writes: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self.running = False
+
+        self.messages = 0
+        self.evaluations = 0
+        self.fired = 0
+        self.resolved = 0
+        self.eval_ns = 0
+
+    # ---------- Ciclo de vida ----------
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="alert-deadlines", daemon=True)
+        self._thread.start()
+        if self.persist:
+            self._writer = threading.Thread(target=self._writer_loop, name="alert-writer", daemon=True)
+            self._writer.start()
+
+    def stop(self, timeout: float = 2.0):
+        if not self.running:
+            return
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        self._thread.join(timeout)
+        if self._writer is not None:
+            self._writes.put(_STOP)
+            self._writer.join(timeout)
+
+    # ---------- Regras ----------
+
+    def add_rule(self, rule_id: int, name: str, kind: str, metric: Optional[str] = None, op: str = ">",
+                 threshold: Optional[float] = None, clear_threshold: Optional[float] = None,
+                 duration_s: float = 0.0, window_s: float = 60.0, raspberry_id: Optional[str] = None):
+        """Compila (ou recompila) uma regra; reavalia os dispositivos já conhecidos"""
+        self.add_rules([_CompiledAlertRule(
+            rule_id, name, kind, metric, op if kind != "silence" else ">",
+            float(threshold or 0.0), clear_threshold, float(duration_s or 0.0), float(window_s or 60.0),
+            raspberry_id or WILDCARD_DEVICE
+        )])
+
+    def add_rules(self, rules: List[_CompiledAlertRule]):
+        """
+        Compila várias regras recriando cada índice afetado uma única vez
+
+        Uma regra recompilada com o mesmo tipo, escopo e métrica mantém os
+        alertas abertos: só é liberado o que a nova definição libera para o
+        último valor (renomear ou reenviar a regra não gera novos alertas).
+        """
+        now = time.time()
+        with self._cond:
+            transitions, groups, replaced = [], set(), {}
+            for rule in rules:
+                old = self._rules.get(rule.rule_id)
+                if old is not None:
+                    groups.add((old.kind, old.scope, old.metric))
+                    if (old.kind, old.scope, old.metric) == (rule.kind, rule.scope, rule.metric):
+                        replaced[rule.rule_id] = old
+                    else:
+                        transitions += self._remove_rule_locked(rule.rule_id, now, rebuild=False)
+                self._rules[rule.rule_id] = rule
+                groups.add((rule.kind, rule.scope, rule.metric))
+            self._rebuild_locked(groups)
+
+            for rule in rules:
+                old = replaced.get(rule.rule_id)
+                # Sem isto a regra nova só seria vista quando o valor cruzasse o limite
+                if rule.kind == "threshold":
+                    for (device, metric), value in list(self._last_values.items()):
+                        if metric == rule.metric and rule.scope in (WILDCARD_DEVICE, device):
+                            transitions += self._restep(rule, old, device, value, now)
+                elif rule.kind == "silence":
+                    if old is None:
+                        for device, last_seen in list(self._last_seen.items()):
+                            if rule.scope in (WILDCARD_DEVICE, device):
+                                self._arm(rule, device, last_seen + rule.duration)
+                    elif rule.duration != old.duration:
+                        # Novo prazo de silêncio para os dispositivos armados; o anterior é ignorado
+                        for _, device in [key for key in self._armed if key[0] == rule.rule_id]:
+                            self._arm(rule, device, self._last_seen.get(device, now) + rule.duration)
+        self._emit(transitions)
+
+    def _restep(self, rule: _CompiledAlertRule, old: Optional[_CompiledAlertRule], device: str,
+                value: float, now: float) -> list:
+        """Reavalia o estado do dispositivo com a regra recompilada"""
+        state = self._states.get((rule.rule_id, device))
+        if (old is None or state is None or state.status != PENDING
+                or not rule.triggers(value) or rule.duration == old.duration):
+            return self._step(rule, device, value, now)
+        # Ainda pendente com outro duration_s: o prazo conta desde o início do episódio
+        state.value = value
+        if rule.duration <= 0:
+            state.status = FIRING
+            return [self._transition(rule, device, FIRING, value, now)]
+        state.token = next(self._seq)
+        self._push(state.since + rule.duration, "for", rule.rule_id, device, state.token)
+        return []
+
+    @staticmethod
+    def _compile_row(rule: AlertRule) -> _CompiledAlertRule:
+        return _CompiledAlertRule(
+            rule.id, rule.name, rule.kind, rule.metric, rule.op if rule.kind != "silence" else ">",
+            float(rule.threshold or 0.0), rule.clear_threshold, float(rule.duration_s or 0.0),
+            float(rule.window_s or 60.0), rule.raspberry_id or WILDCARD_DEVICE
+        )
+
+    def add_rule_from_row(self, rule: AlertRule):
+        if not rule.enabled:
+            self.remove_rule(rule.id)
+            return
+        self.add_rules([self._compile_row(rule)])
+
+    def remove_rule(self, rule_id: int):
+        """Remove a regra e libera os alertas abertos dela"""
+        with self._cond:
+            transitions = self._remove_rule_locked(rule_id, time.time())
+        self._emit(transitions)
+
+    def _remove_rule_locked(self, rule_id: int, now: float, rebuild: bool = True) -> list:
+        rule = self._rules.pop(rule_id, None)
+        if rule is None:
+            return []
+        if rebuild:
+            self._rebuild_locked({(rule.kind, rule.scope, rule.metric)})
+        transitions = []
+        for key in [key for key in self._states if key[0] == rule_id]:
+            state = self._states.pop(key)
+            if state.status == FIRING:
+                transitions.append(self._transition(rule, key[1], RESOLVED, state.value, now))
+        self._armed = {key: token for key, token in self._armed.items() if key[0] != rule_id}
+        return transitions
+
+    def _rebuild_locked(self, groups: set):
+        """Recria só os índices dos grupos (tipo, escopo, métrica) alterados"""
+        members = {group: [] for group in groups}
+        for rule in self._rules.values():
+            group = (rule.kind, rule.scope, rule.metric)
+            if group in members:
+                members[group].append(rule)
+        for (kind, scope, metric), same in members.items():
+            if kind == "threshold":
+                if same:
+                    self._thresholds[(scope, metric)] = _ThresholdIndex(same)
+                else:
+                    self._thresholds.pop((scope, metric), None)
+            elif kind == "silence":
+                if same:
+                    self._silence[scope] = tuple(same)
+                else:
+                    self._silence.pop(scope, None)
+            elif same:
+                self._rate[(scope, metric)] = tuple(same)
+            else:
+                self._rate.pop((scope, metric), None)
+        history = max([int(r.threshold) + 1 for r in self._rules.values() if r.kind == "rate"], default=1)
+        if history != self._rate_history:
+            self._rate_history = history
+            self._events = {key: deque(events, maxlen=history) for key, events in self._events.items()}
+
+    def load_from_db(self):
+        """Compila as regras habilitadas e retoma os alertas que ficaram abertos"""
+        db = SessionLocal()
+        try:
+            rules = db.query(AlertRule).filter(AlertRule.enabled == True).all()  # noqa: E712
+            open_alerts = db.query(Alert).filter(Alert.status == FIRING).all()
+        finally:
+            db.close()
+        self.add_rules([self._compile_row(rule) for rule in rules])
+        now = time.time()
+        with self._cond:
+            for alert in open_alerts:
+                rule = self._rules.get(alert.rule_id)
+                if rule is None:
+                    continue
+                # Reaberto como disparado: a próxima mensagem libera ou mantém, sem duplicar
+                self._states[(rule.rule_id, alert.raspberry_id)] = _AlertState(FIRING, alert.value, now)
+                if rule.kind == "rate":
+                    self._push(now + rule.window, "rate", rule.rule_id, alert.raspberry_id, 0)
+        print(f"[Alerts] {len(rules)} regras compiladas, {len(open_alerts)} alertas abertos")
+
+    # ---------- Ingestão ----------
+
+    def observe_status(self, raspberry_id: str, sample: dict, now: Optional[float] = None):
+        """Heartbeat: regras threshold das métricas presentes e regras silence do nó"""
+        now = time.time() if now is None else now
+        start = time.perf_counter_ns()
+        transitions = []
+        with self._cond:
+            self.messages += 1
+            self._last_seen[raspberry_id] = now
+            for scope in (raspberry_id, WILDCARD_DEVICE):
+                for rule in self._silence.get(scope, ()):
+                    key = (rule.rule_id, raspberry_id)
+                    state = self._states.get(key)
+                    if state is not None:
+                        del self._states[key]
+                        transitions.append(self._transition(rule, raspberry_id, RESOLVED, now - state.since, now))
+                    if key not in self._armed:
+                        self._arm(rule, raspberry_id, now + rule.duration)
+
+            for metric in THRESHOLD_METRICS:
+                value = sample.get(metric)
+                if value is None:
+                    continue
+                value = float(value)
+                previous = self._last_values.get((raspberry_id, metric))
+                self._last_values[(raspberry_id, metric)] = value
+                for scope in (raspberry_id, WILDCARD_DEVICE):
+                    index = self._thresholds.get((scope, metric))
+                    if index is None:
+                        continue
+                    for rule_id in index.between(previous, value):
+                        transitions += self._step(self._rules[rule_id], raspberry_id, value, now)
+            self.eval_ns += time.perf_counter_ns() - start
+        self._emit(transitions)
+
+    def observe_event(self, raspberry_id: str, metric: str = "rfid_reads", now: Optional[float] = None):
+        """Evento contável (ex.: leitura RFID) para as regras rate da porta"""
+        now = time.time() if now is None else now
+        start = time.perf_counter_ns()
+        transitions = []
+        with self._cond:
+            if not any(key[1] == metric for key in self._rate):
+                return
+            self.messages += 1
+            events = self._events.get((raspberry_id, metric))
+            if events is None:
+                events = self._events[(raspberry_id, metric)] = deque(maxlen=self._rate_history)
+            events.append(now)
+            for scope in (raspberry_id, WILDCARD_DEVICE):
+                for rule in self._rate.get((scope, metric), ()):
+                    self.evaluations += 1
+                    key = (rule.rule_id, raspberry_id)
+                    if key in self._states:
+                        continue  # já disparado: a liberação é verificada pelo heap
+                    count = int(rule.threshold) + 1
+                    # Mais de N na janela <=> o (N+1)-ésimo evento mais recente está dentro dela
+                    if len(events) >= count and events[-count] > now - rule.window:
+                        self._states[key] = _AlertState(FIRING, float(self._count(events, now, rule.window)), now)
+                        transitions.append(self._transition(rule, raspberry_id, FIRING, self._states[key].value, now))
+                        self._push(events[-count] + rule.window, "rate", rule.rule_id, raspberry_id, 0)
+            self.eval_ns += time.perf_counter_ns() - start
+        self._emit(transitions)
+
+    @staticmethod
+    def _count(events: deque, now: float, window: float) -> int:
+        return sum(1 for ts in events if ts > now - window)
+
+    def _step(self, rule: _CompiledAlertRule, device: str, value: float, now: float) -> list:
+        """Transição de uma regra threshold em um dispositivo para o novo valor"""
+        self.evaluations += 1
+        key = (rule.rule_id, device)
+        state = self._states.get(key)
+        if state is None:
+            if not rule.triggers(value):
+                return []
+            if rule.duration <= 0:
+                self._states[key] = _AlertState(FIRING, value, now)
+                return [self._transition(rule, device, FIRING, value, now)]
+            # Cada PENDING é um episódio novo: o deadline de um episódio que voltou
+            # ao normal continua no heap e não pode promover este antes da hora
+            state = self._states[key] = _AlertState(PENDING, value, now, next(self._seq))
+            self._push(now + rule.duration, "for", rule.rule_id, device, state.token)
+            return []
+        state.value = value
+        if state.status == PENDING and not rule.triggers(value):
+            del self._states[key]  # o deadline no heap fica obsoleto e é ignorado
+        elif state.status == FIRING and rule.clears(value):
+            del self._states[key]
+            return [self._transition(rule, device, RESOLVED, value, now)]
+        return []
+
+    # ---------- Heap de deadlines ----------
+
+    def _push(self, deadline: float, kind: str, rule_id: int, device: str, token: int):
+        entry = (deadline, next(self._seq), kind, rule_id, device, token)
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            self._cond.notify()  # novo prazo mais próximo: acorda a thread
+
+    def _arm(self, rule: _CompiledAlertRule, device: str, deadline: float):
+        token = self._armed[(rule.rule_id, device)] = next(self._seq)
+        self._push(deadline, "silence", rule.rule_id, device, token)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self.running and (not self._heap or self._heap[0][0] > time.time()):
+                    self._cond.wait(self._heap[0][0] - time.time() if self._heap else None)
+                if not self.running:
+                    return
+                now = time.time()
+                transitions = []
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, kind, rule_id, device, token = heapq.heappop(self._heap)
+                    rule = self._rules.get(rule_id)
+                    if rule is not None:
+                        transitions += self._expire(kind, rule, device, token, now)
+            self._emit(transitions)
+
+    def _expire(self, kind: str, rule: _CompiledAlertRule, device: str, token: int, now: float) -> list:
+        key = (rule.rule_id, device)
+        state = self._states.get(key)
+        if kind == "for":
+            if state is not None and state.status == PENDING and state.token == token:
+                state.status = FIRING
+                return [self._transition(rule, device, FIRING, state.value, now)]
+        elif kind == "silence":
+            if self._armed.get(key) != token:
+                return []  # desarmado ou substituído por um prazo mais novo
+            deadline = self._last_seen.get(device, now) + rule.duration
+            if deadline > now:
+                self._push(deadline, "silence", rule.rule_id, device, token)  # houve heartbeat: adia
+            elif state is None:
+                # Desarmado até o próximo heartbeat, que libera o alerta
+                del self._armed[key]
+                self._states[key] = _AlertState(FIRING, now - self._last_seen.get(device, now),
+                                                self._last_seen.get(device, now))
+                return [self._transition(rule, device, FIRING, self._states[key].value, now)]
+        elif kind == "rate" and state is not None:
+            events = self._events.get((device, rule.metric), ())
+            count = self._count(events, now, rule.window)
+            if count <= rule.clear:
+                del self._states[key]
+                return [self._transition(rule, device, RESOLVED, float(count), now)]
+            inside = [ts for ts in events if ts > now - rule.window]
+            self._push(inside[0] + rule.window, "rate", rule.rule_id, device, 0)
+        return []
+
+    # ---------- Gravação e eventos ----------
+
+    def _transition(self, rule: _CompiledAlertRule, device: str, status: str, value, now: float) -> dict:
+        if status == FIRING:
+            self.fired += 1
+        else:
+            self.resolved += 1
+        return {
+            "rule_id": rule.rule_id,
+            "rule_name": rule.name,
+            "kind": rule.kind,
+            "raspberry_id": device,
+            "metric": rule.metric,
+            "status": status,
+            "value": None if value is None else round(float(value), 3),
+            "threshold": rule.threshold if rule.kind != "silence" else rule.duration,
+            "timestamp": datetime.utcfromtimestamp(now),
+        }
+
+    def _emit(self, transitions: list):
+        if not transitions or not self.persist:
+            return
+        for transition in transitions:
+            self._writes.put(transition)
+
+    def _writer_loop(self):
+        while True:
+            transition = self._writes.get()
+            if transition is _STOP:
+                return
+            db = SessionLocal()
+            try:
+                if transition["status"] == FIRING:
+                    db.add(Alert(
+                        rule_id=transition["rule_id"],
+                        rule_name=transition["rule_name"],
+                        raspberry_id=transition["raspberry_id"],
+                        metric=transition["metric"],
+                        value=transition["value"],
+                        threshold=transition["threshold"],
+                        status=FIRING,
+                        started_at=transition["timestamp"],
+                    ))
+                else:
+                    db.query(Alert).filter(
+                        Alert.rule_id == transition["rule_id"],
+                        Alert.raspberry_id == transition["raspberry_id"],
+                        Alert.status == FIRING,
+                    ).update({"status": RESOLVED, "resolved_at": transition["timestamp"]})
+                db.commit()
+                publish_event("alert", transition, transition["raspberry_id"])
+                print(f"[Alerts] {transition['rule_name']} em {transition['raspberry_id']}: "
+                      f"{transition['status']} (valor {transition['value']})")
+            except Exception as e:
+                print(f"[Alerts] Erro ao gravar alerta: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+    # ---------- Consulta ----------
+
+    def active(self) -> List[dict]:
+        """Alertas disparados e pendentes (aguardando duration_s) em memória"""
+        with self._cond:
+            return [
+                {
+                    "rule_id": rule_id,
+                    "rule_name": self._rules[rule_id].name,
+                    "raspberry_id": device,
+                    "status": state.status,
+                    "value": state.value,
+                    "since": datetime.utcfromtimestamp(state.since),
+                }
+                for (rule_id, device), state in self._states.items() if rule_id in self._rules
+            ]
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            kinds = {kind: sum(1 for rule in self._rules.values() if rule.kind == kind) for kind in KINDS}
+            return {
+                "running": self.running,
+                "rules": kinds,
+                "messages": self.messages,
+                "evaluations": self.evaluations,
+                "avg_eval_us": round(self.eval_ns / self.messages / 1000, 2) if self.messages else 0.0,
+                "pending_deadlines": len(self._heap),
+                "active": sum(1 for state in self._states.values() if state.status == FIRING),
+                "pending": sum(1 for state in self._states.values() if state.status == PENDING),
+                "fired": self.fired,
+                "resolved": self.resolved,
+            }
+
+
+# Instância global
+_alert_engine: Optional[AlertEngine] = None
+
+def init_alert_engine() -> AlertEngine:
+    """Inicializa o motor global de alertas, compila as regras do banco e inicia o heap"""
+    global _alert_engine
+    _alert_engine = AlertEngine()
+    _alert_engine.start()
+    _alert_engine.load_from_db()
+    return _alert_engine
+
+def get_alert_engine() -> Optional[AlertEngine]:
+    """Retorna a instância global do motor de alertas"""
+    return _alert_engine
+
+def cleanup_alert_engine():
+    """Para a thread do heap e grava as transições pendentes"""
+    global _alert_engine
+    if _alert_engine:
+        _alert_engine.stop()
+        _alert_engine = None
+
+def observe_status(raspberry_id: str, sample: dict):
+    """Avalia um heartbeat sem deixar uma falha afetar o consumer"""
+    if _alert_engine is None or raspberry_id is None:
+        return
+    try:
+        _alert_engine.observe_status(str(raspberry_id), sample)
+    except Exception as e:
+        print(f"[Alerts] Falha ao avaliar status de {raspberry_id}: {e}")
+
+def observe_rfid_read(raspberry_id: str):
+    """Conta uma leitura RFID para as regras rate da porta"""
+    if _alert_engine is None or raspberry_id is None:
+        return
+    try:
+        _alert_engine.observe_event(str(raspberry_id), "rfid_reads")
+    except Exception as e:
+        print(f"[Alerts] Falha ao contar leitura de {raspberry_id}: {e}")
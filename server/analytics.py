@@ -0,0 +1,207 @@
+"""
+Análises de saúde da frota sobre o histórico de status
+
+Lê as colunas numéricas de device_status_history em blocos (CHUNK_ROWS
+linhas por vez) e acumula, por dispositivo e por métrica, contagem, soma,
+mínimo, máximo e um histograma de largura fixa. As operações por bloco são
+vetorizadas com NumPy (bincount / ufunc.at); a memória depende do número de
+dispositivos e de baldes, não do número de linhas da janela.
+
+A leitura domina o custo. Por isso o próprio SQLite converte raspberry_id
+no índice do dispositivo (CASE) e os blocos vêm do cursor do sqlite3 como
+tuplas só de números, convertidas em uma matriz com uma chamada, sem Row do
+SQLAlchemy nem strings por linha.
+
+Média, mínimo e máximo são exatos. Os percentis são interpolados dentro do
+balde do histograma (erro máximo de uma largura de balde: 0.25°C / 0.25%).
+"""
+
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    print("[Analytics] NumPy não disponível - análises da frota desativadas")
+    np = None
+    NUMPY_AVAILABLE = False
+
+from sqlalchemy import select
+
+from database import DeviceStatusHistory
+
+CHUNK_ROWS = 50_000
+
+# Métrica -> (início, fim, largura do balde); valores fora da faixa caem nos baldes das pontas
+FIELD_BINS = {
+    "cpu_temp_c": (0.0, 120.0, 0.25),
+    "cpu_percent": (0.0, 100.0, 0.25),
+    "mem_percent": (0.0, 100.0, 0.25),
+    "mem_used_mb": (0.0, 16384.0, 8.0),
+}
+FIELDS = tuple(FIELD_BINS)
+
+
+class FieldAccumulator:
+    """Estatísticas de uma métrica para todos os dispositivos, atualizadas por bloco"""
+
+    def __init__(self, field: str):
+        self.field = field
+        self.start, end, self.width = FIELD_BINS[field]
+        self.bins = int(round((end - self.start) / self.width))
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.sums = np.zeros(0, dtype=np.float64)
+        self.mins = np.zeros(0, dtype=np.float64)
+        self.maxs = np.zeros(0, dtype=np.float64)
+        self.hist = np.zeros((0, self.bins), dtype=np.int64)
+
+    def _grow(self, devices: int):
+        extra = devices - len(self.counts)
+        if extra <= 0:
+            return
+        self.counts = np.concatenate((self.counts, np.zeros(extra, dtype=np.int64)))
+        self.sums = np.concatenate((self.sums, np.zeros(extra)))
+        self.mins = np.concatenate((self.mins, np.full(extra, np.inf)))
+        self.maxs = np.concatenate((self.maxs, np.full(extra, -np.inf)))
+        self.hist = np.vstack((self.hist, np.zeros((extra, self.bins), dtype=np.int64)))
+
+    def add(self, devices: int, codes, values):
+        """codes: índice do dispositivo de cada linha; values: float64 com NaN para ausentes"""
+        self._grow(devices)
+        valid = ~np.isnan(values)
+        codes, values = codes[valid], values[valid]
+        if not len(values):
+            return
+        self.counts += np.bincount(codes, minlength=devices)
+        self.sums += np.bincount(codes, weights=values, minlength=devices)
+        np.minimum.at(self.mins, codes, values)
+        np.maximum.at(self.maxs, codes, values)
+        buckets = np.clip(((values - self.start) / self.width).astype(np.int64), 0, self.bins - 1)
+        flat = np.bincount(codes * self.bins + buckets, minlength=devices * self.bins)
+        self.hist += flat.reshape(devices, self.bins)
+
+    def percentiles(self, hist, count: int, low: float, high: float, pcts: Sequence[float]) -> List[float]:
+        """Percentis a partir do histograma, interpolando dentro do balde"""
+        cumulative = np.cumsum(hist)
+        targets = np.asarray(pcts, dtype=np.float64) / 100.0 * count
+        index = np.minimum(np.searchsorted(cumulative, targets, side="left"), self.bins - 1)
+        before = np.where(index > 0, cumulative[index - 1], 0)
+        inside = np.maximum(hist[index], 1)
+        values = self.start + (index + (targets - before) / inside) * self.width
+        return np.clip(values, low, high).tolist()
+
+    def summary(self, hist, count: int, total: float, low: float, high: float, pcts: Sequence[float],
+                histogram: bool) -> dict:
+        result = {
+            "count": int(count),
+            "mean": round(float(total) / count, 3),
+            "min": round(float(low), 3),
+            "max": round(float(high), 3),
+            "percentiles": {
+                f"p{pct:g}": round(value, 3)
+                for pct, value in zip(pcts, self.percentiles(hist, count, low, high, pcts))
+            },
+        }
+        if histogram:
+            # Só a faixa com valores: início do primeiro balde ocupado + contagens
+            nonzero = np.flatnonzero(hist)
+            first, last = nonzero[0], nonzero[-1]
+            result["histogram"] = {
+                "start": self.start + first * self.width,
+                "width": self.width,
+                "counts": hist[first:last + 1].tolist(),
+            }
+        return result
+
+
+def read_blocks(connection, since: datetime, names: Sequence[str], fields: Sequence[str],
+                chunk_rows: int = CHUNK_ROWS):
+    """
+    Gera blocos float64 [linhas, 1 + métricas] da janela: coluna 0 é o índice
+    do dispositivo em names, as demais as métricas na ordem de fields (NaN
+    para ausentes)
+    """
+    # Mesmo formato de data que o SQLAlchemy grava no SQLite (comparação textual)
+    since_text = since.isoformat(sep=" ", timespec="microseconds")
+    code_case = "CASE raspberry_id " + " ".join(f"WHEN ? THEN {code}" for code in range(len(names))) + " END"
+    sql = (f"SELECT {code_case}, {', '.join(fields)} FROM {DeviceStatusHistory.__tablename__} "
+           f"WHERE timestamp >= ? AND raspberry_id IN ({', '.join('?' * len(names))})")
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(sql, (*names, since_text, *names))
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield np.array(rows, dtype=np.float64)  # None vira NaN
+    finally:
+        cursor.close()
+
+
+def aggregate_blocks(blocks, names: Sequence[str], fields: Sequence[str],
+                     pcts: Sequence[float] = (50, 95, 99), histograms: bool = True) -> dict:
+    """Acumula os blocos de read_blocks e monta o relatório por dispositivo e da frota"""
+    accumulators = {field: FieldAccumulator(field) for field in fields}
+    rows_read = chunks = 0
+    for block in blocks:
+        chunks += 1
+        rows_read += len(block)
+        codes = block[:, 0].astype(np.int64)
+        for i, field in enumerate(fields, start=1):
+            accumulators[field].add(len(names), codes, block[:, i])
+
+    report = {"rows": rows_read, "chunks": chunks, "devices": 0, "fields": {}}
+    seen = set()
+    for field, acc in accumulators.items():
+        acc._grow(len(names))
+        devices = {}
+        for code in np.flatnonzero(acc.counts):
+            rid = names[code]
+            seen.add(rid)
+            devices[rid] = acc.summary(acc.hist[code], acc.counts[code], acc.sums[code],
+                                       acc.mins[code], acc.maxs[code], pcts, histogram=False)
+        total = int(acc.counts.sum())
+        fleet = None
+        if total:
+            fleet = acc.summary(acc.hist.sum(axis=0), total, acc.sums.sum(),
+                                acc.mins.min(), acc.maxs.max(), pcts, histograms)
+        report["fields"][field] = {"fleet": fleet, "devices": devices}
+    report["devices"] = len(seen)
+    return report
+
+
+def fleet_health(connection, since: datetime, fields: Iterable[str] = FIELDS,
+                 pcts: Sequence[float] = (50, 95, 99), raspberry_ids: Optional[Iterable[str]] = None,
+                 histograms: bool = True, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Percentis, médias e histogramas por dispositivo e da frota inteira
+
+    Args:
+        connection: conexão SQLAlchemy (db.connection() na API)
+        since: início da janela (UTC)
+        raspberry_ids: restringe a estes dispositivos (padrão: todos)
+    """
+    fields = [field for field in FIELDS if field in set(fields)]
+    if raspberry_ids:
+        names = sorted(set(raspberry_ids))
+    else:
+        # Sem filtro de data: lido só do índice de raspberry_id; quem não tem linhas na janela fica de fora do relatório
+        names = sorted(connection.execute(select(DeviceStatusHistory.raspberry_id).distinct()).scalars())
+    names = [name for name in names if name is not None]
+
+    blocks = read_blocks(connection, since, names, fields, chunk_rows) if names and fields else ()
+    report = aggregate_blocks(blocks, names, fields, pcts, histograms)
+    return {"since": since, **report}
+
+
+def rank_devices(report: dict, field: str, stat: str, top: int) -> List[dict]:
+    """Dispositivos ordenados (maior primeiro) por uma estatística, ex.: p95 de cpu_temp_c"""
+    devices = report["fields"].get(field, {}).get("devices", {})
+
+    def value(summary):
+        return summary["percentiles"].get(stat) if stat.startswith("p") else summary.get(stat)
+
+    ranked = [(value(summary), rid) for rid, summary in devices.items() if value(summary) is not None]
+    ranked.sort(reverse=True)
+    return [{"raspberry_id": rid, stat: val} for val, rid in ranked[:top]]
@@ -0,0 +1,204 @@
+"""
+Detecção incremental de anomalias no fluxo de health check
+
+Para cada dispositivo e métrica (temperatura, CPU, memória e taxas de rede)
+o detector mantém só média e variância exponenciais (EWMA), o horário da
+última amostra e uma EWMA da inclinação: memória O(1) por dispositivo e
+custo constante por mensagem, independentemente da frota ou do histórico.
+
+Dois tipos de anomalia:
+- "zscore": valor a mais de ANOMALY_Z desvios da média recente (após o
+  aquecimento de ANOMALY_WARMUP amostras; o desvio tem um piso por métrica
+  para uma série quase constante não disparar por ruído);
+- "rate": tendência sustentada acima do limite por minuto (aquecimento
+  rápido, vazamento de memória), medida por uma EWMA da variação da média
+  suavizada por segundo.
+
+Cada (dispositivo, métrica, tipo) tem um intervalo mínimo entre alertas
+(ANOMALY_COOLDOWN). O valor anômalo ainda entra na média, com o mesmo peso
+das demais amostras: um novo patamar passa a ser o normal.
+"""
+
+import math
+import os
+import threading
+from typing import Dict, List, Optional
+
+ANOMALY_Z = float(os.getenv("ANOMALY_Z", "4.0"))
+ANOMALY_ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.05"))  # peso da amostra nova na EWMA
+ANOMALY_WARMUP = int(os.getenv("ANOMALY_WARMUP", "30"))
+ANOMALY_COOLDOWN = float(os.getenv("ANOMALY_COOLDOWN", "300"))  # segundos
+
+# Métrica -> piso do desvio padrão (mesma unidade da métrica)
+METRICS = {
+    "cpu_temp_c": 0.5,
+    "cpu_percent": 2.0,
+    "mem_percent": 0.5,
+    "rx_rate": 1024.0,
+    "tx_rate": 1024.0,
+}
+
+# Métrica -> variação sustentada máxima por minuto
+RATE_LIMITS = {
+    "cpu_temp_c": 5.0,
+    "mem_percent": 2.0,
+}
+SLOPE_ALPHA = 0.1
+
+
+class MetricState:
+    __slots__ = ("mean", "var", "count", "last_ts", "slope")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+        self.last_ts = None
+        self.slope = 0.0  # EWMA da variação por segundo
+
+
+class DeviceState:
+    __slots__ = ("metrics", "last_ts", "last_net", "last_alert")
+
+    def __init__(self):
+        self.metrics = {metric: MetricState() for metric in METRICS}
+        self.last_ts = None
+        self.last_net = None  # (ts, bytes_sent, bytes_recv)
+        self.last_alert: Dict[tuple, float] = {}
+
+
+class AnomalyDetector:
+    """Detector EWMA por dispositivo; observe() é chamado pelo consumer a cada heartbeat"""
+
+    def __init__(self, z_threshold: float = ANOMALY_Z, alpha: float = ANOMALY_ALPHA,
+                 warmup: int = ANOMALY_WARMUP, cooldown: float = ANOMALY_COOLDOWN):
+        self.z_threshold = z_threshold
+        self.alpha = alpha
+        self.warmup = warmup
+        self.cooldown = cooldown
+        self._devices: Dict[str, DeviceState] = {}
+        self._lock = threading.Lock()
+        self.observed = 0
+        self.detected = 0
+        self.suppressed = 0
+
+    def _values(self, state: DeviceState, ts: float, sample: dict) -> dict:
+        values = {metric: sample.get(metric) for metric in METRICS if metric in sample}
+        sent, recv = sample.get("net_bytes_sent"), sample.get("net_bytes_recv")
+        if sent is not None and recv is not None:
+            if state.last_net is not None:
+                last_ts, last_sent, last_recv = state.last_net
+                elapsed = ts - last_ts
+                # Contador reiniciado (reboot): sem taxa nesta amostra
+                if elapsed > 0 and sent >= last_sent and recv >= last_recv:
+                    values["tx_rate"] = (sent - last_sent) / elapsed
+                    values["rx_rate"] = (recv - last_recv) / elapsed
+            state.last_net = (ts, sent, recv)
+        return values
+
+    def observe(self, raspberry_id: str, ts: float, sample: dict) -> List[dict]:
+        """
+        Atualiza o estado do dispositivo com uma amostra
+
+        Returns:
+            anomalias detectadas (dicts prontos para a tabela e o evento)
+        """
+        with self._lock:
+            state = self._devices.get(raspberry_id)
+            if state is None:
+                state = self._devices[raspberry_id] = DeviceState()
+            if state.last_ts is not None and ts <= state.last_ts:
+                return []  # reentrega fora de ordem
+            state.last_ts = ts
+            self.observed += 1
+
+            anomalies = []
+            for metric, value in self._values(state, ts, sample).items():
+                if value is None:
+                    continue
+                value = float(value)
+                metric_state = state.metrics[metric]
+                anomalies.extend(self._update(raspberry_id, state, metric, metric_state, ts, value))
+            return anomalies
+
+    def _update(self, raspberry_id: str, state: DeviceState, metric: str, m: MetricState,
+                ts: float, value: float) -> List[dict]:
+        found = []
+        if m.count == 0:
+            m.mean = value
+        else:
+            std = max(math.sqrt(m.var), METRICS[metric])
+            diff = value - m.mean
+            if m.count >= self.warmup:
+                z = diff / std
+                if abs(z) >= self.z_threshold:
+                    found.append(self._anomaly(raspberry_id, state, metric, "zscore", ts, value,
+                                               expected=m.mean, score=z, threshold=self.z_threshold))
+
+            # Inclinação medida na média suavizada, com o desvio limitado a ANOMALY_Z
+            # desvios: o ruído amostra a amostra e picos isolados não viram tendência
+            limited = max(-self.z_threshold * std, min(diff, self.z_threshold * std))
+            m.slope += SLOPE_ALPHA * (self.alpha * limited / (ts - m.last_ts) - m.slope)
+            limit = RATE_LIMITS.get(metric)
+            if limit is not None and m.count >= self.warmup and abs(m.slope) * 60 >= limit:
+                found.append(self._anomaly(raspberry_id, state, metric, "rate", ts, value,
+                                           expected=m.mean, score=m.slope * 60, threshold=limit))
+
+            # EWMA da média e da variância (forma incremental)
+            increment = self.alpha * diff
+            m.mean += increment
+            m.var = (1 - self.alpha) * (m.var + diff * increment)
+        m.count += 1
+        m.last_ts = ts
+        return [anomaly for anomaly in found if anomaly is not None]
+
+    def _anomaly(self, raspberry_id: str, state: DeviceState, metric: str, kind: str, ts: float,
+                 value: float, expected: float, score: float, threshold: float) -> Optional[dict]:
+        key = (metric, kind)
+        last = state.last_alert.get(key)
+        if last is not None and ts - last < self.cooldown:
+            self.suppressed += 1
+            return None
+        state.last_alert[key] = ts
+        self.detected += 1
+        return {
+            "raspberry_id": raspberry_id,
+            "metric": metric,
+            "kind": kind,
+            "value": round(value, 3),
+            "expected": round(expected, 3),
+            "score": round(score, 3),
+            "threshold": threshold,
+        }
+
+    def baseline(self, raspberry_id: str) -> Optional[dict]:
+        """Média, desvio e inclinação atuais de cada métrica do dispositivo"""
+        with self._lock:
+            state = self._devices.get(raspberry_id)
+            if state is None:
+                return None
+            return {
+                metric: {
+                    "mean": round(m.mean, 3),
+                    "std": round(math.sqrt(m.var), 3),
+                    "slope_per_min": round(m.slope * 60, 3),
+                    "samples": m.count,
+                }
+                for metric, m in state.metrics.items() if m.count
+            }
+
+    def get_stats(self) -> dict:
+        return {
+            "z_threshold": self.z_threshold,
+            "alpha": self.alpha,
+            "warmup": self.warmup,
+            "cooldown_s": self.cooldown,
+            "devices": len(self._devices),
+            "observed": self.observed,
+            "detected": self.detected,
+            "suppressed": self.suppressed,
+        }
+
+
+# Instância global usada pelo consumer
+anomaly_detector = AnomalyDetector()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark do motor de decisão de acesso
+
+Compila 100k tags (grupos, regras diretas, janelas de validade e agendas
+semanais) e mede a latência de decisão. Falha (código 1) se o p99 passar de 1ms.
+
+Execute com: python3 bench_access.py [--tags 100000] [--lookups 200000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from access_control import AccessEngine
+
+
+def build_engine(num_tags: int, num_doors: int, num_groups: int, seed: int = 42):
+    rng = random.Random(seed)
+    engine = AccessEngine(default_allow=False, log_decisions=False, history_size=1000)
+    doors = [f"rasp-{i:03d}" for i in range(num_doors)]
+    groups = [f"grupo-{i:03d}" for i in range(num_groups)]
+    uids = ["-".join(f"{rng.randrange(256):02X}" for _ in range(5)) for _ in range(num_tags)]
+
+    rule_id = 0
+    now = datetime.utcnow()
+
+    # Regras de grupo: cada grupo tem acesso a algumas portas em horário comercial
+    for group in groups:
+        for door in rng.sample(doors, k=min(3, len(doors))):
+            rule_id += 1
+            engine.add_rule(rule_id, door_id=door, group_name=group,
+                            weekdays=0b0011111, start_minute=7 * 60, end_minute=19 * 60)
+
+    # Membros de grupos e regras diretas (10% das tags, com validade)
+    for uid in uids:
+        for group in rng.sample(groups, k=rng.randint(1, 2)):
+            engine.add_member(group, uid)
+        engine.set_tag_name(uid, f"tag {uid}")
+        if rng.random() < 0.1:
+            rule_id += 1
+            engine.add_rule(rule_id, door_id=rng.choice(doors + ["*"]), tag_uid=uid,
+                            start_minute=rng.randrange(0, 720), end_minute=rng.randrange(720, 1440),
+                            valid_from=now - timedelta(days=rng.randint(0, 30)),
+                            valid_until=now + timedelta(days=rng.randint(-5, 30)))
+
+    return engine, uids, doors, rule_id
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do motor de acesso")
+    parser.add_argument("--tags", type=int, default=100_000)
+    parser.add_argument("--doors", type=int, default=20)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine, uids, doors, rules = build_engine(args.tags, args.doors, args.groups)
+    build_s = time.perf_counter() - start
+    print(f"Compilação: {args.tags} tags, {rules} regras em {build_s:.2f}s")
+
+    rng = random.Random(7)
+    unknown = ["FF-FF-FF-FF-%02X" % i for i in range(256)]
+    base_ts = time.time()
+    samples = []
+    perf = time.perf_counter_ns
+    for i in range(args.lookups):
+        uid = rng.choice(uids) if rng.random() < 0.95 else rng.choice(unknown)
+        door = rng.choice(doors)
+        ts = base_ts + rng.randrange(0, 7 * 86400)
+        t0 = perf()
+        engine.decide(uid, door, ts)
+        samples.append(perf() - t0)
+
+    samples.sort()
+    p50, p99, p999 = (percentile(samples, p) / 1000.0 for p in (50, 99, 99.9))
+    print(f"Decisões: {args.lookups}")
+    print(f"  p50   = {p50:8.2f} µs")
+    print(f"  p99   = {p99:8.2f} µs")
+    print(f"  p99.9 = {p999:8.2f} µs")
+    print(f"  max   = {samples[-1] / 1000.0:8.2f} µs")
+
+    if p99 >= 1000.0:
+        print("✗ p99 acima de 1ms")
+        sys.exit(1)
+    print("✓ p99 abaixo de 1ms")
+
+
+if __name__ == "__main__":
+    main()
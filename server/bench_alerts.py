@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark do motor de alertas (alerts.py)
+
+Gera N regras threshold de cpu_temp_c com limites aleatórios (metade para
+todos os nós, metade para um nó específico) e mede o custo por heartbeat do
+AlertEngine, que só reavalia as regras cujo limite foi cruzado, contra um
+laço que avalia todas as regras da métrica a cada mensagem. As temperaturas
+seguem um passeio aleatório por nó, como no health check real. Com limites
+densos o índice ainda visita as regras cruzadas a cada passo (mudanças de
+estado reais); regras que não mudariam de estado não custam nada. Confere ao
+final que as duas implementações terminam com os mesmos alertas disparados.
+
+Antes do benchmark verifica o rearme de uma regra com "for": um valor que
+volta ao normal e dispara de novo não herda o prazo do episódio anterior. E
+que recompilar uma regra (renomear, reenviar) não libera nem redispara os
+alertas abertos dela.
+
+Execute com: python3 bench_alerts.py [--rules 10,100,1000,5000] [--messages 5000] [--devices 50]
+"""
+
+import argparse
+import heapq
+import random
+import sys
+import time
+
+from alerts import AlertEngine, _CompiledAlertRule, FIRING, PENDING, WILDCARD_DEVICE
+
+
+def build_rules(count: int, devices: int, seed: int = 7):
+    rng = random.Random(seed)
+    rules = []
+    for rule_id in range(1, count + 1):
+        threshold = round(rng.uniform(40, 90), 1)
+        rules.append({
+            "rule_id": rule_id,
+            "name": f"temp-{rule_id}",
+            "kind": "threshold",
+            "metric": "cpu_temp_c",
+            "op": ">",
+            "threshold": threshold,
+            "clear_threshold": threshold - rng.choice((0, 2, 5)),
+            "raspberry_id": None if rule_id % 2 else f"rasp-{rng.randrange(devices):03d}",
+        })
+    return rules
+
+
+def build_messages(count: int, devices: int, seed: int = 11):
+    rng = random.Random(seed)
+    temps = {f"rasp-{i:03d}": rng.uniform(45, 70) for i in range(devices)}
+    names = list(temps)
+    messages = []
+    for i in range(count):
+        rid = names[i % devices]
+        temps[rid] = min(95.0, max(35.0, temps[rid] + rng.gauss(0, 0.8)))
+        messages.append((rid, {"cpu_temp_c": round(temps[rid], 1)}))
+    return messages
+
+
+def naive(rules, messages):
+    """Referência: todas as regras da métrica a cada mensagem"""
+    firing = set()
+    for rid, sample in messages:
+        value = sample["cpu_temp_c"]
+        for rule in rules:
+            if rule["raspberry_id"] not in (None, rid):
+                continue
+            key = (rule["rule_id"], rid)
+            if key in firing:
+                if value <= rule["clear_threshold"]:
+                    firing.discard(key)
+            elif value > rule["threshold"]:
+                firing.add(key)
+    return firing
+
+
+def indexed(rules, messages):
+    engine = AlertEngine(persist=False)
+    engine.add_rules([_CompiledAlertRule(
+        rule["rule_id"], rule["name"], rule["kind"], rule["metric"], rule["op"], rule["threshold"],
+        rule["clear_threshold"], 0.0, 60.0, rule["raspberry_id"] or WILDCARD_DEVICE
+    ) for rule in rules])
+    for rid, sample in messages:
+        engine.observe_status(rid, sample, now=0.0)
+    firing = {key for key, state in engine._states.items() if state.status == FIRING}
+    return firing, engine.evaluations
+
+
+def advance(engine: AlertEngine, now: float) -> list:
+    """Vence os deadlines até now sem a thread do motor (tempo simulado)"""
+    transitions = []
+    while engine._heap and engine._heap[0][0] <= now:
+        _, _, kind, rule_id, device, token = heapq.heappop(engine._heap)
+        transitions += engine._expire(kind, engine._rules[rule_id], device, token, now)
+    return transitions
+
+
+def check_rearm() -> bool:
+    """cpu_temp_c > 75 por 60s: 80 em t=0, 70 em t=10, 80 em t=20 só dispara em t=80"""
+    engine = AlertEngine(persist=False)
+    engine.add_rules([_CompiledAlertRule(1, "temp", "threshold", "cpu_temp_c", ">", 75.0,
+                                         None, 60.0, 60.0, WILDCARD_DEVICE)])
+    key = (1, "rasp-000")
+    timeline = []
+    for now, value in ((0.0, 80.0), (10.0, 70.0), (20.0, 80.0)):
+        advance(engine, now)
+        engine.observe_status("rasp-000", {"cpu_temp_c": value}, now=now)
+    for now in (60.0, 79.0, 80.0):
+        advance(engine, now)
+        state = engine._states.get(key)
+        timeline.append((now, state.status if state else None))
+    expected = [(60.0, PENDING), (79.0, PENDING), (80.0, FIRING)]
+    ok = timeline == expected
+    print(f"rearme com duration_s: {'✓' if ok else '✗'} {timeline}")
+    return ok
+
+
+def check_replace() -> bool:
+    """Renomear mantém o alerta disparado; um clear acima do último valor o libera"""
+    engine = AlertEngine(persist=False)
+
+    def rule(name: str, threshold: float, clear: float) -> _CompiledAlertRule:
+        return _CompiledAlertRule(1, name, "threshold", "cpu_temp_c", ">", threshold,
+                                  clear, 0.0, 60.0, WILDCARD_DEVICE)
+
+    engine.add_rules([rule("temp", 75.0, 70.0)])
+    engine.observe_status("rasp-000", {"cpu_temp_c": 80.0}, now=0.0)
+    fired = engine.fired
+    engine.add_rules([rule("temp-renomeada", 75.0, 70.0)])
+    engine.add_rules([rule("temp-renomeada", 75.0, 70.0)])
+    kept = engine.fired == fired and engine.resolved == 0 and engine._states[(1, "rasp-000")].status == FIRING
+    engine.add_rules([rule("temp-renomeada", 90.0, 85.0)])
+    released = engine.resolved == 1 and (1, "rasp-000") not in engine._states
+    ok = kept and released
+    print(f"recompilação de regra: {'✓' if ok else '✗'} mantida={kept} liberada={released}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do motor de alertas")
+    parser.add_argument("--rules", default="10,100,1000,5000")
+    parser.add_argument("--messages", type=int, default=5_000)
+    parser.add_argument("--devices", type=int, default=50)
+    args = parser.parse_args()
+
+    if not (check_rearm() & check_replace()):
+        sys.exit(1)
+    messages = build_messages(args.messages, args.devices)
+    print(f"{args.messages} heartbeats de {args.devices} dispositivos")
+    print(f"{'regras':>8} {'todas (us/msg)':>15} {'índice (us/msg)':>16} {'avaliações/msg':>15}  alertas")
+    for count in (int(value) for value in args.rules.split(",")):
+        rules = build_rules(count, args.devices)
+        t0 = time.perf_counter()
+        expected = naive(rules, messages)
+        naive_us = (time.perf_counter() - t0) / len(messages) * 1e6
+        t0 = time.perf_counter()
+        firing, evaluations = indexed(rules, messages)
+        fast_us = (time.perf_counter() - t0) / len(messages) * 1e6
+        status = "✓" if firing == expected else "✗"
+        print(f"{count:>8} {naive_us:>15.1f} {fast_us:>16.1f} {evaluations / len(messages):>15.2f}  "
+              f"{status} {len(firing)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Benchmark das análises da frota (/api/analytics/fleet)
+
+Cria um banco SQLite temporário com N linhas de histórico distribuídas entre
+D dispositivos nos últimos 7 dias e compara a implementação em blocos com
+NumPy (analytics.fleet_health) com um laço Python ingênuo que carrega todas
+as linhas e ordena listas por dispositivo. Mede tempo e pico de memória
+(tracemalloc, em uma execução separada) de ponta a ponta, o tempo só da
+agregação (mesmas linhas já em memória; a leitura do SQLite domina o total)
+e confere que os percentis das duas implementações diferem no máximo uma
+largura de balde.
+
+Execute com: python3 bench_analytics.py [--rows 500000] [--devices 20]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, insert, select
+
+from analytics import fleet_health, aggregate_blocks, CHUNK_ROWS, FIELD_BINS, FIELDS
+from database import Base, DeviceStatusHistory
+
+PCTS = (50, 95, 99)
+
+
+def build_db(path: str, num_rows: int, num_devices: int, seed: int = 42):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    span = 7 * 86400
+    devices = [f"rasp-{i:03d}" for i in range(num_devices)]
+    base_temp = {rid: rng.uniform(40, 60) for rid in devices}
+    batch = []
+    with engine.begin() as connection:
+        for i in range(num_rows):
+            rid = devices[i % num_devices]
+            batch.append({
+                "raspberry_id": rid,
+                "cpu_temp_c": None if rng.random() < 0.01 else round(base_temp[rid] + rng.gauss(0, 4), 1),
+                "cpu_percent": round(rng.betavariate(2, 5) * 100, 1),
+                "mem_percent": round(rng.uniform(20, 80), 1),
+                "mem_used_mb": round(rng.uniform(300, 3500), 1),
+                "timestamp": now - timedelta(seconds=span * i / num_rows),
+            })
+            if len(batch) == 50_000:
+                connection.execute(insert(DeviceStatusHistory), batch)
+                batch = []
+        if batch:
+            connection.execute(insert(DeviceStatusHistory), batch)
+    return engine
+
+
+def percentile(sorted_values, pct):
+    """Interpolação linear (mesmo critério do numpy.percentile)"""
+    position = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def fetch_rows(connection, since):
+    columns = [getattr(DeviceStatusHistory, field) for field in FIELDS]
+    return connection.execute(
+        select(DeviceStatusHistory.raspberry_id, *columns).where(DeviceStatusHistory.timestamp >= since)
+    ).all()
+
+
+def naive_fleet_health(connection, since):
+    """Referência: todas as linhas em listas Python, percentis por ordenação"""
+    return naive_aggregate(fetch_rows(connection, since))
+
+
+def naive_aggregate(rows):
+    per_device = {}
+    for row in rows:
+        values = per_device.setdefault(row[0], [[] for _ in FIELDS])
+        for i in range(len(FIELDS)):
+            value = row[i + 1]
+            if value is not None:
+                values[i].append(value)
+
+    report = {}
+    for i, field in enumerate(FIELDS):
+        devices = {}
+        fleet = []
+        for rid, values in per_device.items():
+            data = sorted(values[i])
+            fleet.extend(data)
+            if data:
+                devices[rid] = {
+                    "count": len(data),
+                    "mean": sum(data) / len(data),
+                    "min": data[0],
+                    "max": data[-1],
+                    "percentiles": {f"p{pct}": percentile(data, pct) for pct in PCTS},
+                }
+        fleet.sort()
+        report[field] = {
+            "fleet": {"count": len(fleet), "percentiles": {f"p{pct}": percentile(fleet, pct) for pct in PCTS}},
+            "devices": devices,
+        }
+    return report
+
+
+def run(fn, engine, since, trace=False):
+    with engine.connect() as connection:
+        if trace:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        result = fn(connection, since)
+        elapsed = time.perf_counter() - t0
+        peak = 0
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das análises da frota")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--devices", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        engine = build_db(os.path.join(tmp, "bench.db"), args.rows, args.devices)
+        print(f"Histórico: {args.rows} linhas, {args.devices} dispositivos ({time.perf_counter() - t0:.1f}s para gerar)")
+        since = datetime.utcnow() - timedelta(days=8)
+
+        def vectorized(connection, since):
+            return fleet_health(connection, since, pcts=PCTS)
+
+        naive, naive_s, _ = run(naive_fleet_health, engine, since)
+        fast, fast_s, _ = run(vectorized, engine, since)
+        _, _, naive_peak = run(naive_fleet_health, engine, since, trace=True)
+        _, _, fast_peak = run(vectorized, engine, since, trace=True)
+
+        print("Ponta a ponta (leitura do SQLite + agregação):")
+        print(f"  laço Python  {naive_s * 1000:9.1f} ms  pico {naive_peak / 2**20:7.1f} MiB")
+        print(f"  NumPy/blocos {fast_s * 1000:9.1f} ms  pico {fast_peak / 2**20:7.1f} MiB  ({fast['chunks']} blocos)")
+        print(f"  ganho        {naive_s / fast_s:9.1f}x")
+
+        # Só a agregação: as mesmas linhas já em memória para as duas implementações
+        with engine.connect() as connection:
+            rows = fetch_rows(connection, since)
+        names = sorted({row[0] for row in rows})
+        index = {rid: code for code, rid in enumerate(names)}
+        numeric = [(index[row[0]], *row[1:]) for row in rows]  # formato de analytics.read_blocks
+        t0 = time.perf_counter()
+        naive_aggregate(rows)
+        naive_agg_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        aggregate_blocks((np.array(numeric[i:i + CHUNK_ROWS], dtype=np.float64)
+                          for i in range(0, len(numeric), CHUNK_ROWS)), names, FIELDS, PCTS)
+        fast_agg_s = time.perf_counter() - t0
+        print("Só agregação (linhas já lidas):")
+        print(f"  laço Python  {naive_agg_s * 1000:9.1f} ms")
+        print(f"  NumPy/blocos {fast_agg_s * 1000:9.1f} ms")
+        print(f"  ganho        {naive_agg_s / fast_agg_s:9.1f}x")
+
+        # Percentis do histograma: no máximo uma largura de balde de diferença
+        worst = {}
+        for field in FIELDS:
+            width = FIELD_BINS[field][2]
+            pairs = [(naive[field]["fleet"], fast["fields"][field]["fleet"])]
+            pairs += [(summary, fast["fields"][field]["devices"][rid])
+                      for rid, summary in naive[field]["devices"].items()]
+            error = max(abs(a["percentiles"][f"p{pct}"] - b["percentiles"][f"p{pct}"])
+                        for a, b in pairs for pct in PCTS)
+            worst[field] = (error, width)
+        for field, (error, width) in worst.items():
+            status = "✓" if error <= width + 1e-9 else "✗"
+            print(f"  {status} {field:<12} maior erro de percentil {error:.3f} (balde {width})")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
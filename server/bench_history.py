@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark da serialização do histórico de status
+
+Cria um banco SQLite temporário com N snapshots de um dispositivo e compara,
+em linhas/s, o caminho antigo de /api/devices/{id}/status/history (entidades
+ORM -> modelo Pydantic por linha -> jsonable_encoder -> json.dumps) com o
+caminho atual (tuplas de colunas -> dicionários -> orjson em lote).
+
+Execute com: python3 bench_history.py [--rows 5000] [--runs 20]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, DeviceStatusHistory, FORMATTED_COLUMNS
+from fast_json import FastJSONResponse, ORJSON_AVAILABLE, schema_columns, rows_to_dicts
+from schemas import DeviceStatusHistoryResponse
+
+RASPBERRY_ID = "bench"
+
+
+def build_db(path: str, num_rows: int, seed: int = 42):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    ifaces = json.dumps(["lo", "eth0", "wlan0"])
+    rows = []
+    for i in range(num_rows):
+        mem = rng.uniform(300, 900)
+        rows.append({
+            "raspberry_id": RASPBERRY_ID,
+            "led_internal_status": rng.random() < 0.5,
+            "led_external_status": rng.random() < 0.5,
+            "wifi_status": "online",
+            "mem_used_mb": round(mem, 1),
+            "mem_percent": mem / 20.0,
+            "cpu_temp_c": round(rng.uniform(40, 70), 1),
+            "cpu_percent": rng.uniform(0, 100),
+            "gpio_used_count": rng.randrange(0, 10),
+            "spi_buses": 3,
+            "i2c_buses": 3,
+            "usb_devices_count": 4,
+            "net_bytes_sent": i * 1500,
+            "net_bytes_recv": i * 3000,
+            "net_ifaces": ifaces,
+            "rfid_reader_status": "online",
+            "last_rfid_read": now - timedelta(minutes=rng.randrange(0, 600)),
+            "servo_status": "closed",
+            "timestamp": now - timedelta(seconds=num_rows - i),
+        })
+    with engine.begin() as connection:
+        connection.execute(insert(DeviceStatusHistory), rows)
+    return engine
+
+
+def legacy_path(session, limit: int) -> bytes:
+    """Entidades ORM + validação Pydantic por linha + encoder genérico"""
+    rows = session.query(DeviceStatusHistory).filter(
+        DeviceStatusHistory.raspberry_id == RASPBERRY_ID
+    ).order_by(DeviceStatusHistory.timestamp.desc()).limit(limit).all()
+    items = []
+    for row in rows:
+        data = dict(row.__dict__)
+        data.pop("_sa_instance_state", None)
+        data["net_ifaces"] = json.loads(data.get("net_ifaces") or "[]")
+        for name, (column, formatter) in FORMATTED_COLUMNS.items():
+            data[name] = formatter(data.get(column))
+        items.append(data)
+    validated = TypeAdapter(list[DeviceStatusHistoryResponse]).validate_python(items)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False).encode("utf-8")
+
+
+def fast_path(session, limit: int) -> bytes:
+    """Tuplas de colunas + orjson (o que o endpoint faz hoje)"""
+    columns = schema_columns(DeviceStatusHistory, DeviceStatusHistoryResponse)
+    rows = session.query(*columns).filter(
+        DeviceStatusHistory.raspberry_id == RASPBERRY_ID
+    ).order_by(DeviceStatusHistory.timestamp.desc()).limit(limit).all()
+    return FastJSONResponse(rows_to_dicts(rows, [column.key for column in columns])).body
+
+
+def measure(name: str, fn, session_factory, limit: int, runs: int):
+    timings = []
+    size = 0
+    for _ in range(runs):
+        session = session_factory()
+        try:
+            t0 = time.perf_counter()
+            body = fn(session, limit)
+            timings.append(time.perf_counter() - t0)
+            size = len(body)
+        finally:
+            session.close()
+    timings.sort()
+    median = timings[len(timings) // 2]
+    print(f"  {name:<8} mediana {median * 1000:8.2f} ms  {limit / median:>12,.0f} linhas/s  ({size / 1024:.0f} KiB)")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do histórico de status")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_db(os.path.join(tmp, "bench.db"), args.rows)
+        session_factory = sessionmaker(bind=engine)
+
+        # Aquecimento (caches de compilação do SQLAlchemy e do Pydantic)
+        for fn in (legacy_path, fast_path):
+            session = session_factory()
+            fn(session, args.rows)
+            session.close()
+
+        print(f"Histórico: {args.rows} linhas, {args.runs} execuções (orjson: {'sim' if ORJSON_AVAILABLE else 'não'})")
+        before = measure("antes", legacy_path, session_factory, args.rows, args.runs)
+        after = measure("depois", fast_path, session_factory, args.rows, args.runs)
+        print(f"  ganho    {before / after:.1f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
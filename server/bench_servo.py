@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latência de abertura da porta: subprocess por abertura x daemon
+
+- subprocess: inicia `python3 diagnostico_servo.py` (como o ServoHandler antigo)
+  e mede o tempo até o script chegar ao comando de movimento do servo
+  (linha "[9] Testando movimento do servo") ou até terminar, se não chegar.
+- daemon: envia {"cmd": "open"} ao servo_daemon.py pelo socket Unix e mede o
+  tempo até o ack (pulso já enviado ao servo).
+
+Execute com: python3 bench_servo.py [--runs 10] [--sudo]
+Para o daemon, inicie antes: sudo python3 servo_daemon.py
+(sem daemon rodando, um daemon em modo simulação é iniciado localmente)
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from servo_handler import ServoHandler, ACCEPTED_OUTCOMES
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "diagnostico_servo.py")
+MOVE_MARKER = "[9] Testando movimento do servo"
+
+
+def bench_subprocess(runs: int, use_sudo: bool):
+    command = (["sudo"] if use_sudo else []) + [sys.executable, "-u", SCRIPT_PATH]
+    samples = []
+    reached = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for line in proc.stdout:
+            if MOVE_MARKER in line:
+                reached += 1
+                break
+        samples.append((time.perf_counter() - start) * 1000.0)
+        proc.kill()
+        proc.wait()
+    return samples, reached
+
+
+def bench_daemon(runs: int, socket_path: str):
+    handler = ServoHandler(socket_path=socket_path)
+    samples = []
+    for _ in range(runs):
+        handler.close_door()
+        start = time.perf_counter()
+        outcome = handler.open_door(hold_time=5.0, wait=True)
+        samples.append((time.perf_counter() - start) * 1000.0)
+        if outcome not in ACCEPTED_OUTCOMES:
+            raise RuntimeError("daemon não confirmou a abertura")
+    handler.close_door()
+    handler.cleanup()
+    return samples
+
+
+def start_local_daemon():
+    """Inicia um daemon em modo simulação (sem GPIO) em um socket temporário"""
+    from servo_daemon import ServoActuator, ServoDaemonServer
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "servo_bench.sock")
+    actuator = ServoActuator()
+    server = ServoDaemonServer(socket_path, actuator)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return socket_path, server
+
+
+def summary(name: str, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+    print(f"{name:<12} mediana={statistics.median(samples):9.2f} ms  "
+          f"p95={p95:9.2f} ms  max={samples[-1]:9.2f} ms  (n={len(samples)})")
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de abertura da porta")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--sudo", action="store_true", help="Executa o script com sudo (como em produção)")
+    parser.add_argument("--socket", default=os.getenv("SERVO_SOCKET", "/run/servo/servo_daemon.sock"))
+    args = parser.parse_args()
+
+    subprocess_samples, reached = bench_subprocess(args.runs, args.sudo)
+    if reached < args.runs:
+        print(f"⚠️  O script chegou ao movimento em {reached}/{args.runs} execuções "
+              f"(sem GPIO o tempo medido é até o script terminar)")
+
+    server = None
+    socket_path = args.socket
+    if not os.path.exists(socket_path):
+        socket_path, server = start_local_daemon()
+        print(f"ℹ Daemon não encontrado, usando daemon local em simulação: {socket_path}")
+    daemon_samples = bench_daemon(args.runs, socket_path)
+    if server:
+        server.shutdown()
+        server.server_close()
+
+    print()
+    slow = summary("subprocess", subprocess_samples)
+    fast = summary("daemon", daemon_samples)
+    print(f"\nDaemon {slow / fast:.0f}x mais rápido até o comando do servo (mediana)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,12 @@ import pika
 import json
 import threading
 from shared import received_messages
-from database import SessionLocal, DeviceStatus
+from database import SessionLocal, DeviceStatus, Anomaly, device_status_to_dict, parse_mem_mb, parse_temp_c
+from event_bus import publish_event
+from timeseries import record_sample, sample_time
+from anomaly import anomaly_detector
+from alerts import observe_status
+from liveness import record_heartbeat
 from datetime import datetime
 
 def process_raspberry_data(data):
@@ -10,6 +15,9 @@ def process_raspberry_data(data):
     db = SessionLocal()
     try:
         raspberry_id = data.get("id")
+        # Métricas gravadas como números; o texto formatado só existe na resposta da API
+        mem_used_mb = parse_mem_mb(data.get("mem_used_mb", data.get("mem_usage")))
+        cpu_temp_c = parse_temp_c(data.get("cpu_temp_c", data.get("cpu_temp")))
 
         # Atualizar status do dispositivo
         device = db.query(DeviceStatus).filter(
@@ -18,9 +26,11 @@ def process_raspberry_data(data):
 
         if device:
             device.wifi_status = data.get("wifi_status", device.wifi_status)
-            device.mem_usage = data.get("mem_usage", device.mem_usage)
+            if "mem_used_mb" in data or "mem_usage" in data:
+                device.mem_used_mb = mem_used_mb
             device.mem_percent = data.get("mem_percent", getattr(device, "mem_percent", 0.0))  # Atualizado
-            device.cpu_temp = data.get("cpu_temp", device.cpu_temp)
+            if "cpu_temp_c" in data or "cpu_temp" in data:
+                device.cpu_temp_c = cpu_temp_c
             device.cpu_percent = data.get("cpu_percent", getattr(device, "cpu_percent", None))
             device.gpio_used_count = data.get("gpio_used_count", getattr(device, "gpio_used_count", None))
             device.spi_buses = data.get("spi_buses", getattr(device, "spi_buses", None))
@@ -34,9 +44,9 @@ def process_raspberry_data(data):
             device = DeviceStatus(
                 raspberry_id=raspberry_id,
                 wifi_status=data.get("wifi_status", "unknown"),
-                mem_usage=data.get("mem_usage", "0 MB"),
+                mem_used_mb=mem_used_mb,
                 mem_percent=data.get("mem_percent", 0.0),  # Novo campo adicionado
-                cpu_temp=data.get("cpu_temp", "0°C"),
+                cpu_temp_c=cpu_temp_c,
                 led_internal_status=False,
                 led_external_status=False,
             )
@@ -52,7 +62,30 @@ def process_raspberry_data(data):
 
             db.add(device)
 
+        # flush aplica os defaults da linha nova antes de montar o evento
+        db.flush()
+        status = device_status_to_dict(device)
+
+        # Detecção de anomalias: custo constante por mensagem, gravadas na mesma transação
+        anomalies = []
+        try:
+            ts = sample_time(data.get("timestamp"))
+            anomalies = anomaly_detector.observe(str(raspberry_id), ts, status)
+            for anomaly in anomalies:
+                anomaly["timestamp"] = datetime.utcfromtimestamp(ts)
+                db.add(Anomaly(**anomaly))
+        except Exception as e:
+            print(f"[Anomaly] Falha na detecção para {raspberry_id}: {e}")
+
         db.commit()
+        publish_event("device_status", status, raspberry_id)
+        for anomaly in anomalies:
+            publish_event("anomaly", anomaly, raspberry_id)
+            print(f"[Anomaly] {raspberry_id}: {anomaly['metric']} ({anomaly['kind']}) "
+                  f"valor {anomaly['value']}, esperado {anomaly['expected']}")
+        record_sample(raspberry_id, data.get("timestamp"), status)
+        record_heartbeat(raspberry_id, data.get("wifi_status"))
+        observe_status(raspberry_id, status)
         print(f"Status atualizado para Raspberry {raspberry_id}")
 
     except Exception as e:
@@ -76,6 +109,7 @@ def rabbit_consumer():
                 data = json.loads(body)
                 print(f"Recebido: {data}")
                 received_messages.append(data)
+                publish_event("realtime", data, data.get("id"))
 
                 # Processar e salvar no banco de dados
                 process_raspberry_data(data)
@@ -1,7 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Float, Text
+from sqlalchemy import (
+    create_engine, Column, Integer, String, DateTime, Boolean, Float, Text, UniqueConstraint,
+    ForeignKey, Table, event, insert, delete, func, inspect, select
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, column_property
 from datetime import datetime
+from typing import Optional
+import itertools
+import json
+import os
 
 DATABASE_URL = "sqlite:///./raspberry_data.db"
 
@@ -38,29 +45,48 @@ class RFIDReadHistory(Base):
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
 
 
+# Status do dispositivo dividido em duas tabelas:
+# - device_status (fria): atributos e estado que mudam raramente (LEDs, RFID, servo, interfaces)
+# - device_telemetry (quente): linha estreita reescrita a cada heartbeat
+# O ORM só emite UPDATE para a tabela cujos valores mudaram de fato, então um
+# heartbeat suja apenas a página da telemetria no SQLite.
+device_status_table = Table(
+    "device_status", Base.metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("raspberry_id", String, unique=True, index=True),
+    Column("led_internal_status", Boolean, default=False),
+    Column("led_external_status", Boolean, default=False),
+    Column("wifi_status", String, default="unknown"),
+    Column("gpio_used_count", Integer, default=0),
+    Column("spi_buses", Integer, default=0),
+    Column("i2c_buses", Integer, default=0),
+    Column("usb_devices_count", Integer, default=0),
+    Column("net_ifaces", Text, default="[]"),
+    Column("rfid_reader_status", String, default="offline"),
+    Column("last_rfid_read", DateTime, nullable=True),
+    Column("servo_status", String, default="closed"),
+    Column("last_door_open", DateTime, nullable=True),
+)
+
+device_telemetry_table = Table(
+    "device_telemetry", Base.metadata,
+    Column("raspberry_id", String, ForeignKey("device_status.raspberry_id"), primary_key=True),
+    Column("mem_used_mb", Float, nullable=True),  # None = métrica indisponível ("N/A")
+    Column("mem_percent", Float, default=0.0),
+    Column("cpu_temp_c", Float, nullable=True),
+    Column("cpu_percent", Float, default=0.0),
+    Column("net_bytes_sent", Integer, default=0),
+    Column("net_bytes_recv", Integer, default=0),
+    Column("last_update", DateTime, default=datetime.utcnow),
+)
+
 class DeviceStatus(Base):
-    __tablename__ = "device_status"
-    id = Column(Integer, primary_key=True, index=True)
-    raspberry_id = Column(String, unique=True, index=True)
-    led_internal_status = Column(Boolean, default=False)
-    led_external_status = Column(Boolean, default=False)
-    wifi_status = Column(String, default="unknown")
-    mem_usage = Column(String, default="0 MB")
-    mem_percent = Column(Float, default=0.0)
-    cpu_temp = Column(String, default="0°C")
-    cpu_percent = Column(Float, default=0.0)
-    gpio_used_count = Column(Integer, default=0)
-    spi_buses = Column(Integer, default=0)
-    i2c_buses = Column(Integer, default=0)
-    usb_devices_count = Column(Integer, default=0)
-    net_bytes_sent = Column(Integer, default=0)
-    net_bytes_recv = Column(Integer, default=0)
-    net_ifaces = Column(Text, default="[]")
-    rfid_reader_status = Column(String, default="offline")
-    last_rfid_read = Column(DateTime, nullable=True)
-    servo_status = Column(String, default="closed")
-    last_door_open = Column(DateTime, nullable=True)
-    last_update = Column(DateTime, default=datetime.utcnow)
+    """Status atual do dispositivo (um por Raspberry), mapeado sobre o join das duas tabelas"""
+    __table__ = device_status_table.join(device_telemetry_table)
+    raspberry_id = column_property(device_status_table.c.raspberry_id, device_telemetry_table.c.raspberry_id)
+
+# Atributos mapeados (o __table__ de DeviceStatus é um join: use estes nomes, não suas colunas)
+DEVICE_STATUS_COLUMNS = tuple(DeviceStatus.__mapper__.column_attrs.keys())
 
 class DeviceStatusHistory(Base):
     """Histórico contínuo de status do dispositivo para relatórios"""
@@ -70,9 +96,9 @@ class DeviceStatusHistory(Base):
     led_internal_status = Column(Boolean, default=False)
     led_external_status = Column(Boolean, default=False)
     wifi_status = Column(String, default="unknown")
-    mem_usage = Column(String, default="0 MB")
+    mem_used_mb = Column(Float, nullable=True)  # None = métrica indisponível ("N/A")
     mem_percent = Column(Float, default=0.0)
-    cpu_temp = Column(String, default="0°C")
+    cpu_temp_c = Column(Float, nullable=True)
     cpu_percent = Column(Float, default=0.0)
     gpio_used_count = Column(Integer, default=0)
     spi_buses = Column(Integer, default=0)
@@ -86,6 +112,70 @@ class DeviceStatusHistory(Base):
     servo_status = Column(String, default="closed")  # closed, open, moving
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
 
+# Colunas copiadas de DeviceStatus para cada snapshot (todas as que existem nas duas tabelas)
+SNAPSHOT_COLUMNS = tuple(
+    column.name for column in DeviceStatusHistory.__table__.columns
+    if column.name != "id" and column.name in DEVICE_STATUS_COLUMNS
+)
+
+def device_status_snapshot(device: DeviceStatus) -> DeviceStatusHistory:
+    """
+    Snapshot do status do dispositivo a partir da linha já carregada na sessão
+
+    Não consulta o banco: entra na mesma transação da mudança que o originou.
+    Atributos ainda não preenchidos (linha nova, antes do flush) ficam com o
+    default da tabela de histórico.
+    """
+    values = {}
+    for name in SNAPSHOT_COLUMNS:
+        value = getattr(device, name)
+        if value is not None:
+            values[name] = value
+    return DeviceStatusHistory(**values)
+
+def parse_mem_mb(value) -> Optional[float]:
+    """"512 MB" (formato do publisher) ou número -> MB; None se indisponível"""
+    return _parse_number(value, "MB")
+
+def parse_temp_c(value) -> Optional[float]:
+    """"48.2°C" (formato do publisher) ou número -> °C; None se indisponível"""
+    return _parse_number(value, "°C")
+
+def _parse_number(value, unit: str) -> Optional[float]:
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(unit, "").strip())
+    except ValueError:
+        return None
+
+def format_mem_usage(mem_used_mb: Optional[float]) -> str:
+    """Formato de exibição de mem_usage (somente na borda da API)"""
+    return f"{int(mem_used_mb)} MB" if mem_used_mb is not None else "N/A"
+
+def format_cpu_temp(cpu_temp_c: Optional[float]) -> str:
+    """Formato de exibição de cpu_temp (somente na borda da API)"""
+    return f"{cpu_temp_c:.1f}°C" if cpu_temp_c is not None else "N/A"
+
+# Campos de texto da API derivados das colunas numéricas: nome -> (coluna, formatador)
+FORMATTED_COLUMNS = {
+    "mem_usage": ("mem_used_mb", format_mem_usage),
+    "cpu_temp": ("cpu_temp_c", format_cpu_temp),
+}
+
+def device_status_to_dict(device: DeviceStatus) -> dict:
+    """Status do dispositivo no formato de DeviceStatusResponse (payload de eventos)"""
+    data = {name: getattr(device, name) for name in DEVICE_STATUS_COLUMNS if name != "id"}
+    try:
+        data["net_ifaces"] = json.loads(data.get("net_ifaces") or "[]")
+    except ValueError:
+        data["net_ifaces"] = []
+    for name, (column, formatter) in FORMATTED_COLUMNS.items():
+        data[name] = formatter(data.get(column))
+    return data
+
 class DoorOpenHistory(Base):
     """Histórico de aberturas da porta (fechadura)"""
     __tablename__ = "door_open_history"
@@ -95,8 +185,173 @@ class DoorOpenHistory(Base):
     tag_name = Column(String, default="<Sem nome>")
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
 
+class DeviceOutage(Base):
+    """Intervalos em que o dispositivo ficou sem heartbeat (liveness.py)"""
+    __tablename__ = "device_outages"
+    id = Column(Integer, primary_key=True, index=True)
+    raspberry_id = Column(String, index=True)
+    started_at = Column(DateTime, index=True)  # último heartbeat antes da queda
+    detected_at = Column(DateTime, default=datetime.utcnow)  # prazo vencido no sweeper
+    ended_at = Column(DateTime, nullable=True)  # primeiro heartbeat depois da queda
+    duration_s = Column(Float, nullable=True)
+
+class Anomaly(Base):
+    """Anomalias de saúde detectadas pelo consumer (anomaly.py)"""
+    __tablename__ = "anomalies"
+    id = Column(Integer, primary_key=True, index=True)
+    raspberry_id = Column(String, index=True)
+    metric = Column(String, index=True)  # cpu_temp_c, cpu_percent, mem_percent, rx_rate, tx_rate
+    kind = Column(String)  # zscore ou rate
+    value = Column(Float)  # valor observado
+    expected = Column(Float)  # média EWMA antes da amostra
+    score = Column(Float)  # z-score ou variação por minuto
+    threshold = Column(Float)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+
+class AlertRule(Base):
+    """Regras de alerta declarativas (compiladas em alerts.py)"""
+    __tablename__ = "alert_rules"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String)
+    kind = Column(String, default="threshold")  # threshold, silence ou rate
+    metric = Column(String, nullable=True)  # cpu_temp_c... (threshold) ou rfid_reads (rate)
+    op = Column(String, default=">")  # >, >=, <, <=
+    threshold = Column(Float, nullable=True)
+    clear_threshold = Column(Float, nullable=True)  # histerese; None = o próprio threshold
+    duration_s = Column(Float, default=0.0)  # tempo mínimo da condição (threshold) ou de silêncio
+    window_s = Column(Float, default=60.0)  # janela de contagem (rate)
+    raspberry_id = Column(String, index=True, default="*")  # dispositivo ou "*" para todos
+    enabled = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class Alert(Base):
+    """Alertas disparados: no máximo um aberto (firing) por regra e dispositivo"""
+    __tablename__ = "alerts"
+    id = Column(Integer, primary_key=True, index=True)
+    rule_id = Column(Integer, index=True)
+    rule_name = Column(String)
+    raspberry_id = Column(String, index=True)
+    metric = Column(String, nullable=True)
+    value = Column(Float, nullable=True)  # valor no disparo (segundos sem heartbeat em silence)
+    threshold = Column(Float, nullable=True)
+    status = Column(String, index=True, default="firing")  # firing ou resolved
+    started_at = Column(DateTime, default=datetime.utcnow, index=True)
+    resolved_at = Column(DateTime, nullable=True)
+
+class AccessRule(Base):
+    """Regras de acesso por porta (allowlist por tag ou por grupo)"""
+    __tablename__ = "access_rules"
+    id = Column(Integer, primary_key=True, index=True)
+    door_id = Column(String, index=True, default="*")  # raspberry_id da porta ou "*" para todas
+    tag_uid = Column(String, index=True, nullable=True)  # regra direta para uma tag
+    group_name = Column(String, index=True, nullable=True)  # ou regra para um grupo
+    weekdays = Column(Integer, default=127)  # bitmask: bit 0 = segunda ... bit 6 = domingo
+    start_minute = Column(Integer, default=0)  # minuto do dia (horário local)
+    end_minute = Column(Integer, default=1440)
+    valid_from = Column(DateTime, nullable=True)  # UTC
+    valid_until = Column(DateTime, nullable=True)  # UTC
+    enabled = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AccessGroupMember(Base):
+    """Associação entre tags RFID e grupos de acesso"""
+    __tablename__ = "access_group_members"
+    __table_args__ = (UniqueConstraint("group_name", "tag_uid"),)
+    id = Column(Integer, primary_key=True, index=True)
+    group_name = Column(String, index=True)
+    tag_uid = Column(String, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ChangeLog(Base):
+    """Feed de mudanças: cada alteração de tags, dispositivos e aberturas recebe um seq monotônico"""
+    __tablename__ = "change_log"
+    # AUTOINCREMENT: um seq nunca é reutilizado, mesmo após a limpeza das linhas antigas
+    __table_args__ = {"sqlite_autoincrement": True}
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String, index=True)  # rfid_tag, device, door_open
+    key = Column(String)  # uid da tag, raspberry_id do dispositivo ou id da abertura
+    op = Column(String)  # insert, update, delete
+    raspberry_id = Column(String, index=True, nullable=True)
+    data = Column(Text, default="{}")  # JSON: linha inteira (insert) ou só as colunas alteradas (update)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+# Modelos registrados no feed: entidade e atributo usado como chave
+CHANGE_TRACKED = {
+    RFIDTag: ("rfid_tag", "uid"),
+    DeviceStatus: ("device", "raspberry_id"),
+    DoorOpenHistory: ("door_open", "id"),
+}
+
+# Colunas quentes que sozinhas não geram mudança: a telemetria de cada heartbeat
+# (memória, CPU, rede, last_update) iria para o change_log a cada mensagem
+CHANGE_IGNORED = {
+    DeviceStatus: frozenset(name for name in device_telemetry_table.c.keys() if name != "raspberry_id"),
+}
+
+# Linhas mantidas no change_log (clientes mais atrasados recebem reset e recarregam tudo)
+CHANGE_LOG_RETENTION = int(os.getenv("CHANGE_LOG_RETENTION", "200000"))
+_PRUNE_EVERY = 1000
+_change_count = itertools.count(1)
+
+def _change_json(data: dict) -> str:
+    return json.dumps(data, default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value))
+
+@event.listens_for(SessionLocal, "after_flush")
+def _record_changes(session, flush_context):
+    """
+    Registra as mudanças do flush no change_log, na mesma transação
+
+    O SQLite tem um único escritor por vez e o seq é atribuído dentro da
+    transação da mudança, então a ordem dos seqs é a ordem dos commits: um
+    cliente que leu até o seq N nunca recebe depois uma mudança com seq menor.
+    """
+    rows = []
+    now = datetime.utcnow()
+    pending = itertools.chain(
+        ((obj, "insert") for obj in session.new),
+        ((obj, "update") for obj in session.dirty),
+        ((obj, "delete") for obj in session.deleted),
+    )
+    for obj, op in pending:
+        tracked = CHANGE_TRACKED.get(type(obj))
+        if tracked is None:
+            continue
+        entity, key_attr = tracked
+        columns = inspect(type(obj)).column_attrs.keys()
+        if op == "update":
+            state = inspect(obj)
+            ignored = CHANGE_IGNORED.get(type(obj), ())
+            changed = [name for name in columns
+                       if name not in ignored and state.attrs[name].history.has_changes()]
+            if not changed:
+                continue
+            data = {name: getattr(obj, name) for name in changed}
+        elif op == "insert":
+            data = {name: getattr(obj, name) for name in columns}
+        else:
+            data = {}
+        rows.append({
+            "entity": entity,
+            "key": str(getattr(obj, key_attr)),
+            "op": op,
+            "raspberry_id": getattr(obj, "raspberry_id", None),
+            "data": _change_json(data),
+            "timestamp": now,
+        })
+    if not rows:
+        return
+    connection = session.connection()
+    connection.execute(insert(ChangeLog), rows)
+    # Limpeza periódica: mantém apenas as últimas CHANGE_LOG_RETENTION mudanças
+    if any(next(_change_count) % _PRUNE_EVERY == 0 for _ in rows):
+        high_water = select(func.max(ChangeLog.seq)).scalar_subquery()
+        connection.execute(delete(ChangeLog).where(ChangeLog.seq <= high_water - CHANGE_LOG_RETENTION))
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # Import tardio: migrations usa os modelos deste módulo
+    from migrations import run_migrations
+    run_migrations(engine)
 
 def get_db():
     db = SessionLocal()
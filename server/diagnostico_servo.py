@@ -23,84 +23,65 @@ else:
 print("\n[2] Versão do Python:")
 print(f"    {sys.version}")
 
-# 3. Tentar importar RPi.GPIO
+# 3. Tentar importar RPi.GPIO (pelo HAL, respeitando HW_BACKEND)
 print("\n[3] Testando importação de RPi.GPIO...")
-try:
-    import RPi.GPIO as GPIO
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from hal import get_hal, cleanup_hal, GPIO, GPIO_AVAILABLE, PinConflictError
+if GPIO_AVAILABLE:
     print("    ✓ RPi.GPIO disponível")
     print(f"    Versão: {GPIO.VERSION}")
-except ImportError as e:
-    print(f"    ✗ RPi.GPIO não disponível: {e}")
+else:
+    print("    ✗ RPi.GPIO não disponível")
     print("    → Instalar com: sudo pip3 install RPi.GPIO")
     sys.exit(1)
 
-# 4. Verificar modo GPIO
+# 4. Verificar modo GPIO (definido uma única vez pelo HAL)
 print("\n[4] Verificando modo GPIO atual...")
 try:
-    current_mode = GPIO.getmode()
-    if current_mode is None:
-        print("    ℹ GPIO não configurado ainda")
-    elif current_mode == GPIO.BCM:
-        print("    ✓ Modo BCM já configurado")
-    elif current_mode == GPIO.BOARD:
-        print("    ⚠️ Modo BOARD configurado (esperado BCM)")
-    
-    # Configurar modo BCM se necessário
-    if current_mode is None:
-        GPIO.setmode(GPIO.BCM)
+    hal = get_hal()
+    if hal.mode == GPIO.BCM:
         print("    ✓ Modo BCM configurado")
-    
-    GPIO.setwarnings(False)
+    else:
+        print("    ⚠️ Modo BOARD configurado (pinos BCM serão convertidos)")
 except Exception as e:
     print(f"    ✗ Erro ao verificar GPIO: {e}")
     sys.exit(1)
 
-# 5. Testar configuração do pino 12
-print("\n[5] Testando configuração do pino GPIO 12...")
+# 5. Testar reserva do pino 12
+print("\n[5] Testando reserva do pino GPIO 12...")
 try:
-    GPIO.setup(12, GPIO.OUT)
-    print("    ✓ Pino 12 configurado como OUTPUT")
+    servo_pin = hal.servo(12, owner="diagnostico")
+    print(f"    ✓ Pino 12 reservado (canal {servo_pin.reservation.channel})")
+except PinConflictError as e:
+    print(f"    ✗ Pino 12 em uso: {e}")
+    cleanup_hal()
+    sys.exit(1)
 except Exception as e:
     print(f"    ✗ Erro ao configurar pino 12: {e}")
-    GPIO.cleanup()
+    cleanup_hal()
     sys.exit(1)
 
 # 6. Testar PWM no pino 12
 print("\n[6] Testando PWM no pino 12...")
-pwm_test = None
 try:
-    pwm_test = GPIO.PWM(12, 50)  # 50Hz para servo
-    print("    ✓ PWM criado com sucesso (50Hz)")
-    
-    # Testar início do PWM
-    pwm_test.start(7.5)  # 7.5% duty cycle = 90 graus
-    print("    ✓ PWM iniciado (posição 90°)")
-    
+    servo_pin.start(7.5)  # 7.5% duty cycle = 90 graus
+    print("    ✓ PWM iniciado a 50Hz (posição 90°)")
+
     import time
     time.sleep(0.5)
-    
-    pwm_test.stop()
-    print("    ✓ PWM parado")
-    
-    # IMPORTANTE: Limpar TUDO antes de criar o servo
-    print("    ℹ Limpando PWM e GPIO para próximo teste...")
-    del pwm_test  # Deletar objeto PWM
-    GPIO.cleanup()
-    print("    ✓ GPIO limpo")
-    
+
+    # IMPORTANTE: liberar o pino antes de criar o servo
+    servo_pin.release()
+    print("    ✓ PWM parado e pino liberado")
+
 except Exception as e:
     print(f"    ✗ Erro ao testar PWM: {e}")
-    if pwm_test:
-        pwm_test.stop()
-    GPIO.cleanup()
+    cleanup_hal()
     sys.exit(1)
 
 # 7. Tentar importar sg90_servo
 print("\n[7] Testando importação de sg90_servo.py...")
 try:
-    # Adicionar diretório atual ao path
-    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    
     from sg90_servo import ServoSG90
     print("    ✓ sg90_servo.py importado com sucesso")
     
@@ -144,14 +125,14 @@ try:
 except PermissionError as e:
     print(f"    ✗ ERRO DE PERMISSÃO: {e}")
     print("    → Execute com sudo: sudo python3 diagnostico_servo.py")
-    GPIO.cleanup()
+    cleanup_hal()
     sys.exit(1)
 except Exception as e:
     print(f"    ✗ Erro ao criar/testar servo: {e}")
     print(f"    Tipo: {type(e).__name__}")
     import traceback
     traceback.print_exc()
-    GPIO.cleanup()
+    cleanup_hal()
     sys.exit(1)
 
 # Sucesso!
@@ -166,4 +147,4 @@ print("\n  2. Sem venv:")
 print("     sudo uvicorn main:app --host 0.0.0.0 --port 8000")
 print("=" * 60)
 
-GPIO.cleanup()
+cleanup_hal()
@@ -0,0 +1,200 @@
+"""
+Barramento de eventos em processo (push para o dashboard)
+
+Consumer (status e anomalias), alertas, liveness, RFID, servo e LEDs publicam eventos aqui; o endpoint SSE
+(/api/events) repassa aos navegadores conectados sem consultar o banco.
+
+Cada evento é serializado uma única vez na publicação e recebe um id
+"<época>-<seq>" monotônico. Os últimos eventos ficam em um buffer circular
+para que o cliente retome de onde parou (Last-Event-ID). Se o id pedido já
+saiu do buffer, ou é de outra execução do servidor, o cliente recebe um
+evento "reset" e deve recarregar o estado completo pela API REST.
+
+publish() pode ser chamado de qualquer thread; a entrega a cada assinante é
+agendada no event loop dele. Um assinante lento cuja fila enche é
+desconectado (o EventSource reconecta e retoma pelo id).
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+HISTORY_SIZE = 1000  # eventos mantidos para retomada
+SUBSCRIBER_QUEUE = 256  # eventos pendentes por assinante antes de desconectá-lo
+
+TOPICS = ("device_status", "realtime", "rfid", "servo", "led", "anomaly", "alert", "liveness")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class Event:
+    __slots__ = ("seq", "id", "topic", "raspberry_id", "payload")
+
+    def __init__(self, seq: int, event_id: str, topic: str, raspberry_id: Optional[str], payload: str):
+        self.seq = seq
+        self.id = event_id
+        self.topic = topic
+        self.raspberry_id = raspberry_id
+        self.payload = payload  # JSON já serializado
+
+    def encode(self) -> str:
+        """Formato text/event-stream"""
+        return f"id: {self.id}\nevent: {self.topic}\ndata: {self.payload}\n\n"
+
+
+class Subscription:
+    """Assinante com filtros; raspberry_id None nos eventos = evento global"""
+
+    def __init__(self, bus: "EventBus", topics: Optional[Set[str]], raspberry_id: Optional[str],
+                 loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.bus = bus
+        self.topics = topics
+        self.raspberry_id = raspberry_id
+        self.loop = loop
+        self.queue: "asyncio.Queue" = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+        self.closed = False
+
+    def matches(self, event: Event) -> bool:
+        if self.topics is not None and event.topic not in self.topics:
+            return False
+        if self.raspberry_id is not None and event.raspberry_id is not None:
+            return event.raspberry_id == self.raspberry_id
+        return True
+
+    def _deliver(self, event: Event):
+        # Roda no event loop do assinante
+        if self.closed or self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.bus.dropped_subscribers += 1
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        """Próximo evento ou None após timeout (para enviar heartbeat)"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """Barramento publish/subscribe com buffer de retomada"""
+
+    def __init__(self, history_size: int = HISTORY_SIZE, subscriber_queue: int = SUBSCRIBER_QUEUE):
+        self.epoch = format(int(time.time()), "x")
+        self.subscriber_queue = subscriber_queue
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._history: "deque[Event]" = deque(maxlen=history_size)
+        self._subscribers: List[Subscription] = []
+        # Último evento por (tópico, raspberry_id): estado recente sem ir ao banco
+        self._latest: Dict[Tuple[str, Optional[str]], Event] = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped_subscribers = 0
+
+    def publish(self, topic: str, data: dict, raspberry_id: Optional[str] = None) -> str:
+        """Publica um evento para os assinantes cujos filtros o aceitam; retorna o id"""
+        payload = json.dumps(data, default=_json_default, ensure_ascii=False)
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, f"{self.epoch}-{self._seq}", topic,
+                          str(raspberry_id) if raspberry_id is not None else None, payload)
+            self._history.append(event)
+            self._latest[(topic, event.raspberry_id)] = event
+            self.published += 1
+            # Agendado sob o lock: cada assinante recebe os eventos na ordem do seq
+            closed = []
+            for sub in self._subscribers:
+                if not sub.matches(event):
+                    continue
+                try:
+                    sub.loop.call_soon_threadsafe(sub._deliver, event)
+                    self.delivered += 1
+                except RuntimeError:
+                    # Event loop do assinante já foi fechado
+                    closed.append(sub)
+        for sub in closed:
+            self.unsubscribe(sub)
+        return event.id
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None, raspberry_id: Optional[str] = None,
+                  last_event_id: Optional[str] = None):
+        """
+        Registra um assinante no event loop atual
+
+        Returns:
+            (assinatura, eventos a reenviar, evento "reset" ou None) - o reset
+            é enviado quando não é possível retomar a partir de last_event_id
+        """
+        sub = Subscription(self, set(topics) if topics else None, raspberry_id,
+                           asyncio.get_running_loop(), self.subscriber_queue)
+        replay: List[Event] = []
+        reset: Optional[Event] = None
+        with self._lock:
+            if last_event_id:
+                epoch, _, seq = last_event_id.partition("-")
+                try:
+                    seq = int(seq)
+                except ValueError:
+                    seq = -1
+                oldest = self._history[0].seq if self._history else self._seq + 1
+                if epoch != self.epoch or seq < 0 or seq > self._seq or seq < oldest - 1:
+                    # Id atual: o cliente recarrega pela API e retoma daqui
+                    reset = Event(self._seq, f"{self.epoch}-{self._seq}", "reset", None,
+                                  json.dumps({"reason": "resync"}))
+                else:
+                    replay = [event for event in self._history if event.seq > seq and sub.matches(event)]
+            # Registrado sob o mesmo lock: nenhum evento entre o replay e a assinatura se perde
+            self._subscribers.append(sub)
+        return sub, replay, reset
+
+    def latest(self, topic: str, raspberry_id: Optional[str] = None) -> Optional[dict]:
+        """Payload do último evento do tópico para o dispositivo (None se não houver)"""
+        event = self._latest.get((topic, str(raspberry_id) if raspberry_id is not None else None))
+        return json.loads(event.payload) if event else None
+
+    def unsubscribe(self, sub: Subscription):
+        sub.closed = True
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "epoch": self.epoch,
+                "last_event_id": f"{self.epoch}-{self._seq}",
+                "subscribers": len(self._subscribers),
+                "published": self.published,
+                "delivered": self.delivered,
+                "dropped_subscribers": self.dropped_subscribers,
+                "history": len(self._history),
+                "history_size": self._history.maxlen,
+            }
+
+
+# Instância global (disponível já na importação: publicadores não dependem da ordem de init)
+event_bus = EventBus()
+
+def publish_event(topic: str, data: dict, raspberry_id: Optional[str] = None) -> Optional[str]:
+    """Publica no barramento global sem deixar uma falha afetar quem publica"""
+    try:
+        return event_bus.publish(topic, data, raspberry_id)
+    except Exception as e:
+        print(f"[Event Bus] Falha ao publicar '{topic}': {e}")
+        return None
@@ -0,0 +1,95 @@
+"""
+Caminho rápido de serialização para listas grandes (históricos)
+
+Em vez de carregar entidades ORM e validar cada linha em um modelo Pydantic,
+os endpoints de histórico consultam apenas as colunas do schema de resposta
+(tuplas), montam dicionários simples e serializam a lista inteira de uma vez
+com orjson. O formato do JSON é o mesmo do response_model.
+
+net_ifaces é gravado como texto JSON; o parse é feito uma vez por valor
+distinto (as linhas de um dispositivo quase sempre repetem a mesma lista).
+Campos de texto derivados (mem_usage, cpu_temp) são formatados aqui a partir
+das colunas numéricas.
+"""
+
+import json
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence
+
+from fastapi.responses import JSONResponse
+
+from database import FORMATTED_COLUMNS
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+    ORJSON_AVAILABLE = True
+except ImportError:
+    print("[Fast JSON] orjson não disponível - usando json padrão")
+    orjson = None
+    FastJSONResponse = JSONResponse
+    ORJSON_AVAILABLE = False
+
+# Colunas gravadas como texto JSON (listas)
+JSON_TEXT_COLUMNS = ("net_ifaces",)
+
+
+@lru_cache(maxsize=1024)
+def _parse_json_list(text: str) -> tuple:
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return ()
+    return tuple(value) if isinstance(value, list) else ()
+
+
+def parse_json_list(text) -> List:
+    """Lista a partir do texto JSON gravado (vazia se nulo ou inválido)"""
+    return list(_parse_json_list(text)) if text else []
+
+
+def schema_columns(model, schema) -> list:
+    """
+    Colunas do modelo, na ordem dos campos do schema de resposta
+
+    Campos formatados são selecionados da coluna numérica de origem com o
+    nome do campo como rótulo; rows_to_dicts aplica o formatador.
+    """
+    columns = []
+    for name in schema.model_fields:
+        if name in FORMATTED_COLUMNS and not hasattr(model, name):
+            columns.append(getattr(model, FORMATTED_COLUMNS[name][0]).label(name))
+        else:
+            columns.append(getattr(model, name))
+    return columns
+
+
+def rows_to_dicts(rows: Iterable[Sequence], names: Sequence[str]) -> List[dict]:
+    """Tuplas de colunas -> dicionários, com colunas JSON e campos formatados já convertidos"""
+    names = tuple(names)
+    converters = []
+    for i, name in enumerate(names):
+        if name in JSON_TEXT_COLUMNS:
+            converters.append((i, parse_json_list))
+        elif name in FORMATTED_COLUMNS:
+            converters.append((i, FORMATTED_COLUMNS[name][1]))
+    if not converters:
+        return [dict(zip(names, row)) for row in rows]
+    result = []
+    for row in rows:
+        values = list(row)
+        for i, convert in converters:
+            values[i] = convert(values[i])
+        result.append(dict(zip(names, values)))
+    return result
+
+
+def query_response(query, columns: list, headers: Optional[dict] = None) -> JSONResponse:
+    """
+    Executa a consulta de colunas e serializa a lista inteira de uma vez
+
+    A resposta é retornada diretamente (sem response_model): cabeçalhos
+    definidos no Response injetado no endpoint devem ser repassados em headers.
+    """
+    names = [column.key for column in columns]
+    return FastJSONResponse(rows_to_dicts(query.all(), names), headers=headers)
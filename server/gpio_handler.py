@@ -1,188 +1,120 @@
 """
 Manipulador de GPIO para Raspberry Pi 5
+
+O modo de numeração, a configuração dos pinos e os conflitos (ex.: pino do
+servo) ficam a cargo do HAL (hal.py); aqui ficam apenas os LEDs da API.
+Os handles dos LEDs já reservados ficam em cache e o HAL guarda o último
+valor escrito: ligar um LED já ligado não chega ao GPIO.
 """
 
-try:
-    # Para Raspberry Pi 5, usar rpi-lgpio
-    import RPi.GPIO as GPIO
+from typing import Dict, Iterable, List, Tuple
 
-    # Configuração dos pinos (referências BCM e BOARD)
-    LED_EXTERNAL_PIN_BCM = 17  # GPIO17 (pino 11 físico)
-    LED_INTERNAL_PIN_BCM = 18  # GPIO18 (pino 12 físico) - LED interno da placa
-    LED_EXTERNAL_PIN_BOARD = 11  # Pino físico 11 (equivale ao BCM17)
-    LED_INTERNAL_PIN_BOARD = 12  # Pino físico 12 (equivale ao BCM18)
+from hal import get_hal, cleanup_hal, GPIO_AVAILABLE, PinConflictError, LEDHandle
 
-    # Pinos efetivos ativos serão definidos na inicialização
-    _ACTIVE_LED_EXTERNAL_PIN = None
-    _ACTIVE_LED_INTERNAL_PIN = None
-    _INITIALIZED = False
+# Configuração dos pinos (BCM; o HAL converte se o GPIO estiver em modo BOARD)
+LED_EXTERNAL_PIN_BCM = 17  # GPIO17 (pino 11 físico)
+LED_INTERNAL_PIN_BCM = 18  # GPIO18 (pino 12 físico) - LED interno da placa
 
-    def _initialize_gpio_if_needed():
-        """Inicializa GPIO uma única vez, respeitando o modo já definido (BOARD/BCM)."""
-        global _INITIALIZED, _ACTIVE_LED_EXTERNAL_PIN, _ACTIVE_LED_INTERNAL_PIN
-        if _INITIALIZED:
-            return
-        current_mode = GPIO.getmode()
-        # Não force um modo se já houver um definido para evitar
-        # "A different mode has already been set!"
-        if current_mode is None:
-            # Escolha padrão: BCM quando não houver modo definido
-            GPIO.setmode(GPIO.BCM)
-            current_mode = GPIO.BCM
-
-        GPIO.setwarnings(False)
-
-        if current_mode == GPIO.BOARD:
-            _ACTIVE_LED_EXTERNAL_PIN = LED_EXTERNAL_PIN_BOARD
-            _ACTIVE_LED_INTERNAL_PIN = LED_INTERNAL_PIN_BOARD
-        else:
-            # Trata BCM e quaisquer outros casos como BCM
-            _ACTIVE_LED_EXTERNAL_PIN = LED_EXTERNAL_PIN_BCM
-            _ACTIVE_LED_INTERNAL_PIN = LED_INTERNAL_PIN_BCM
+LED_OWNER = "led"
 
-        # Configurar pinos como saída
-        GPIO.setup(_ACTIVE_LED_EXTERNAL_PIN, GPIO.OUT)
-        GPIO.setup(_ACTIVE_LED_INTERNAL_PIN, GPIO.OUT)
 
-        # Iniciar com LEDs desligados
-        GPIO.output(_ACTIVE_LED_EXTERNAL_PIN, GPIO.LOW)
-        GPIO.output(_ACTIVE_LED_INTERNAL_PIN, GPIO.LOW)
+class GPIOController:
+    """Controlador de GPIO com fallback para simulação"""
+    _INITIALIZED = False
+    _leds: Dict[int, LEDHandle] = {}
 
-        _INITIALIZED = True
+    @staticmethod
+    def _initialize_if_needed():
+        """Reserva os LEDs padrão (desligados) no primeiro uso"""
+        if GPIOController._INITIALIZED:
+            return
+        GPIOController.led_handle(LED_EXTERNAL_PIN_BCM)
+        GPIOController.led_handle(LED_INTERNAL_PIN_BCM)
+        GPIOController._INITIALIZED = True
         print("GPIO inicializado com sucesso")
 
-    GPIO_AVAILABLE = True
-
-except (ImportError, RuntimeError) as e:
-    print(f"GPIO não disponível: {e}")
-    print("Rodando em modo de simulação")
-    GPIO_AVAILABLE = False
-    # Fallback para simulação
-    LED_EXTERNAL_PIN_BCM = 17
-    LED_INTERNAL_PIN_BCM = 18
-    LED_EXTERNAL_PIN_BOARD = 11
-    LED_INTERNAL_PIN_BOARD = 12
-    _ACTIVE_LED_EXTERNAL_PIN = LED_EXTERNAL_PIN_BCM
-    _ACTIVE_LED_INTERNAL_PIN = LED_INTERNAL_PIN_BCM
-    _INITIALIZED = True
-    def _initialize_gpio_if_needed():
-        return
+    @staticmethod
+    def led_handle(pin: int) -> LEDHandle:
+        """Handle do LED (reserva o pino apenas no primeiro uso)"""
+        handle = GPIOController._leds.get(pin)
+        hal = get_hal()
+        # O HAL pode ter sido recriado após um cleanup
+        if handle is None or handle.hal is not hal:
+            handle = hal.led(pin, LED_OWNER)
+            GPIOController._leds[pin] = handle
+        return handle
 
-class GPIOController:
-    """Controlador de GPIO com fallback para simulação"""
-    # Mapeamento básico BCM -> BOARD para header de 40 pinos
-    _BCM_TO_BOARD = {
-        2: 3, 3: 5, 4: 7, 17: 11, 27: 13, 22: 15,
-        10: 19, 9: 21, 11: 23, 0: 27, 1: 28, 5: 29,
-        6: 31, 13: 33, 19: 35, 26: 37, 14: 8, 15: 10,
-        18: 12, 23: 16, 24: 18, 25: 22, 8: 24, 7: 26,
-        12: 32, 16: 36, 20: 38, 21: 40
-    }
-    
     @staticmethod
     def set_led(pin: int, state: bool) -> bool:
         """
         Liga ou desliga um LED
-        
+
         Args:
-            pin: Número do pino GPIO
+            pin: Número do pino GPIO (BCM)
             state: True para ligar, False para desligar
-        
+
         Returns:
             True se bem-sucedido, False caso contrário
+
+        Raises:
+            PinConflictError: pino reservado para outro uso (ex.: servo)
         """
-        if GPIO_AVAILABLE:
-            try:
-                _initialize_gpio_if_needed()
-                current_mode = GPIO.getmode()
-                
-                if current_mode is None:
-                    # Se não há modo definido, define como BCM
-                    GPIO.setmode(GPIO.BCM)
-                    current_mode = GPIO.BCM
-                
-                effective_pin = pin
-                if current_mode == GPIO.BOARD:
-                    # Converte do BCM informado pelo cliente para BOARD
-                    if pin not in GPIOController._BCM_TO_BOARD:
-                        raise ValueError(f"BCM {pin} não mapeado para BOARD")
-                    effective_pin = GPIOController._BCM_TO_BOARD[pin]
-                
-                # Verifica se o pino não está em uso pelo servo (pino 12)
-                if effective_pin == 12:
-                    raise RuntimeError(f"Pino {pin} (BCM 12) está reservado para o servo motor. Use outro pino para o LED.")
-                
-                # Garante que o pino informado esteja configurado como saída
-                # Tenta configurar o pino, ignorando erros se já estiver configurado
-                try:
-                    GPIO.setup(effective_pin, GPIO.OUT, initial=GPIO.LOW)
-                except RuntimeError as e:
-                    error_msg = str(e).lower()
-                    # Se o erro for sobre pino já configurado ou modo, tenta continuar
-                    if "already" in error_msg or "mode" in error_msg:
-                        # Pino já configurado, pode tentar usar mesmo assim
-                        pass
-                    elif "not allocated" in error_msg:
-                        # Erro específico do lgpio - pode ser conflito com servo
-                        raise RuntimeError(f"Pino {pin} (BCM) não está disponível. Pode estar em uso pelo servo motor (pino 12) ou outro processo.")
-                    else:
-                        raise
-                except Exception as e:
-                    error_msg = str(e).lower()
-                    if "not allocated" in error_msg:
-                        raise RuntimeError(f"Pino {pin} (BCM) não está disponível. Pode estar em uso por outro processo.")
-                    elif "already" in error_msg or "mode" in error_msg:
-                        # Pino já configurado, pode continuar
-                        pass
-                    else:
-                        raise
-                
-                # Tenta controlar o LED
-                try:
-                    if state:
-                        GPIO.output(effective_pin, GPIO.HIGH)
-                    else:
-                        GPIO.output(effective_pin, GPIO.LOW)
-                except RuntimeError as e:
-                    # Se falhar ao controlar, pode ser que o pino esteja em uso
-                    error_msg = str(e).lower()
-                    if "not allocated" in error_msg:
-                        raise RuntimeError(f"Pino {pin} (BCM) não está disponível. Pode estar em uso por outro processo (ex: servo no pino 12).")
-                    raise
-                
-                return True
-            except Exception as e:
-                error_msg = str(e)
-                print(f"[GPIO] Erro ao controlar LED no pino {pin}: {error_msg}")
-                raise RuntimeError(f"Falha no GPIO: {error_msg}")
-        else:
-            # Modo simulação
-            if state:
-                print(f"[SIMULAÇÃO] LED no pino {pin}: ON")
-            else:
-                print(f"[SIMULAÇÃO] LED no pino {pin}: OFF")
+        try:
+            GPIOController._initialize_if_needed()
+            GPIOController.led_handle(pin).set(state)
             return True
-    
+        except PinConflictError as e:
+            print(f"[GPIO] Pino {pin} indisponível para LED: {e}")
+            raise
+        except Exception as e:
+            error_msg = str(e)
+            print(f"[GPIO] Erro ao controlar LED no pino {pin}: {error_msg}")
+            raise RuntimeError(f"Falha no GPIO: {error_msg}")
+
+    @staticmethod
+    def set_leds(changes: Iterable[Tuple[int, bool]]) -> List[dict]:
+        """
+        Aplica várias mudanças de LED em uma chamada
+
+        Todos os pinos são reservados antes da primeira escrita: um conflito
+        (PinConflictError) não deixa o lote aplicado pela metade.
+
+        Args:
+            changes: Pares (pino BCM, estado), aplicados em ordem
+
+        Returns:
+            Lista com {"pin", "state", "changed"} por mudança; changed=False
+            indica que o pino já estava no estado pedido (nenhuma escrita)
+        """
+        changes = list(changes)
+        try:
+            GPIOController._initialize_if_needed()
+            handles = [GPIOController.led_handle(pin) for pin, _ in changes]
+            return [
+                {"pin": pin, "state": bool(state), "changed": handle.set(state)}
+                for handle, (pin, state) in zip(handles, changes)
+            ]
+        except PinConflictError as e:
+            print(f"[GPIO] Lote de LEDs recusado: {e}")
+            raise
+        except Exception as e:
+            error_msg = str(e)
+            print(f"[GPIO] Erro ao aplicar lote de LEDs: {error_msg}")
+            raise RuntimeError(f"Falha no GPIO: {error_msg}")
+
     @staticmethod
     def get_pin(led_type: str) -> int:
-        """Retorna o pino GPIO baseado no tipo de LED"""
-        # Garante inicialização para termos os pinos ativos corretos
-        if GPIO_AVAILABLE:
-            _initialize_gpio_if_needed()
+        """Retorna o pino GPIO (BCM) baseado no tipo de LED"""
         if led_type == "internal":
-            return _ACTIVE_LED_INTERNAL_PIN
+            return LED_INTERNAL_PIN_BCM
         else:
-            return _ACTIVE_LED_EXTERNAL_PIN
-    
+            return LED_EXTERNAL_PIN_BCM
+
     @staticmethod
     def cleanup():
         """Limpa as configurações de GPIO"""
+        cleanup_hal()
+        GPIOController._leds.clear()
+        GPIOController._INITIALIZED = False
         if GPIO_AVAILABLE:
-            try:
-                GPIO.cleanup()
-                print("GPIO cleanup realizado")
-            except:
-                pass
-
-
-
+            print("GPIO cleanup realizado")
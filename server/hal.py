@@ -0,0 +1,399 @@
+"""
+Camada de abstração do hardware (HAL)
+
+Ponto único de acesso ao GPIO do processo:
+- define o modo de numeração uma única vez (BCM; se outro módulo já tiver
+  definido BOARD, o modo é mantido e os pinos BCM são convertidos);
+- mantém a tabela de reservas (pino BCM -> dono, direção, PWM), recusando
+  com PinConflictError o uso de um pino já reservado por outro dono;
+- guarda o último valor escrito em cada saída (escritas que não mudam o
+  valor são descartadas sem chamar o GPIO);
+- entrega handles tipados (LED, servo/PWM, botão e dispositivo SPI).
+
+Um pino é configurado (GPIO.setup) apenas na primeira reserva: as escritas
+seguintes vão direto para GPIO.output, sem checagens de modo ou de conflito.
+Pinos controlados por outro processo (ex.: servo no servo_daemon.py) são
+declarados com reserve_external() para que o restante da API não os use.
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional
+
+try:
+    from hardware import load_gpio
+    GPIO = load_gpio()
+    GPIO_AVAILABLE = True
+except (ImportError, RuntimeError) as e:
+    print(f"[HAL] GPIO não disponível ({e}) - rodando em modo simulação")
+    GPIO = None
+    GPIO_AVAILABLE = False
+
+# Mapeamento BCM -> BOARD (header de 40 pinos)
+BCM_TO_BOARD = {
+    2: 3, 3: 5, 4: 7, 17: 11, 27: 13, 22: 15,
+    10: 19, 9: 21, 11: 23, 0: 27, 1: 28, 5: 29,
+    6: 31, 13: 33, 19: 35, 26: 37, 14: 8, 15: 10,
+    18: 12, 23: 16, 24: 18, 25: 22, 8: 24, 7: 26,
+    12: 32, 16: 36, 20: 38, 21: 40
+}
+
+# Pinos BCM dos barramentos SPI: (MOSI, MISO, SCLK) e chip selects
+SPI_BUS_PINS = {0: (10, 9, 11), 1: (20, 19, 21)}
+SPI_CE_PINS = {0: (8, 7), 1: (18, 17, 16)}
+
+
+class PinConflictError(RuntimeError):
+    """Pino já reservado por outro dono"""
+
+
+class PinReservation:
+    """Entrada da tabela de reservas"""
+
+    __slots__ = ("pin", "channel", "owner", "direction", "value", "managed")
+
+    def __init__(self, pin: int, channel: int, owner: str, direction: str, managed: bool):
+        self.pin = pin
+        self.channel = channel
+        self.owner = owner
+        self.direction = direction  # out | in | pwm | spi | external
+        self.value: Optional[float] = None
+        self.managed = managed  # configurado por este HAL (GPIO.setup)
+
+    def to_dict(self) -> dict:
+        return {
+            "pin": self.pin,
+            "channel": self.channel,
+            "owner": self.owner,
+            "direction": self.direction,
+            "value": self.value,
+            "managed": self.managed,
+        }
+
+
+class LEDHandle:
+    """Saída digital (LED), com brilho por PWM opcional (set_level)"""
+
+    PWM_FREQUENCY = 200
+
+    def __init__(self, hal: "HAL", reservation: PinReservation):
+        self.hal = hal
+        self.reservation = reservation
+        self.pin = reservation.pin
+        self._pwm: Optional["PWMHandle"] = None
+
+    @property
+    def state(self) -> bool:
+        return bool(self.reservation.value)
+
+    def set_level(self, level: float):
+        """Brilho (duty cycle 0-100) por PWM no mesmo pino"""
+        if self._pwm is None:
+            self._pwm = PWMHandle(self.hal, self.reservation, self.PWM_FREQUENCY)
+        if self._pwm.running:
+            self._pwm.set_duty(level)
+        else:
+            self._pwm.start(level)
+
+    def set(self, state: bool) -> bool:
+        """Escreve o estado; retorna False se o pino já estava nesse valor"""
+        if self._pwm is not None and self._pwm.running:
+            # Volta de PWM para saída digital (valor em cache passa a None)
+            self._pwm.stop()
+        value = 1 if state else 0
+        if self.reservation.value == value:
+            self.hal.skipped_writes += 1
+            return False
+        if GPIO_AVAILABLE:
+            GPIO.output(self.reservation.channel, value)
+        else:
+            print(f"[SIMULAÇÃO] LED no pino {self.pin}: {'ON' if value else 'OFF'}")
+        self.reservation.value = value
+        self.hal.writes += 1
+        return True
+
+    def on(self):
+        self.set(True)
+
+    def off(self):
+        self.set(False)
+
+    def release(self):
+        self.hal.release(self.pin, self.reservation.owner)
+
+
+class PWMHandle:
+    """Saída PWM por software"""
+
+    def __init__(self, hal: "HAL", reservation: PinReservation, frequency: float):
+        self.hal = hal
+        self.reservation = reservation
+        self.pin = reservation.pin
+        self.frequency = frequency
+        self._pwm = GPIO.PWM(reservation.channel, frequency) if GPIO_AVAILABLE else None
+        self.running = False
+
+    @property
+    def duty(self) -> Optional[float]:
+        return self.reservation.value
+
+    def start(self, duty: float):
+        if self._pwm:
+            self._pwm.start(duty)
+        self.running = True
+        self.reservation.value = duty
+
+    def set_duty(self, duty: float):
+        if self._pwm:
+            self._pwm.ChangeDutyCycle(duty)
+        self.reservation.value = duty
+
+    def stop(self):
+        if self._pwm and self.running:
+            self._pwm.stop()
+        self.running = False
+        self.reservation.value = None
+
+    def release(self):
+        self.stop()
+        self.hal.release(self.pin, self.reservation.owner)
+
+
+class ServoHandle(PWMHandle):
+    """PWM de 50Hz para servo (0° = 2.5%, 90° = 7.5%, 180° = 12.5% de duty)"""
+
+    FREQUENCY = 50
+
+    @staticmethod
+    def angle_to_duty(angle: float) -> float:
+        angle = max(0, min(180, angle))
+        return 2.5 + (angle / 180.0) * 10
+
+    def set_angle(self, angle: float):
+        self.set_duty(self.angle_to_duty(angle))
+
+
+class ButtonHandle:
+    """Entrada digital (botão)"""
+
+    def __init__(self, hal: "HAL", reservation: PinReservation, active_low: bool):
+        self.hal = hal
+        self.reservation = reservation
+        self.pin = reservation.pin
+        self.active_low = active_low
+
+    def read(self) -> int:
+        if not GPIO_AVAILABLE:
+            return 1 if self.active_low else 0
+        value = GPIO.input(self.reservation.channel)
+        self.reservation.value = value
+        return value
+
+    def is_pressed(self) -> bool:
+        return (self.read() == 0) == self.active_low
+
+    def on_press(self, callback: Callable[[int], None], bouncetime: int = 200):
+        """Registra callback na borda de pressionamento (bouncetime em ms)"""
+        if GPIO_AVAILABLE:
+            edge = GPIO.FALLING if self.active_low else GPIO.RISING
+            GPIO.add_event_detect(self.reservation.channel, edge,
+                                  callback=lambda channel: callback(self.pin), bouncetime=bouncetime)
+
+    def release(self):
+        if GPIO_AVAILABLE:
+            GPIO.remove_event_detect(self.reservation.channel)
+        self.hal.release(self.pin, self.reservation.owner)
+
+
+class SPIDeviceHandle:
+    """
+    Dispositivo SPI com pinos auxiliares (ex.: RC522 com RST e IRQ)
+
+    O driver do dispositivo configura os próprios pinos; o HAL apenas os reserva
+    e informa os números no modo de numeração atual (channel()).
+    """
+
+    def __init__(self, hal: "HAL", owner: str, bus: int, device: int, pins: Dict[str, int]):
+        self.hal = hal
+        self.owner = owner
+        self.bus = bus
+        self.device = device
+        self.pins = pins
+
+    def channel(self, name: str) -> int:
+        return self.hal.channel(self.pins[name])
+
+    def release(self):
+        for pin in self.pins.values():
+            self.hal.release(pin, self.owner)
+
+
+class HAL:
+    """Dono do modo de numeração e da tabela de reservas de pinos"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reservations: Dict[int, PinReservation] = {}
+        self._pwm: Dict[int, PWMHandle] = {}
+        self.mode: Optional[int] = None
+        self.writes = 0
+        self.skipped_writes = 0
+        self._ensure_mode()
+
+    def _ensure_mode(self):
+        if not GPIO_AVAILABLE:
+            return
+        current_mode = GPIO.getmode()
+        if current_mode is None:
+            GPIO.setmode(GPIO.BCM)
+            current_mode = GPIO.BCM
+            print("[HAL] GPIO configurado em modo BCM")
+        elif current_mode == GPIO.BOARD:
+            print("[HAL] GPIO já estava em modo BOARD, convertendo pinos BCM")
+        GPIO.setwarnings(False)
+        self.mode = current_mode
+
+    @property
+    def mode_name(self) -> Optional[str]:
+        if not GPIO_AVAILABLE or self.mode is None:
+            return None
+        return "BOARD" if self.mode == GPIO.BOARD else "BCM"
+
+    def channel(self, pin: int) -> int:
+        """Número do pino BCM no modo de numeração em uso"""
+        if GPIO_AVAILABLE and self.mode == GPIO.BOARD:
+            if pin not in BCM_TO_BOARD:
+                raise ValueError(f"BCM {pin} não mapeado para BOARD")
+            return BCM_TO_BOARD[pin]
+        return pin
+
+    # ---------- Reservas ----------
+
+    def _reserve(self, pin: int, owner: str, direction: str, managed: bool = True,
+                 pull: Optional[int] = None, initial: int = 0) -> PinReservation:
+        with self._lock:
+            current = self._reservations.get(pin)
+            if current is not None:
+                if current.owner != owner:
+                    raise PinConflictError(
+                        f"Pino {pin} (BCM) reservado por '{current.owner}' ({current.direction})"
+                    )
+                if current.direction == direction:
+                    return current
+
+            reservation = PinReservation(pin, self.channel(pin), owner, direction, managed)
+            if managed and GPIO_AVAILABLE:
+                if direction == "in":
+                    GPIO.setup(reservation.channel, GPIO.IN,
+                               pull_up_down=GPIO.PUD_OFF if pull is None else pull)
+                else:
+                    GPIO.setup(reservation.channel, GPIO.OUT, initial=initial)
+            if direction == "out":
+                reservation.value = initial
+            self._reservations[pin] = reservation
+            return reservation
+
+    def reserve_external(self, pin: int, owner: str) -> PinReservation:
+        """Reserva um pino controlado por outro processo (não é configurado aqui)"""
+        with self._lock:
+            current = self._reservations.get(pin)
+            # O mesmo dono já usa o pino neste processo (ex.: daemon local em simulação)
+            if current is not None and current.owner == owner:
+                return current
+            return self._reserve(pin, owner, "external", managed=False)
+
+    def release(self, pin: int, owner: str):
+        with self._lock:
+            current = self._reservations.get(pin)
+            if current is None or current.owner != owner:
+                return
+            del self._reservations[pin]
+            self._pwm.pop(pin, None)
+            if current.managed and GPIO_AVAILABLE:
+                try:
+                    GPIO.cleanup(current.channel)
+                except Exception as e:
+                    print(f"[HAL] Erro ao liberar pino {pin}: {e}")
+
+    def reservations(self) -> List[dict]:
+        with self._lock:
+            return [self._reservations[pin].to_dict() for pin in sorted(self._reservations)]
+
+    def stats(self) -> dict:
+        return {"writes": self.writes, "skipped_writes": self.skipped_writes}
+
+    def owner(self, pin: int) -> Optional[str]:
+        reservation = self._reservations.get(pin)
+        return reservation.owner if reservation else None
+
+    # ---------- Handles ----------
+
+    def led(self, pin: int, owner: str = "led") -> LEDHandle:
+        return LEDHandle(self, self._reserve(pin, owner, "out"))
+
+    def pwm(self, pin: int, frequency: float, owner: str = "pwm") -> PWMHandle:
+        return self._pwm_handle(PWMHandle, pin, owner, frequency)
+
+    def servo(self, pin: int, owner: str = "servo") -> ServoHandle:
+        return self._pwm_handle(ServoHandle, pin, owner, ServoHandle.FREQUENCY)
+
+    def _pwm_handle(self, cls, pin: int, owner: str, frequency: float):
+        with self._lock:
+            handle = self._pwm.get(pin)
+            if handle is not None and self.owner(pin) == owner:
+                return handle
+            handle = cls(self, self._reserve(pin, owner, "pwm"), frequency)
+            self._pwm[pin] = handle
+            return handle
+
+    def button(self, pin: int, owner: str = "button", active_low: bool = True) -> ButtonHandle:
+        pull = None
+        if GPIO_AVAILABLE:
+            pull = GPIO.PUD_UP if active_low else GPIO.PUD_DOWN
+        return ButtonHandle(self, self._reserve(pin, owner, "in", pull=pull), active_low)
+
+    def spi_device(self, owner: str, bus: int = 0, device: int = 0,
+                   pins: Optional[Dict[str, int]] = None) -> SPIDeviceHandle:
+        """Reserva barramento, chip select e pinos auxiliares de um dispositivo SPI"""
+        with self._lock:
+            for pin in SPI_BUS_PINS[bus]:
+                self._reserve(pin, f"spi{bus}", "spi", managed=False)
+            device_pins = {"ce": SPI_CE_PINS[bus][device], **(pins or {})}
+            for pin in device_pins.values():
+                self._reserve(pin, owner, "spi", managed=False)
+            return SPIDeviceHandle(self, owner, bus, device, device_pins)
+
+    def cleanup(self):
+        """Para os PWMs e libera todos os pinos configurados por este HAL"""
+        with self._lock:
+            for handle in list(self._pwm.values()):
+                handle.stop()
+            self._pwm.clear()
+            self._reservations.clear()
+            if GPIO_AVAILABLE:
+                try:
+                    GPIO.cleanup()
+                except Exception as e:
+                    print(f"[HAL] Erro no cleanup do GPIO: {e}")
+            self.mode = None
+
+
+# Instância global
+_hal: Optional[HAL] = None
+_hal_lock = threading.Lock()
+
+def get_hal() -> HAL:
+    """Retorna o HAL do processo (criado no primeiro uso)"""
+    global _hal
+    if _hal is None:
+        with _hal_lock:
+            if _hal is None:
+                _hal = HAL()
+    return _hal
+
+def cleanup_hal():
+    """Libera o GPIO e descarta o HAL"""
+    global _hal
+    with _hal_lock:
+        if _hal:
+            _hal.cleanup()
+            _hal = None
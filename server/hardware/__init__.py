@@ -0,0 +1,50 @@
+"""
+Backend de hardware plugável
+
+Seleciona, pela variável de ambiente HW_BACKEND, entre as bibliotecas reais
+(RPi.GPIO, pirc522, adafruit_ssd1306) e os simuladores deste pacote:
+
+    HW_BACKEND=real  (padrão) -> bibliotecas da Raspberry Pi
+    HW_BACKEND=fake           -> GPIO simulado, RC522 com timeline de tags e
+                                 framebuffer SSD1306 em memória
+
+Com o backend simulado o servidor e a aplicação dos nós rodam, são testados
+sob carga e perfilados em uma máquina Linux comum.
+"""
+
+import os
+
+HW_BACKEND = os.getenv("HW_BACKEND", "real").lower()
+
+
+def is_fake() -> bool:
+    return HW_BACKEND == "fake"
+
+
+def load_gpio():
+    """Retorna o módulo RPi.GPIO ou o GPIO simulado"""
+    if is_fake():
+        from hardware.fake_gpio import GPIO
+        return GPIO
+    import RPi.GPIO as GPIO
+    return GPIO
+
+
+def load_rfid_class():
+    """Retorna a classe pirc522.RFID ou o RC522 simulado"""
+    if is_fake():
+        from hardware.fake_rc522 import FakeRC522
+        return FakeRC522
+    from pirc522 import RFID
+    return RFID
+
+
+def load_ssd1306():
+    """Retorna os módulos (adafruit_ssd1306, busio, board) ou o display simulado"""
+    if is_fake():
+        from hardware import fake_ssd1306
+        return fake_ssd1306, fake_ssd1306, fake_ssd1306
+    import adafruit_ssd1306
+    import busio
+    import board
+    return adafruit_ssd1306, busio, board
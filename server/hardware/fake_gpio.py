@@ -0,0 +1,367 @@
+"""
+RPi.GPIO simulado
+
+Reproduz a API e as mensagens de erro do RPi.GPIO (modo de numeração, direção
+dos pinos, PWM e detecção de bordas) sem acessar hardware. O estado é mantido
+por pino BCM, com histórico das escritas e do duty cycle do PWM para inspeção
+em testes e benchmarks.
+
+Entradas externas (botões, sensores) são simuladas com GPIO.set_input(pino, valor),
+que gera as bordas e dispara os callbacks registrados com add_event_detect.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# Pino físico (BOARD) -> BCM
+_BOARD_TO_BCM = {
+    3: 2, 5: 3, 7: 4, 8: 14, 10: 15, 11: 17, 12: 18, 13: 27, 15: 22, 16: 23,
+    18: 24, 19: 10, 21: 9, 22: 25, 23: 11, 24: 8, 26: 7, 27: 0, 28: 1, 29: 5,
+    31: 6, 32: 12, 33: 13, 35: 19, 36: 16, 37: 26, 38: 20, 40: 21,
+}
+
+HISTORY_SIZE = 1000
+
+
+class _Pin:
+    """Estado de um pino BCM"""
+
+    def __init__(self, bcm: int):
+        self.bcm = bcm
+        self.direction: Optional[int] = None
+        self.pull = FakeGPIO.PUD_OFF
+        self.value = 0
+        self.edge: Optional[int] = None
+        self.callbacks: List[Callable[[int], None]] = []
+        self.bouncetime = 0.0
+        self.last_event = 0.0
+        self.event_flag = False
+        self.pwm: Optional["FakePWM"] = None
+        self.writes = 0
+        self.history = deque(maxlen=HISTORY_SIZE)
+
+
+class FakePWM:
+    """Equivalente a RPi.GPIO.PWM com histórico do duty cycle"""
+
+    def __init__(self, gpio: "FakeGPIO", channel: int, frequency: float):
+        pin = gpio._setup_pin(channel)
+        if pin.direction != FakeGPIO.OUT:
+            raise RuntimeError("You must setup() the GPIO channel as an output first")
+        if pin.pwm is not None:
+            raise RuntimeError("A PWM object already exists for this GPIO channel")
+        if frequency <= 0.0:
+            raise ValueError("frequency must be greater than 0.0")
+        self._gpio = gpio
+        self._pin = pin
+        self.channel = channel
+        self.frequency = frequency
+        self.duty_cycle = 0.0
+        self.running = False
+        self.history = deque(maxlen=HISTORY_SIZE)
+        pin.pwm = self
+
+    def _record(self):
+        self.history.append((time.monotonic(), self.duty_cycle if self.running else None))
+
+    def start(self, dutycycle: float):
+        self._check_duty(dutycycle)
+        self.duty_cycle = float(dutycycle)
+        self.running = True
+        self._record()
+
+    def ChangeDutyCycle(self, dutycycle: float):
+        self._check_duty(dutycycle)
+        self.duty_cycle = float(dutycycle)
+        self._record()
+
+    def ChangeFrequency(self, frequency: float):
+        if frequency <= 0.0:
+            raise ValueError("frequency must be greater than 0.0")
+        self.frequency = frequency
+
+    def stop(self):
+        if self.running:
+            self.running = False
+            self._record()
+
+    def __del__(self):
+        try:
+            if self._pin.pwm is self:
+                self._pin.pwm = None
+        except AttributeError:
+            pass
+
+    @staticmethod
+    def _check_duty(dutycycle: float):
+        if dutycycle < 0.0 or dutycycle > 100.0:
+            raise ValueError("dutycycle must have a value from 0.0 to 100.0")
+
+
+class FakeGPIO:
+    """Substituto do módulo RPi.GPIO (use a instância global GPIO)"""
+
+    BOARD = 10
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+    HARD_PWM = 43
+    SERIAL = 40
+    SPI = 41
+    I2C = 42
+    UNKNOWN = -1
+
+    VERSION = "0.7.1a4 (simulado)"
+    RPI_INFO = {"P1_REVISION": 3, "REVISION": "fake", "TYPE": "Simulado",
+                "MANUFACTURER": "Simulado", "PROCESSOR": "Simulado", "RAM": "Simulado"}
+    RPI_REVISION = 3
+
+    PWM = None  # definido em __init__ (fábrica ligada à instância)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._mode: Optional[int] = None
+        self._warnings = True
+        self._pins: Dict[int, _Pin] = {}
+        self._callbacks: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._callback_thread: Optional[threading.Thread] = None
+        self.PWM = lambda channel, frequency: FakePWM(self, channel, frequency)
+
+    # ---------- Numeração ----------
+
+    def setmode(self, mode: int):
+        if mode not in (self.BOARD, self.BCM):
+            raise ValueError("An invalid mode was passed to setmode()")
+        with self._lock:
+            if self._mode is not None and self._mode != mode:
+                raise ValueError("A different mode has already been set!")
+            self._mode = mode
+
+    def getmode(self) -> Optional[int]:
+        return self._mode
+
+    def setwarnings(self, flag: bool):
+        self._warnings = bool(flag)
+
+    def _to_bcm(self, channel: int) -> int:
+        if self._mode is None:
+            raise RuntimeError("Please set pin numbering mode using GPIO.setmode(GPIO.BOARD) "
+                               "or GPIO.setmode(GPIO.BCM)")
+        if self._mode == self.BOARD:
+            if channel not in _BOARD_TO_BCM:
+                raise ValueError("The channel sent is invalid on a Raspberry Pi")
+            return _BOARD_TO_BCM[channel]
+        if not 0 <= channel <= 27:
+            raise ValueError("The channel sent is invalid on a Raspberry Pi")
+        return channel
+
+    def _setup_pin(self, channel: int) -> _Pin:
+        pin = self._pins.get(self._to_bcm(channel))
+        if pin is None or pin.direction is None:
+            raise RuntimeError("You must setup() the GPIO channel first")
+        return pin
+
+    # ---------- Configuração e E/S ----------
+
+    def setup(self, channel, direction: int, pull_up_down: int = PUD_OFF, initial: int = -1):
+        if isinstance(channel, (list, tuple)):
+            for item in channel:
+                self.setup(item, direction, pull_up_down, initial)
+            return
+        if direction not in (self.IN, self.OUT):
+            raise ValueError("An invalid direction was passed to setup()")
+        if direction == self.OUT and pull_up_down != self.PUD_OFF:
+            raise ValueError("pull_up_down parameter is not valid for outputs")
+        with self._lock:
+            bcm = self._to_bcm(channel)
+            pin = self._pins.get(bcm)
+            if pin is None:
+                pin = self._pins[bcm] = _Pin(bcm)
+            elif pin.direction is not None and self._warnings:
+                print(f"RuntimeWarning: This channel ({channel}) is already in use, continuing anyway.")
+            pin.direction = direction
+            pin.pull = pull_up_down
+            if direction == self.IN:
+                pin.value = 1 if pull_up_down == self.PUD_UP else 0
+            elif initial != -1:
+                self._write(pin, initial)
+
+    def _write(self, pin: _Pin, value):
+        pin.value = 1 if value else 0
+        pin.writes += 1
+        pin.history.append((time.monotonic(), pin.value))
+
+    def output(self, channel, value):
+        if isinstance(channel, (list, tuple)):
+            values = value if isinstance(value, (list, tuple)) else [value] * len(channel)
+            if len(values) != len(channel):
+                raise RuntimeError("Number of channels != number of values")
+            for item, item_value in zip(channel, values):
+                self.output(item, item_value)
+            return
+        with self._lock:
+            pin = self._setup_pin(channel)
+            if pin.direction != self.OUT:
+                raise RuntimeError("The GPIO channel has not been set up as an OUTPUT")
+            self._write(pin, value)
+
+    def input(self, channel) -> int:
+        with self._lock:
+            return self._setup_pin(channel).value
+
+    def gpio_function(self, channel) -> int:
+        with self._lock:
+            pin = self._pins.get(self._to_bcm(channel))
+            if pin is None or pin.direction is None:
+                return self.IN
+            return pin.direction
+
+    def cleanup(self, channel=None):
+        with self._lock:
+            if channel is None:
+                for pin in self._pins.values():
+                    if pin.pwm:
+                        pin.pwm.stop()
+                self._pins.clear()
+                self._mode = None
+                return
+            channels = channel if isinstance(channel, (list, tuple)) else [channel]
+            for item in channels:
+                pin = self._pins.pop(self._to_bcm(item), None)
+                if pin and pin.pwm:
+                    pin.pwm.stop()
+
+    # ---------- Detecção de bordas ----------
+
+    def add_event_detect(self, channel, edge: int, callback: Optional[Callable] = None,
+                         bouncetime: Optional[int] = None):
+        if edge not in (self.RISING, self.FALLING, self.BOTH):
+            raise ValueError("The edge must be set to RISING, FALLING or BOTH")
+        with self._lock:
+            pin = self._setup_pin(channel)
+            if pin.direction != self.IN:
+                raise RuntimeError("You must setup() the GPIO channel as an input first")
+            if pin.edge is not None:
+                raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+            pin.edge = edge
+            pin.bouncetime = (bouncetime or 0) / 1000.0
+            pin.callbacks = [callback] if callback else []
+            pin.event_flag = False
+
+    def add_event_callback(self, channel, callback: Callable):
+        with self._lock:
+            pin = self._setup_pin(channel)
+            if pin.edge is None:
+                raise RuntimeError("Add event detection using add_event_detect first before adding a callback")
+            pin.callbacks.append(callback)
+
+    def remove_event_detect(self, channel):
+        with self._lock:
+            pin = self._setup_pin(channel)
+            pin.edge = None
+            pin.callbacks = []
+            pin.event_flag = False
+
+    def event_detected(self, channel) -> bool:
+        with self._lock:
+            pin = self._setup_pin(channel)
+            detected, pin.event_flag = pin.event_flag, False
+            return detected
+
+    def wait_for_edge(self, channel, edge: int, bouncetime: Optional[int] = None,
+                      timeout: Optional[int] = None):
+        """Aguarda a borda (timeout em ms); retorna o canal ou None"""
+        deadline = None if timeout is None else time.monotonic() + timeout / 1000.0
+        with self._lock:
+            previous = self._setup_pin(channel).value
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(0.001)
+            with self._lock:
+                value = self._setup_pin(channel).value
+            if value != previous and self._matches(edge, value):
+                return channel
+            previous = value
+        return None
+
+    def _matches(self, edge: int, value: int) -> bool:
+        return edge == self.BOTH or (edge == self.RISING) == (value == 1)
+
+    # ---------- Controle externo (exclusivo da simulação) ----------
+
+    def set_input(self, channel, value):
+        """Simula um sinal externo no pino de entrada, gerando bordas e callbacks"""
+        value = 1 if value else 0
+        with self._lock:
+            pin = self._setup_pin(channel)
+            if pin.direction != self.IN:
+                raise RuntimeError("set_input() só se aplica a pinos de entrada")
+            if pin.value == value:
+                return
+            pin.value = value
+            pin.history.append((time.monotonic(), value))
+            if pin.edge is None or not self._matches(pin.edge, value):
+                return
+            now = time.monotonic()
+            if pin.bouncetime and now - pin.last_event < pin.bouncetime:
+                return
+            pin.last_event = now
+            pin.event_flag = True
+            callbacks = list(pin.callbacks)
+        # Como no RPi.GPIO, callbacks rodam em uma única thread separada
+        for callback in callbacks:
+            self._dispatch(callback, channel)
+
+    def _dispatch(self, callback: Callable, channel):
+        if self._callback_thread is None:
+            self._callback_thread = threading.Thread(target=self._callback_loop,
+                                                     name="fake-gpio-callbacks", daemon=True)
+            self._callback_thread.start()
+        self._callbacks.put((callback, channel))
+
+    def _callback_loop(self):
+        while True:
+            callback, channel = self._callbacks.get()
+            try:
+                callback(channel)
+            except Exception as e:
+                print(f"[Fake GPIO] Erro no callback do pino {channel}: {e}")
+
+    def press(self, channel, duration: float = 0.05, active_low: bool = True):
+        """Atalho para simular o pressionar/soltar de um botão"""
+        self.set_input(channel, 0 if active_low else 1)
+        time.sleep(duration)
+        self.set_input(channel, 1 if active_low else 0)
+
+    def pin_state(self, bcm: int) -> Optional[dict]:
+        """Estado de um pino BCM (direção, valor, escritas, PWM)"""
+        with self._lock:
+            pin = self._pins.get(bcm)
+            if pin is None:
+                return None
+            return {
+                "bcm": bcm,
+                "direction": {self.IN: "in", self.OUT: "out"}.get(pin.direction),
+                "value": pin.value,
+                "writes": pin.writes,
+                "pwm_duty": pin.pwm.duty_cycle if pin.pwm and pin.pwm.running else None,
+            }
+
+    def reset(self):
+        """Volta ao estado inicial (sem modo e sem pinos configurados)"""
+        self.cleanup()
+        self._warnings = True
+
+
+# Instância usada no lugar do módulo RPi.GPIO
+GPIO = FakeGPIO()
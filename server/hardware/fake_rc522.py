@@ -0,0 +1,192 @@
+"""
+Leitor RC522 simulado (compatível com pirc522.RFID)
+
+As tags aparecem sobre a leitora segundo uma linha do tempo, carregada de um
+arquivo de roteiro (variável FAKE_RC522_SCRIPT) ou montada por código com
+present(). Formato do roteiro, uma tag por linha:
+
+    # offset_s  UID          [hold_s]
+    0.5         DE-AD-BE-EF  0.8
+    2.0         04-A1-B2-C3
+
+O offset é contado a partir da criação do leitor; hold_s (padrão 0.5s) é o
+tempo que a tag permanece no campo. Com FAKE_RC522_LOOP=1 o roteiro se repete.
+UIDs de 4 bytes recebem o byte de verificação (BCC), como no anticoll real.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+DEFAULT_HOLD = 0.5
+
+
+def parse_uid(text: str) -> List[int]:
+    """'DE-AD-BE-EF' / 'DE:AD:BE:EF' / 'DEADBEEF' -> bytes do anticoll (com BCC)"""
+    cleaned = text.replace("-", "").replace(":", "").strip()
+    if len(cleaned) % 2 or not cleaned:
+        raise ValueError(f"UID inválido: {text}")
+    uid = [int(cleaned[i:i + 2], 16) for i in range(0, len(cleaned), 2)]
+    if len(uid) == 4:
+        bcc = 0
+        for byte in uid:
+            bcc ^= byte
+        uid.append(bcc)
+    return uid
+
+
+def load_script(path: str) -> List[Tuple[float, List[int], float]]:
+    """Lê o roteiro (offset, uid, hold) ordenado pelo offset"""
+    entries = []
+    with open(path) as script:
+        for number, line in enumerate(script, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            try:
+                hold = float(fields[2]) if len(fields) > 2 else DEFAULT_HOLD
+                entries.append((float(fields[0]), parse_uid(fields[1]), hold))
+            except (IndexError, ValueError) as e:
+                raise ValueError(f"{path}:{number}: linha inválida ({e})")
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+class _FakeRFIDUtil:
+    """Equivalente a pirc522.RFIDUtil (apenas o que o servidor usa)"""
+
+    def __init__(self, reader: "FakeRC522"):
+        self.reader = reader
+        self.debug = False
+        self.uid = None
+
+    def set_tag(self, uid):
+        self.uid = uid
+
+    def auth(self, auth_method, key):
+        pass
+
+    def deauth(self):
+        pass
+
+
+class FakeRC522:
+    """Substituto de pirc522.RFID com tags em linha do tempo"""
+
+    def __init__(self, bus: int = 0, device: int = 0, speed: int = 1000000,
+                 pin_rst=None, pin_ce: int = 0, pin_irq=None, pin_mode=None,
+                 antenna_gain: int = 3, script: Optional[str] = None, loop: Optional[bool] = None):
+        self._lock = threading.Condition()
+        self._origin = time.monotonic()
+        self._timeline = deque()  # (início, fim, uid) ordenado pelo início
+        self._closed = False
+        self.requests = 0
+        self.reads = 0
+
+        script = script or os.getenv("FAKE_RC522_SCRIPT")
+        self.loop = os.getenv("FAKE_RC522_LOOP", "0") == "1" if loop is None else loop
+        self._script: List[Tuple[float, List[int], float]] = []
+        self._script_period = 0.0
+        if script:
+            self._script = load_script(script)
+            self._script_period = max(offset + hold for offset, _, hold in self._script) if self._script else 0.0
+            self._schedule_script(self._origin)
+            print(f"[Fake RC522] Roteiro carregado: {script} ({len(self._script)} tags)")
+
+    def _schedule_script(self, origin: float):
+        for offset, uid, hold in self._script:
+            self._timeline.append((origin + offset, origin + offset + hold, uid))
+
+    # ---------- Controle da simulação ----------
+
+    def present(self, uid, hold: float = DEFAULT_HOLD, delay: float = 0.0):
+        """Coloca a tag sobre a leitora daqui a delay segundos, por hold segundos"""
+        uid = parse_uid(uid) if isinstance(uid, str) else list(uid)
+        start = time.monotonic() + delay
+        with self._lock:
+            # Mantém a linha do tempo ordenada pelo início
+            if self._timeline and self._timeline[-1][0] > start:
+                items = sorted(list(self._timeline) + [(start, start + hold, uid)], key=lambda item: item[0])
+                self._timeline = deque(items)
+            else:
+                self._timeline.append((start, start + hold, uid))
+            self._lock.notify_all()
+
+    def remove(self):
+        """Retira da leitora todas as tags presentes agora"""
+        now = time.monotonic()
+        with self._lock:
+            self._timeline = deque(item for item in self._timeline if item[0] > now)
+
+    def _current(self) -> Optional[List[int]]:
+        now = time.monotonic()
+        timeline = self._timeline
+        while True:
+            while timeline and timeline[0][1] <= now:
+                timeline.popleft()
+            if timeline or not (self.loop and self._script_period > 0):
+                break
+            # Roteiro esgotado: repete a partir do ciclo atual
+            cycles = max(1, int((now - self._origin) // self._script_period))
+            self._origin += cycles * self._script_period
+            self._schedule_script(self._origin)
+        for start, end, uid in timeline:
+            if start > now:
+                break
+            if end > now:
+                return uid
+        return None
+
+    def _next_start(self) -> Optional[float]:
+        return self._timeline[0][0] if self._timeline else None
+
+    # ---------- API do pirc522 ----------
+
+    def wait_for_tag(self, timeout: float = 0):
+        """Bloqueia até haver tag no campo (timeout em segundos, 0 = sem limite)"""
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            while not self._closed and self._current() is None:
+                wake = self._next_start()
+                now = time.monotonic()
+                if deadline is not None:
+                    if now >= deadline:
+                        return
+                    wake = deadline if wake is None else min(wake, deadline)
+                self._lock.wait(None if wake is None else max(0.0, wake - now))
+
+    def request(self, req_mode: int = 0x26) -> Tuple[bool, Optional[int]]:
+        with self._lock:
+            self.requests += 1
+            if self._current() is None:
+                return True, None
+            return False, 0x10
+
+    def anticoll(self) -> Tuple[bool, Optional[List[int]]]:
+        with self._lock:
+            uid = self._current()
+            if uid is None:
+                return True, None
+            self.reads += 1
+            return False, list(uid)
+
+    def select_tag(self, uid) -> bool:
+        with self._lock:
+            return self._current() != list(uid)
+
+    def card_auth(self, auth_mode, block_address, key, uid) -> bool:
+        return False
+
+    def stop_crypto(self):
+        pass
+
+    def util(self) -> _FakeRFIDUtil:
+        return _FakeRFIDUtil(self)
+
+    def cleanup(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
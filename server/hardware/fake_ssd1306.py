@@ -0,0 +1,129 @@
+"""
+Display OLED SSD1306 simulado (framebuffer em memória)
+
+Substitui adafruit_ssd1306, busio e board: SSD1306_I2C mantém o framebuffer no
+mesmo layout de páginas do controlador (1 byte = 8 pixels verticais) e, a cada
+show(), copia o buffer para o quadro "exibido", que pode ser inspecionado em
+testes (pixel(), displayed_pixel(), to_text()).
+"""
+
+import threading
+import time
+from typing import Optional
+
+# Pinos do barramento I2C (equivalentes a board.SCL / board.SDA)
+SCL = 3
+SDA = 2
+
+
+class I2C:
+    """Equivalente a busio.I2C"""
+
+    def __init__(self, scl=SCL, sda=SDA, frequency: int = 100000):
+        self.scl = scl
+        self.sda = sda
+        self.frequency = frequency
+
+    def deinit(self):
+        pass
+
+
+class SSD1306_I2C:
+    """Equivalente a adafruit_ssd1306.SSD1306_I2C"""
+
+    def __init__(self, width: int, height: int, i2c: I2C, *, addr: int = 0x3C,
+                 external_vcc: bool = False, reset=None, page_addressing: bool = False):
+        if height % 8:
+            raise ValueError("A altura do display deve ser múltipla de 8")
+        self.width = width
+        self.height = height
+        self.i2c = i2c
+        self.addr = addr
+        self.pages = height // 8
+        self.buffer = bytearray(self.pages * width)
+        self.displayed = bytes(self.buffer)
+        self.powered = True
+        self.inverted = False
+        self.contrast_level = 0xFF
+        self.show_count = 0
+        self.last_show: Optional[float] = None
+        self._lock = threading.Lock()
+
+    # ---------- Desenho ----------
+
+    def fill(self, color: int):
+        value = 0xFF if color else 0x00
+        self.buffer[:] = bytes([value]) * len(self.buffer)
+
+    def pixel(self, x: int, y: int, color: Optional[int] = None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        index = (y // 8) * self.width + x
+        bit = 1 << (y % 8)
+        if color is None:
+            return 1 if self.buffer[index] & bit else 0
+        if color:
+            self.buffer[index] |= bit
+        else:
+            self.buffer[index] &= ~bit & 0xFF
+        return None
+
+    def image(self, img):
+        """Copia uma imagem PIL modo '1' do tamanho do display para o buffer"""
+        if img.mode != "1":
+            raise ValueError("Image must be in mode 1.")
+        if img.size != (self.width, self.height):
+            raise ValueError(
+                f"Image must be same dimensions as display ({self.width}x{self.height})."
+            )
+        pixels = img.load()
+        buffer = self.buffer
+        width = self.width
+        for page in range(self.pages):
+            base_y = page * 8
+            offset = page * width
+            for x in range(width):
+                bits = 0
+                for bit in range(8):
+                    if pixels[x, base_y + bit]:
+                        bits |= 1 << bit
+                buffer[offset + x] = bits
+
+    def show(self):
+        with self._lock:
+            self.displayed = bytes(self.buffer)
+            self.show_count += 1
+            self.last_show = time.monotonic()
+
+    # ---------- Controle do painel ----------
+
+    def poweroff(self):
+        self.powered = False
+
+    def poweron(self):
+        self.powered = True
+
+    def invert(self, invert: bool):
+        self.inverted = bool(invert)
+
+    def contrast(self, contrast: int):
+        self.contrast_level = contrast & 0xFF
+
+    # ---------- Inspeção (exclusivo da simulação) ----------
+
+    def displayed_pixel(self, x: int, y: int) -> int:
+        """Pixel do último quadro enviado com show()"""
+        with self._lock:
+            byte = self.displayed[(y // 8) * self.width + x]
+        return 1 if byte & (1 << (y % 8)) else 0
+
+    def to_text(self, on: str = "#", off: str = ".") -> str:
+        """Último quadro exibido em texto (uma linha por linha de pixels)"""
+        with self._lock:
+            frame = self.displayed
+        lines = []
+        for y in range(self.height):
+            index = (y // 8) * self.width
+            bit = 1 << (y % 8)
+            lines.append("".join(on if frame[index + x] & bit else off for x in range(self.width)))
+        return "\n".join(lines)
@@ -0,0 +1,227 @@
+"""
+Executor de comandos de hardware
+
+Uma única thread executa todas as operações de GPIO da API (LEDs e padrões),
+recebendo comandos por uma fila limitada. Cada comando tem um prazo: se ficar
+na fila além dele é descartado sem executar, e quem o enviou recebe
+HardwareTimeoutError. Com a fila cheia o envio falha na hora com
+HardwareBusyError. Os endpoints aguardam o Future do comando (await), então
+uma chamada de GPIO travada não prende as threads do servidor nem atrasa o
+restante da API; apenas os comandos de hardware acumulam, até o limite da fila.
+
+O leitor RC522 continua com o GPIO do próprio driver (pirc522) e o servo é
+acionado pelo servo_daemon.py em outro processo.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+DEFAULT_TIMEOUT = 1.0  # prazo padrão de um comando (s)
+
+_STOP = object()
+
+
+class HardwareBusyError(RuntimeError):
+    """Fila de comandos de hardware cheia"""
+
+
+class HardwareTimeoutError(TimeoutError):
+    """Comando de hardware não concluído dentro do prazo"""
+
+
+class _Command:
+    __slots__ = ("name", "fn", "args", "kwargs", "deadline", "future", "submitted_at")
+
+    def __init__(self, name: str, fn: Callable, args: tuple, kwargs: dict, deadline: float):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.deadline = deadline
+        self.future: Future = Future()
+        self.submitted_at = time.monotonic()
+
+
+class HardwareExecutor:
+    """Thread única dona do GPIO, com fila limitada e prazo por comando"""
+
+    def __init__(self, max_queue: int = 64, default_timeout: float = DEFAULT_TIMEOUT):
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="hw-executor", daemon=True)
+        self._current: Optional[_Command] = None
+        self._current_started = 0.0
+        self.running = True
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0   # fila cheia
+        self.expired = 0    # prazo venceu antes de executar
+        self.timeouts = 0   # quem enviou desistiu de aguardar
+        self.max_depth = 0
+        self.last_exec_ms = 0.0
+        self.max_exec_ms = 0.0
+        self.max_wait_ms = 0.0
+        self._thread.start()
+
+    def submit(self, fn: Callable, *args, timeout: Optional[float] = None,
+               name: Optional[str] = None, **kwargs) -> Future:
+        """
+        Enfileira fn(*args, **kwargs) para a thread de hardware
+
+        Raises:
+            HardwareBusyError: fila cheia
+        """
+        if not self.running:
+            raise HardwareBusyError("Executor de hardware parado")
+        timeout = self.default_timeout if timeout is None else timeout
+        command = _Command(name or getattr(fn, "__name__", "command"), fn, args, kwargs,
+                           time.monotonic() + timeout)
+        try:
+            self._queue.put_nowait(command)
+        except queue.Full:
+            self.rejected += 1
+            raise HardwareBusyError(f"Fila de hardware cheia ({self.max_queue} comandos)")
+        self.submitted += 1
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return command.future
+
+    def post(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> bool:
+        """Enfileira sem aguardar (ex.: passos de padrões); False se a fila estiver cheia"""
+        try:
+            future = self.submit(fn, *args, timeout=timeout, **kwargs)
+        except HardwareBusyError:
+            return False
+        future.add_done_callback(self._log_failure)
+        return True
+
+    @staticmethod
+    def _log_failure(future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"[HW Executor] Comando sem retorno falhou: {future.exception()}")
+
+    def call(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Executa e aguarda de forma síncrona (para código fora do event loop)"""
+        timeout = self.default_timeout if timeout is None else timeout
+        future = self.submit(fn, *args, timeout=timeout, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except HardwareTimeoutError:
+            # Prazo vencido na fila: já contado em expired, repassa sem alterar
+            raise
+        except TimeoutError:
+            raise self._gave_up(future, timeout)
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Executa e aguarda sem bloquear o event loop (para endpoints async)"""
+        timeout = self.default_timeout if timeout is None else timeout
+        future = self.submit(fn, *args, timeout=timeout, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except HardwareTimeoutError:
+            # Prazo vencido na fila: já contado em expired, repassa sem alterar
+            raise
+        except asyncio.TimeoutError:
+            raise self._gave_up(future, timeout)
+
+    def _gave_up(self, future: Future, timeout: float) -> HardwareTimeoutError:
+        # Ainda na fila: cancelado e não será executado
+        future.cancel()
+        self.timeouts += 1
+        return HardwareTimeoutError(f"Comando de hardware não concluído em {timeout:.2f}s")
+
+    def _run(self):
+        while True:
+            command = self._queue.get()
+            if command is _STOP:
+                return
+            now = time.monotonic()
+            wait_ms = (now - command.submitted_at) * 1000.0
+            if wait_ms > self.max_wait_ms:
+                self.max_wait_ms = wait_ms
+            if now > command.deadline:
+                self.expired += 1
+                if command.future.set_running_or_notify_cancel():
+                    command.future.set_exception(
+                        HardwareTimeoutError(f"Prazo de '{command.name}' venceu na fila ({wait_ms:.0f}ms)")
+                    )
+                continue
+            if not command.future.set_running_or_notify_cancel():
+                continue
+
+            self._current = command
+            self._current_started = now
+            try:
+                result = command.fn(*command.args, **command.kwargs)
+            except BaseException as e:
+                self.failed += 1
+                command.future.set_exception(e)
+            else:
+                self.completed += 1
+                command.future.set_result(result)
+            finally:
+                self._current = None
+                self.last_exec_ms = (time.monotonic() - now) * 1000.0
+                if self.last_exec_ms > self.max_exec_ms:
+                    self.max_exec_ms = self.last_exec_ms
+
+    def stop(self, timeout: float = 2.0):
+        """Executa o que já está na fila e para a thread"""
+        if not self.running:
+            return
+        self.running = False
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def get_stats(self) -> dict:
+        current = self._current
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "max_depth": self.max_depth,
+            "default_timeout_s": self.default_timeout,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "timeouts": self.timeouts,
+            "last_exec_ms": round(self.last_exec_ms, 3),
+            "max_exec_ms": round(self.max_exec_ms, 3),
+            "max_queue_wait_ms": round(self.max_wait_ms, 3),
+            # Comando em execução agora e há quanto tempo (detecta GPIO travado)
+            "current": {
+                "name": current.name,
+                "running_ms": round((time.monotonic() - self._current_started) * 1000.0, 1),
+            } if current else None,
+        }
+
+
+# Instância global
+_hw_executor: Optional[HardwareExecutor] = None
+
+def init_hw_executor(max_queue: int = 64, default_timeout: float = DEFAULT_TIMEOUT) -> HardwareExecutor:
+    """Inicializa o executor global de comandos de hardware"""
+    global _hw_executor
+    _hw_executor = HardwareExecutor(max_queue, default_timeout)
+    return _hw_executor
+
+def get_hw_executor() -> Optional[HardwareExecutor]:
+    """Retorna a instância global do executor de hardware"""
+    return _hw_executor
+
+def cleanup_hw_executor():
+    """Para o executor após concluir os comandos enfileirados"""
+    global _hw_executor
+    if _hw_executor:
+        _hw_executor.stop()
+        _hw_executor = None
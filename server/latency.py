@@ -0,0 +1,166 @@
+"""
+Instrumentação de latência tag -> porta
+
+Cada leitura RFID carrega um LatencyTrace com timestamps monotônicos de cada
+estágio (detecção, nome, decisão, comando do atuador, atuador concluído,
+persistência). "actuator_done" é o ack do daemon, enviado depois que o pulso
+do servo foi aplicado (início do movimento), não só o envio pelo socket. Ao completar, os tempos desde a detecção são registrados em
+histogramas por estágio e o evento entra na janela de eventos recentes, da
+qual são extraídos os mais lentos com o detalhamento completo.
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+STAGES = ("detect", "name_lookup", "decision", "actuator_command", "actuator_done", "db_persist")
+
+# Limites superiores dos buckets em microssegundos (10µs .. ~42s, escala log2)
+_BUCKET_BOUNDS_US = tuple(10 * 2 ** i for i in range(23))
+
+_trace_ids = itertools.count(1)
+
+
+class LatencyHistogram:
+    """Histograma de latências com buckets exponenciais"""
+
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKET_BOUNDS_US) + 1)
+        self.count = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+
+    def record(self, value_us: float):
+        index = 0
+        for bound in _BUCKET_BOUNDS_US:
+            if value_us <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_us += value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Estimativa do percentil (limite superior do bucket)"""
+        if not self.count:
+            return None
+        target = pct / 100.0 * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                if index < len(_BUCKET_BOUNDS_US):
+                    return float(min(_BUCKET_BOUNDS_US[index], self.max_us))
+                return self.max_us
+        return self.max_us
+
+    def to_dict(self) -> dict:
+        def ms(value):
+            return round(value / 1000.0, 3) if value is not None else None
+
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.total_us / self.count) if self.count else None,
+            "p50_ms": ms(self.percentile(50)),
+            "p90_ms": ms(self.percentile(90)),
+            "p99_ms": ms(self.percentile(99)),
+            "max_ms": ms(self.max_us) if self.count else None,
+            "buckets": [
+                {"le_ms": bound / 1000.0, "count": count}
+                for bound, count in zip(_BUCKET_BOUNDS_US + (float("inf"),), self.counts)
+                if count
+            ],
+        }
+
+
+class LatencyTrace:
+    """Timestamps monotônicos de um evento ao longo dos estágios"""
+
+    def __init__(self, recorder: "LatencyRecorder", label: str = ""):
+        self.trace_id = next(_trace_ids)
+        self.label = label
+        self.recorder = recorder
+        self.marks: Dict[str, int] = {"detect": time.monotonic_ns()}
+        self._pending = {"db_persist"}
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def expect(self, stage: str):
+        """Indica que o evento só termina quando este estágio for marcado"""
+        with self._lock:
+            if stage not in self.marks:
+                self._pending.add(stage)
+
+    def mark(self, stage: str):
+        """Registra o instante em que o estágio foi concluído"""
+        now = time.monotonic_ns()
+        with self._lock:
+            if self._finished:
+                return
+            self.marks[stage] = now
+            self._pending.discard(stage)
+            done = not self._pending
+            if done:
+                self._finished = True
+        if done:
+            self.recorder.finish(self)
+
+    def breakdown(self) -> dict:
+        """Tempo (ms) de cada estágio desde a detecção"""
+        start = self.marks["detect"]
+        return {
+            stage: round((self.marks[stage] - start) / 1e6, 3)
+            for stage in STAGES if stage in self.marks
+        }
+
+
+class LatencyRecorder:
+    """Histogramas por estágio e janela dos eventos mais recentes"""
+
+    def __init__(self, recent_size: int = 500):
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES[1:]}
+        self.histograms["total"] = LatencyHistogram()
+        self.recent = deque(maxlen=recent_size)
+
+    def start(self, label: str = "") -> LatencyTrace:
+        """Cria o trace no momento da detecção"""
+        return LatencyTrace(self, label)
+
+    def finish(self, trace: LatencyTrace):
+        start = trace.marks["detect"]
+        offsets_us = {stage: (ns - start) / 1000.0 for stage, ns in trace.marks.items() if stage != "detect"}
+        total_us = max(offsets_us.values()) if offsets_us else 0.0
+        with self._lock:
+            for stage, value_us in offsets_us.items():
+                histogram = self.histograms.get(stage)
+                if histogram is not None:
+                    histogram.record(value_us)
+            self.histograms["total"].record(total_us)
+            self.recent.append({
+                "trace_id": trace.trace_id,
+                "label": trace.label,
+                "total_ms": round(total_us / 1000.0, 3),
+                "stages_ms": trace.breakdown(),
+                "finished_at": time.time(),
+            })
+
+    def snapshot(self, slowest: int = 10) -> dict:
+        with self._lock:
+            histograms = {stage: h.to_dict() for stage, h in self.histograms.items()}
+            recent = list(self.recent)
+        recent.sort(key=lambda item: item["total_ms"], reverse=True)
+        return {
+            "unit": "ms desde a detecção (reader.anticoll)",
+            "stages": histograms,
+            "slowest_recent": recent[:slowest],
+            "recent_window": len(recent),
+        }
+
+
+# Instância global
+latency_recorder = LatencyRecorder()
@@ -0,0 +1,363 @@
+"""
+Motor de padrões de LED (pisca, fade por PWM e sequências)
+
+Todos os padrões ativos rodam em uma única thread com uma roda de tempo
+(hashed timer wheel): cada padrão é uma entrada agendada para o tick do seu
+próximo passo, então o custo por tick depende apenas dos passos que vencem
+naquele slot, não do número de padrões. Sem padrões ativos a thread dorme.
+
+No histórico (LEDHistory) entram apenas o início e o fim de cada padrão
+(ex.: BLINK_START / BLINK_STOP), gravados por uma thread de escrita para não
+atrasar a roda; os passos intermediários não tocam no banco.
+
+Com um executor de hardware (hw_executor.py) as escritas dos passos são
+enfileiradas na thread dona do GPIO, na mesma fila dos comandos da API; com a
+fila cheia o passo é descartado (e contado) em vez de atrasar a roda.
+"""
+
+import itertools
+import math
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database import SessionLocal, LEDHistory, DeviceStatus
+from event_bus import publish_event
+
+# Passo de um ciclo: ("set", estado 0/1, duração s) ou ("level", duty 0-100, duração s)
+Step = Tuple[str, float, float]
+
+TICK = 0.01  # resolução da roda (s)
+WHEEL_SLOTS = 512  # ~5s por volta; passos mais longos esperam voltas extras no slot
+
+_STOP = object()
+
+
+class TimerWheel:
+    """Roda de tempo com uma thread: agenda callbacks com resolução de TICK"""
+
+    def __init__(self, tick: float = TICK, slots: int = WHEEL_SLOTS, name: str = "led-patterns"):
+        self.tick = tick
+        self.slots: List[list] = [[] for _ in range(slots)]
+        self.name = name
+        self._cond = threading.Condition()
+        self._origin = time.monotonic()
+        self._processed = 0  # último tick processado
+        self._count = 0
+        self._thread: Optional[threading.Thread] = None
+        self.ticks = 0
+        self.fired = 0
+        self.max_lag_ms = 0.0
+
+    def _now_tick(self) -> int:
+        return int((time.monotonic() - self._origin) / self.tick)
+
+    def schedule(self, delay: float, entry) -> None:
+        """Agenda entry.fire() daqui a delay segundos (entry.target recebe o tick)"""
+        with self._cond:
+            if self._count == 0:
+                # Roda parada: retoma do tick atual sem percorrer slots vazios
+                self._processed = max(self._processed, self._now_tick())
+            ticks = max(1, math.ceil(delay / self.tick))
+            entry.target = self._processed + ticks
+            self.slots[entry.target % len(self.slots)].append(entry)
+            self._count += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        slots = self.slots
+        while True:
+            with self._cond:
+                while self._count == 0:
+                    self._cond.wait()
+                next_deadline = self._origin + (self._processed + 1) * self.tick
+                delay = next_deadline - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                # Processa todos os ticks vencidos (recupera atrasos da thread)
+                now_tick = self._now_tick()
+                due = []
+                while self._processed < now_tick:
+                    self._processed += 1
+                    self.ticks += 1
+                    slot = slots[self._processed % len(slots)]
+                    if not slot:
+                        continue
+                    keep = []
+                    for entry in slot:
+                        if entry.cancelled:
+                            self._count -= 1
+                        elif entry.target <= self._processed:
+                            self._count -= 1
+                            due.append(entry)
+                        else:
+                            keep.append(entry)
+                    slot[:] = keep
+                lag_ms = (time.monotonic() - next_deadline) * 1000.0
+                if lag_ms > self.max_lag_ms:
+                    self.max_lag_ms = lag_ms
+            for entry in due:
+                self.fired += 1
+                try:
+                    entry.fire()
+                except Exception as e:
+                    print(f"[LED Patterns] Erro no passo do padrão: {e}")
+
+    def pending(self) -> int:
+        with self._cond:
+            return self._count
+
+
+class LEDPattern:
+    """Padrão ativo em um pino: ciclo de passos repetido repeat vezes (None = infinito)"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, engine: "LEDPatternEngine", pin: int, kind: str, cycle: List[Step],
+                 repeat: Optional[int], final_state: bool, raspberry_id: str, led_type: str):
+        self.pattern_id = next(self._ids)
+        self.engine = engine
+        self.pin = pin
+        self.kind = kind
+        self.cycle = cycle
+        self.repeat = repeat
+        self.final_state = final_state
+        self.raspberry_id = raspberry_id
+        self.led_type = led_type
+        self.handle = None
+        self.cycles_done = 0
+        self.step_index = 0
+        self.started_at = datetime.utcnow()
+        self.target = 0
+        self.cancelled = False
+
+    def fire(self):
+        """Executa o passo atual e agenda o próximo (roda na thread da roda)"""
+        # Mesmo lock de _finish: um stop da API nunca intercala com a escrita do passo
+        with self.engine._lock:
+            if self.cancelled:
+                return
+            if self.step_index == len(self.cycle):
+                self.step_index = 0
+                self.cycles_done += 1
+                if self.repeat is not None and self.cycles_done >= self.repeat:
+                    self.engine._finish(self, "completed")
+                    return
+            action, value, duration = self.cycle[self.step_index]
+            self.step_index += 1
+            if action == "level":
+                self.engine._write(self.handle.set_level, value)
+            else:
+                self.engine._write(self.handle.set, bool(value))
+        self.engine.wheel.schedule(duration, self)
+
+    def to_dict(self) -> dict:
+        return {
+            "pattern_id": self.pattern_id,
+            "pin": self.pin,
+            "pattern": self.kind,
+            "raspberry_id": self.raspberry_id,
+            "led_type": self.led_type,
+            "repeat": self.repeat,
+            "cycles_done": self.cycles_done,
+            "cycle_ms": round(sum(step[2] for step in self.cycle) * 1000.0, 1),
+            "final_status": "ON" if self.final_state else "OFF",
+            "started_at": self.started_at.isoformat(),
+        }
+
+
+def blink_cycle(on_ms: int, off_ms: int) -> List[Step]:
+    return [("set", 1, on_ms / 1000.0), ("set", 0, off_ms / 1000.0)]
+
+
+def fade_cycle(period_ms: int, step_ms: int = 20, min_level: float = 0.0,
+               max_level: float = 100.0) -> List[Step]:
+    """Rampa de subida e descida com correção gama (brilho percebido linear)"""
+    half = max(1, int(period_ms / step_ms / 2))
+    ramp = [min_level + (max_level - min_level) * (i / half) ** 2 for i in range(half + 1)]
+    levels = ramp + ramp[-2:0:-1]
+    duration = period_ms / 1000.0 / len(levels)
+    return [("level", round(level, 2), duration) for level in levels]
+
+
+class LEDPatternEngine:
+    """Padrões de LED ativos (um por pino) sobre uma única roda de tempo"""
+
+    def __init__(self, led_handle: Callable[[int], object], tick: float = TICK, executor=None):
+        """
+        Args:
+            led_handle: Retorna o handle (set/set_level) do LED de um pino
+            tick: Resolução da roda de tempo (s)
+            executor: HardwareExecutor opcional que executa as escritas no GPIO
+        """
+        self.led_handle = led_handle
+        self.executor = executor
+        self.dropped_steps = 0
+        self.wheel = TimerWheel(tick)
+        self._lock = threading.RLock()
+        self._active: Dict[int, LEDPattern] = {}
+        self._history: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self.started = 0
+        self.stopped = 0
+
+    def start(self, pin: int, kind: str, cycle: List[Step], repeat: Optional[int] = None,
+              final_state: bool = False, raspberry_id: str = "1", led_type: str = "external") -> dict:
+        """Inicia o padrão no pino, substituindo o padrão que estiver ativo nele"""
+        if not cycle:
+            raise ValueError("O padrão precisa de ao menos um passo")
+        if any(step[2] < self.wheel.tick for step in cycle):
+            raise ValueError(f"Cada passo deve durar ao menos {self.wheel.tick * 1000:.0f}ms")
+        if repeat is not None and repeat < 1:
+            raise ValueError("repeat deve ser >= 1 (ou nulo para repetir até ser parado)")
+
+        handle = self.led_handle(pin)
+        pattern = LEDPattern(self, pin, kind, cycle, repeat, final_state, raspberry_id, led_type)
+        pattern.handle = handle
+        self.stop_pin(pin, "replaced")
+        with self._lock:
+            self._active[pin] = pattern
+            self.started += 1
+        self._record(pattern, "START")
+        self.wheel.schedule(0, pattern)
+        return pattern.to_dict()
+
+    def stop(self, pattern_id: int, reason: str = "cancelled") -> Optional[dict]:
+        with self._lock:
+            pattern = next((p for p in self._active.values() if p.pattern_id == pattern_id), None)
+        if pattern is None:
+            return None
+        self._finish(pattern, reason)
+        return pattern.to_dict()
+
+    def stop_pin(self, pin: int, reason: str = "cancelled") -> Optional[dict]:
+        """Para o padrão do pino (ex.: antes de um comando ON/OFF direto)"""
+        pattern = self._active.get(pin)
+        if pattern is None:
+            return None
+        self._finish(pattern, reason)
+        return pattern.to_dict()
+
+    def _finish(self, pattern: LEDPattern, reason: str):
+        with self._lock:
+            if pattern.cancelled:
+                return
+            pattern.cancelled = True
+            if self._active.get(pattern.pin) is pattern:
+                del self._active[pattern.pin]
+            self.stopped += 1
+            # Um padrão substituído deixa o pino para o próximo; os demais aplicam o estado final
+            if reason not in ("replaced", "override"):
+                self._write(pattern.handle.set, pattern.final_state)
+        self._record(pattern, "STOP", reason)
+
+    def _write(self, fn: Callable, value):
+        """Escrita no LED: pelo executor de hardware (sem aguardar) ou direta"""
+        if self.executor is None:
+            fn(value)
+        elif not self.executor.post(fn, value, name="led_pattern_step"):
+            self.dropped_steps += 1
+
+    def active(self) -> List[dict]:
+        with self._lock:
+            return [pattern.to_dict() for pattern in self._active.values()]
+
+    def stop_all(self):
+        for pattern in list(self._active.values()):
+            self._finish(pattern, "shutdown")
+        if self._writer:
+            self._history.put(_STOP)
+            self._writer.join(2.0)
+            self._writer = None
+
+    def get_stats(self) -> dict:
+        return {
+            "active": len(self._active),
+            "started": self.started,
+            "stopped": self.stopped,
+            "tick_ms": self.wheel.tick * 1000.0,
+            "wheel_pending": self.wheel.pending(),
+            "ticks": self.wheel.ticks,
+            "steps_fired": self.wheel.fired,
+            "max_lag_ms": round(self.wheel.max_lag_ms, 3),
+            "dropped_steps": self.dropped_steps,
+        }
+
+    # ---------- Histórico (apenas início e fim) ----------
+
+    def _record(self, pattern: LEDPattern, phase: str, reason: Optional[str] = None):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._writer_loop, name="led-pattern-history", daemon=True)
+            self._writer.start()
+        self._history.put((pattern, phase, reason, datetime.utcnow()))
+
+    def _writer_loop(self):
+        while True:
+            item = self._history.get()
+            if item is _STOP:
+                return
+            pattern, phase, reason, timestamp = item
+            db = SessionLocal()
+            try:
+                db.add(LEDHistory(
+                    raspberry_id=pattern.raspberry_id,
+                    led_type=pattern.led_type,
+                    pin=pattern.pin,
+                    action=f"{pattern.kind.upper()}_{phase}",
+                    timestamp=timestamp
+                ))
+                if phase == "STOP" and reason not in ("replaced", "override"):
+                    device = db.query(DeviceStatus).filter(
+                        DeviceStatus.raspberry_id == pattern.raspberry_id
+                    ).first()
+                    if device:
+                        if pattern.led_type == "internal":
+                            device.led_internal_status = pattern.final_state
+                        else:
+                            device.led_external_status = pattern.final_state
+                        device.last_update = timestamp
+                db.commit()
+                publish_event("led", {
+                    "raspberry_id": pattern.raspberry_id,
+                    "led_type": pattern.led_type,
+                    "pin": pattern.pin,
+                    "action": f"{pattern.kind.upper()}_{phase}",
+                    "pattern_id": pattern.pattern_id,
+                    # Estado final aplicado ao parar (None enquanto o padrão roda)
+                    "status": ("ON" if pattern.final_state else "OFF")
+                              if phase == "STOP" and reason not in ("replaced", "override") else None,
+                }, pattern.raspberry_id)
+                print(f"[LED Patterns] Padrão {pattern.pattern_id} ({pattern.kind}) no pino "
+                      f"{pattern.pin}: {phase}{f' ({reason})' if reason else ''}")
+            except Exception as e:
+                print(f"[LED Patterns] Erro ao gravar histórico: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+
+# Instância global
+_pattern_engine: Optional[LEDPatternEngine] = None
+
+def init_pattern_engine(led_handle: Callable[[int], object], executor=None) -> LEDPatternEngine:
+    """Inicializa o motor global de padrões de LED"""
+    global _pattern_engine
+    _pattern_engine = LEDPatternEngine(led_handle, executor=executor)
+    return _pattern_engine
+
+def get_pattern_engine() -> Optional[LEDPatternEngine]:
+    """Retorna a instância global do motor de padrões"""
+    return _pattern_engine
+
+def cleanup_pattern_engine():
+    """Para todos os padrões (aplicando o estado final) e a escrita do histórico"""
+    global _pattern_engine
+    if _pattern_engine:
+        _pattern_engine.stop_all()
+        _pattern_engine = None
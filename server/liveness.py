@@ -0,0 +1,257 @@
+"""
+Detecção de nós offline por prazo de heartbeat
+
+Cada dispositivo tem um prazo (último heartbeat + LIVENESS_TIMEOUT) em um
+min-heap. O heartbeat só atualiza o prazo guardado no dicionário, O(1); o
+heap mantém uma entrada por dispositivo e, quando uma entrada vence com um
+prazo já renovado, ela é reinserida com o prazo atual (O(log n)). Uma única
+thread dorme até o prazo mais próximo: não há varredura periódica da tabela.
+
+Ao vencer um prazo o nó é marcado offline (wifi_status), um intervalo de
+indisponibilidade é aberto em device_outages e os eventos "device_status" e
+"liveness" são publicados. O próximo heartbeat fecha o intervalo e restaura
+o wifi_status informado pelo nó. Toda escrita no banco acontece na thread do
+sweeper, na ordem em que as transições ocorreram.
+"""
+
+import heapq
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from database import SessionLocal, DeviceStatus, DeviceOutage, device_status_to_dict
+from event_bus import publish_event
+
+LIVENESS_TIMEOUT = float(os.getenv("LIVENESS_TIMEOUT", "30"))  # segundos sem heartbeat
+OFFLINE = "offline"
+
+
+def _to_epoch(value: datetime) -> float:
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+class LivenessTracker:
+    """Prazos de heartbeat em um min-heap atendido por uma thread"""
+
+    def __init__(self, timeout: float = LIVENESS_TIMEOUT):
+        self.timeout = timeout
+        self._deadlines: Dict[str, float] = {}  # prazo atual de cada dispositivo
+        self._last_seen: Dict[str, float] = {}
+        self._wifi: Dict[str, str] = {}  # último wifi_status informado pelo nó
+        self._offline = set()
+        self._heap: List[tuple] = []  # (prazo, raspberry_id): uma entrada por dispositivo online
+        self._recovered: List[tuple] = []  # (raspberry_id, horário) aguardando gravação
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self.running = False
+        self._started = 0.0
+
+        self.heartbeats = 0
+        self.reinserted = 0
+        self.marked_offline = 0
+        self.recovered = 0
+        self.max_lag_ms = 0.0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._started = time.time()
+        self._thread = threading.Thread(target=self._run, name="liveness-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        if not self.running:
+            return
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def load_from_db(self):
+        """Prazos iniciais a partir de last_update (uma leitura na inicialização)"""
+        db = SessionLocal()
+        try:
+            rows = db.query(DeviceStatus.raspberry_id, DeviceStatus.wifi_status, DeviceStatus.last_update).all()
+        finally:
+            db.close()
+        with self._cond:
+            for raspberry_id, wifi_status, last_update in rows:
+                if raspberry_id is None:
+                    continue
+                if wifi_status == OFFLINE:
+                    self._offline.add(raspberry_id)
+                    continue
+                # Nós parados antes do reinício vencem na primeira passada do sweeper
+                last_seen = _to_epoch(last_update) if last_update else 0.0
+                self._track(raspberry_id, last_seen, wifi_status)
+            self._cond.notify()
+        print(f"[Liveness] {len(self._deadlines)} dispositivos acompanhados, "
+              f"{len(self._offline)} offline (timeout {self.timeout:g}s)")
+
+    def _track(self, raspberry_id: str, now: float, wifi_status: Optional[str]):
+        deadline = now + self.timeout
+        self._last_seen[raspberry_id] = now
+        if wifi_status:
+            self._wifi[raspberry_id] = wifi_status
+        if raspberry_id not in self._deadlines:
+            heapq.heappush(self._heap, (deadline, raspberry_id))
+            if self._heap[0][1] == raspberry_id:
+                self._cond.notify()
+        self._deadlines[raspberry_id] = deadline
+
+    def heartbeat(self, raspberry_id: str, wifi_status: Optional[str] = None, now: Optional[float] = None):
+        """Renova o prazo do dispositivo; um nó offline volta a online"""
+        now = time.time() if now is None else now
+        with self._cond:
+            self.heartbeats += 1
+            if raspberry_id in self._offline:
+                self._offline.discard(raspberry_id)
+                self._recovered.append((raspberry_id, now))
+                self._cond.notify()
+            self._track(raspberry_id, now, wifi_status)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self.running and not self._recovered and (
+                        not self._heap or self._heap[0][0] > time.time()):
+                    self._cond.wait(self._heap[0][0] - time.time() if self._heap else None)
+                if not self.running:
+                    return
+                now = time.time()
+                expired = []
+                while self._heap and self._heap[0][0] <= now:
+                    deadline, raspberry_id = heapq.heappop(self._heap)
+                    current = self._deadlines.get(raspberry_id)
+                    if current is None:
+                        continue
+                    if current > now:
+                        # Houve heartbeat depois da inserção: volta ao heap com o prazo atual
+                        heapq.heappush(self._heap, (current, raspberry_id))
+                        self.reinserted += 1
+                        continue
+                    del self._deadlines[raspberry_id]
+                    self._offline.add(raspberry_id)
+                    # Prazos vencidos antes do início (servidor parado) não contam como atraso
+                    self.max_lag_ms = max(self.max_lag_ms, (now - max(current, self._started)) * 1000.0)
+                    expired.append((raspberry_id, self._last_seen.get(raspberry_id, current - self.timeout)))
+                recovered = [(rid, seen_at, self._wifi.get(rid)) for rid, seen_at in self._recovered]
+                self._recovered = []
+
+            for raspberry_id, last_seen in expired:
+                self._mark_offline(raspberry_id, last_seen, now)
+            for raspberry_id, seen_at, wifi_status in recovered:
+                self._mark_online(raspberry_id, seen_at, wifi_status)
+
+    def _mark_offline(self, raspberry_id: str, last_seen: float, now: float):
+        db = SessionLocal()
+        try:
+            started_at = datetime.utcfromtimestamp(last_seen)
+            db.add(DeviceOutage(
+                raspberry_id=raspberry_id,
+                started_at=started_at,
+                detected_at=datetime.utcfromtimestamp(now),
+            ))
+            device = db.query(DeviceStatus).filter(DeviceStatus.raspberry_id == raspberry_id).first()
+            status = None
+            if device:
+                device.wifi_status = OFFLINE
+                db.flush()
+                status = device_status_to_dict(device)
+            db.commit()
+            self.marked_offline += 1
+            if status:
+                publish_event("device_status", status, raspberry_id)
+            publish_event("liveness", {
+                "raspberry_id": raspberry_id,
+                "status": OFFLINE,
+                "last_seen": started_at,
+                "timeout_s": self.timeout,
+            }, raspberry_id)
+            print(f"[Liveness] {raspberry_id} offline (sem heartbeat desde {started_at.isoformat()})")
+        except Exception as e:
+            print(f"[Liveness] Erro ao marcar {raspberry_id} offline: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _mark_online(self, raspberry_id: str, seen_at: float, wifi_status: Optional[str]):
+        db = SessionLocal()
+        try:
+            ended_at = datetime.utcfromtimestamp(seen_at)
+            outages = db.query(DeviceOutage).filter(
+                DeviceOutage.raspberry_id == raspberry_id,
+                DeviceOutage.ended_at.is_(None),
+            ).all()
+            for outage in outages:
+                outage.ended_at = ended_at
+                outage.duration_s = round((ended_at - outage.started_at).total_seconds(), 3)
+            device = db.query(DeviceStatus).filter(DeviceStatus.raspberry_id == raspberry_id).first()
+            # O consumer já gravou o wifi_status do heartbeat; só corrige se o sweeper sobrescreveu
+            if device and device.wifi_status == OFFLINE:
+                device.wifi_status = wifi_status if wifi_status and wifi_status != OFFLINE else "unknown"
+            db.commit()
+            self.recovered += 1
+            publish_event("liveness", {
+                "raspberry_id": raspberry_id,
+                "status": "online",
+                "last_seen": ended_at,
+                "outage_s": outages[-1].duration_s if outages else None,
+            }, raspberry_id)
+            print(f"[Liveness] {raspberry_id} online novamente")
+        except Exception as e:
+            print(f"[Liveness] Erro ao marcar {raspberry_id} online: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            return {
+                "running": self.running,
+                "timeout_s": self.timeout,
+                "online": len(self._deadlines),
+                "offline": len(self._offline),
+                "heap_size": len(self._heap),
+                "next_deadline_in_s": round(self._heap[0][0] - time.time(), 3) if self._heap else None,
+                "heartbeats": self.heartbeats,
+                "reinserted": self.reinserted,
+                "marked_offline": self.marked_offline,
+                "recovered": self.recovered,
+                "max_lag_ms": round(self.max_lag_ms, 2),
+            }
+
+
+# Instância global
+_liveness_tracker: Optional[LivenessTracker] = None
+
+def init_liveness_tracker() -> LivenessTracker:
+    """Inicializa o tracker global, carrega os prazos do banco e inicia o sweeper"""
+    global _liveness_tracker
+    _liveness_tracker = LivenessTracker()
+    _liveness_tracker.start()
+    _liveness_tracker.load_from_db()
+    return _liveness_tracker
+
+def get_liveness_tracker() -> Optional[LivenessTracker]:
+    """Retorna a instância global do tracker de liveness"""
+    return _liveness_tracker
+
+def cleanup_liveness_tracker():
+    """Para a thread do sweeper"""
+    global _liveness_tracker
+    if _liveness_tracker:
+        _liveness_tracker.stop()
+        _liveness_tracker = None
+
+def record_heartbeat(raspberry_id: str, wifi_status: Optional[str] = None):
+    """Renova o prazo de um nó sem deixar uma falha afetar o consumer"""
+    if _liveness_tracker is None or raspberry_id is None:
+        return
+    try:
+        _liveness_tracker.heartbeat(str(raspberry_id), wifi_status)
+    except Exception as e:
+        print(f"[Liveness] Falha ao registrar heartbeat de {raspberry_id}: {e}")
@@ -1,81 +1,122 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
+from sqlalchemy import insert, func, select, true
 from consumer import start_consumer_thread
 from shared import received_messages
 from database import (
     get_db, init_db, LEDHistory, DeviceStatus, DeviceStatusHistory,
-    RFIDTag, RFIDReadHistory, SessionLocal, DoorOpenHistory
+    RFIDTag, RFIDReadHistory, DoorOpenHistory,
+    AccessRule, AccessGroupMember, ChangeLog, Anomaly, AlertRule, Alert, DeviceOutage, device_status_snapshot
 )
 from schemas import (
-    LEDCommand, LEDHistoryResponse, DeviceStatusResponse, DeviceStatusHistoryResponse,
+    LEDCommand, LEDBatchCommand, LEDPatternCommand, LEDHistoryResponse, DeviceStatusResponse, DeviceStatusHistoryResponse,
     RFIDTagCreate, RFIDTagResponse, RFIDReadHistoryResponse,
-    RFIDReadEvent, ServoCommand, DoorOpenHistoryResponse
+    RFIDReadEvent, ServoCommand, DoorOpenHistoryResponse,
+    AccessRuleCreate, AccessRuleResponse, AccessGroupMemberCreate, AnomalyResponse,
+    AlertRuleCreate, AlertRuleResponse, AlertResponse, DeviceOutageResponse
 )
 from gpio_handler import GPIOController, GPIO_AVAILABLE
+from hal import get_hal, PinConflictError
 from rfid_handler import init_rfid_handler, get_rfid_handler, cleanup_rfid
-from servo_handler import init_servo_handler, get_servo_handler, cleanup_servo
+from servo_handler import (
+    init_servo_handler, get_servo_handler, cleanup_servo, ACCEPTED_OUTCOMES, OUTCOME_FAILED
+)
+from hw_executor import (
+    init_hw_executor, get_hw_executor, cleanup_hw_executor, HardwareBusyError, HardwareTimeoutError
+)
+from access_control import init_access_engine, get_access_engine
+from alerts import (
+    init_alert_engine, get_alert_engine, cleanup_alert_engine, observe_rfid_read, validate_rule
+)
+from liveness import init_liveness_tracker, get_liveness_tracker, cleanup_liveness_tracker
+from rfid_pipeline import init_rfid_pipeline, get_rfid_pipeline, cleanup_rfid_pipeline
+from latency import latency_recorder
+from fast_json import FastJSONResponse, schema_columns, query_response
+from versions import resource_versions, matches as etag_matches
+from event_bus import event_bus, publish_event, TOPICS as EVENT_TOPICS
+from analytics import fleet_health, rank_devices, FIELDS as ANALYTICS_FIELDS, NUMPY_AVAILABLE as ANALYTICS_AVAILABLE
+from anomaly import anomaly_detector, METRICS as ANOMALY_METRICS
+from timeseries import timeseries_store, FIELDS as TIMESERIES_FIELDS, AGGREGATIONS as TIMESERIES_AGGREGATIONS
+from led_patterns import (
+    init_pattern_engine, get_pattern_engine, cleanup_pattern_engine, blink_cycle, fade_cycle
+)
+import asyncio
 import csv
+import json
+import time
 import io
 import zipfile
 
 # Inicializar banco de dados
 init_db()
 
+# Compilar regras de acesso em memória
+init_access_engine()
+
+# Regras de alerta avaliadas na ingestão (heap de deadlines em uma thread)
+init_alert_engine()
+
+# Nós sem heartbeat há LIVENESS_TIMEOUT segundos são marcados offline
+init_liveness_tracker()
+
 # Iniciar RFID handler
 init_rfid_handler()
 rfid_handler = get_rfid_handler()
-if rfid_handler:
-    # Inicia thread de polling para leitura contínua de tags
-    rfid_handler.start_polling(interval=0.3)
 
 # Iniciar Servo handler (fechadura no pino 12)
 init_servo_handler(gpio_pin=12)
 
-# Configurar callback do RFID para abrir a porta quando tag for detectada
-def on_rfid_read(rfid_data: dict):
+# Thread única dona do GPIO: os endpoints aguardam os comandos sem bloquear
+init_hw_executor()
+
+# Padrões de LED (pisca/fade/sequência) em uma única roda de tempo
+init_pattern_engine(GPIOController.led_handle, executor=get_hw_executor())
+
+# Estágio de decisão/acionamento do pipeline RFID: abre a porta quando a tag é
+# autorizada. A gravação da leitura e da abertura (DoorOpenHistory, last_door_open)
+# é feita depois, em lote, pelo estágio de escrita do pipeline.
+def on_rfid_read(rfid_data: dict) -> dict:
     """Callback chamado quando uma tag RFID é detectada"""
     try:
+        trace = rfid_data.get('trace')
+        decision = get_access_engine().decide(
+            rfid_data.get('uid', ''), rfid_data.get('raspberry_id', '1')
+        )
+        if trace:
+            trace.mark("decision")
+        if not decision["allowed"]:
+            print(f"[Servo] Acesso negado para tag {rfid_data.get('uid', '')}, porta permanece fechada")
+            return {"door_opened": False, "access": decision}
+
         servo = get_servo_handler()
         if servo:
             print(f"[Servo] Tag RFID detectada, abrindo porta...")
-            servo.open_door(hold_time=5.0)
-            
-            # Registrar abertura no banco de dados
-            db = SessionLocal()
-            try:
-                # Registrar no histórico de aberturas
-                door_open = DoorOpenHistory(
-                    raspberry_id=rfid_data.get('raspberry_id', '1'),
-                    rfid_uid=rfid_data.get('uid', ''),
-                    tag_name=rfid_data.get('tag_name', '<Sem nome>')
-                )
-                db.add(door_open)
-                
-                # Atualizar apenas last_door_open, mas manter servo_status como "closed"
-                # O status será controlado pelo frontend baseado no popup do RFID
-                device = db.query(DeviceStatus).filter(
-                    DeviceStatus.raspberry_id == rfid_data.get('raspberry_id', '1')
-                ).first()
-                if device:
-                    device.last_door_open = datetime.utcnow()
-                    device.last_update = datetime.utcnow()
-                    # Não atualiza servo_status aqui - sempre fica "closed" no banco
-                
-                db.commit()
-            except Exception as e:
-                print(f"[Servo] Erro ao registrar abertura: {e}")
-                db.rollback()
-            finally:
-                db.close()
+            # Aguarda o ack do daemon: só uma abertura confirmada entra no histórico
+            outcome = servo.open_door(hold_time=5.0, trace=trace, wait=True)
+            # servo_status permanece "closed" no banco; o frontend controla o popup
+            return {
+                "door_opened": outcome in ACCEPTED_OUTCOMES,
+                "servo_outcome": outcome,
+                "opened_at": datetime.utcnow(),
+                "access": decision
+            }
     except Exception as e:
         print(f"[Servo] Erro no callback RFID: {e}")
+    return {"door_opened": False}
 
 if rfid_handler:
     rfid_handler.set_read_callback(on_rfid_read)
+    rfid_handler.set_pipeline(init_rfid_pipeline(
+        on_rfid_read,
+        name_lookup=lambda uid: get_access_engine().tag_names.get(uid, "")
+    ))
+    # Inicia thread de polling para leitura contínua de tags
+    rfid_handler.start_polling(interval=0.3)
 
 # Iniciar consumer do RabbitMQ em thread separada
 start_consumer_thread()
@@ -83,7 +124,9 @@ start_consumer_thread()
 app = FastAPI(
     title="Raspberry Pi 5 IoT API",
     description="API para gerenciamento de cluster Raspberry Pi com controle de LEDs, RFID e health check",
-    version="3.0.0"
+    version="3.0.0",
+    # orjson: serializa datetimes e listas grandes sem passar pelo encoder genérico
+    default_response_class=FastJSONResponse
 )
 
 # CORS amplo para permitir qualquer origem (funciona mesmo mudando de rede/IP)
@@ -93,13 +136,38 @@ app.add_middleware(
     allow_origins=["*"],  # Aceita qualquer origem
     allow_credentials=False,
     allow_methods=["*"],  # Permite todos os métodos HTTP
-    allow_headers=["*"]   # Permite todos os headers
+    allow_headers=["*"],  # Permite todos os headers
+    expose_headers=["ETag"]
 )
 
+def _not_modified(request: Request, response: Response, key: str, variant: Optional[str] = None) -> Optional[Response]:
+    """
+    GET condicional pela versão do recurso (versions.py): retorna a resposta 304
+    se o cliente já tem a versão atual; senão define o ETag na resposta.
+    A versão é lida antes da consulta: uma escrita concorrente gera um ETag novo
+    na próxima chamada, nunca um ETag novo com dados antigos.
+    """
+    etag = resource_versions.etag(key, variant)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
 # ==================== LED ENDPOINTS ====================
 
+def _hardware_error(e: Exception) -> HTTPException:
+    """Converte falhas do executor de hardware em respostas HTTP"""
+    if isinstance(e, PinConflictError):
+        return HTTPException(status_code=409, detail=str(e))
+    if isinstance(e, HardwareBusyError):
+        return HTTPException(status_code=503, detail=str(e))
+    if isinstance(e, HardwareTimeoutError):
+        return HTTPException(status_code=504, detail=str(e))
+    return HTTPException(status_code=500, detail=f"Falha no GPIO: {str(e)}")
+
 @app.post("/api/led/control", tags=["LED Control"])
-def control_led(command: LEDCommand, db: Session = Depends(get_db)):
+async def control_led(command: LEDCommand, db: Session = Depends(get_db)):
     raspberry_id = command.raspberry_id
     led_type = command.led_type.lower()
     
@@ -121,13 +189,33 @@ def control_led(command: LEDCommand, db: Session = Depends(get_db)):
     led_state = command.status.upper() == "ON"
 
     try:
-        success = GPIOController.set_led(pin_to_use, led_state)
+        # Comando direto substitui o padrão que estiver rodando no pino
+        get_pattern_engine().stop_pin(pin_to_use, "override")
+        success = await get_hw_executor().run(GPIOController.set_led, pin_to_use, led_state, name="set_led")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Falha no GPIO: {str(e)}")
+        raise _hardware_error(e)
 
     if not success:
         raise HTTPException(status_code=500, detail="Erro ao controlar LED (GPIO retornou falso)")
-    
+
+    await run_in_threadpool(_save_led_control, db, raspberry_id, led_type, pin_to_use, led_state)
+    publish_event("led", {
+        "raspberry_id": raspberry_id, "led_type": led_type, "pin": pin_to_use,
+        "action": command.status.upper(), "status": command.status.upper()
+    }, raspberry_id)
+
+    return {
+        "message": f"LED {led_type} {'ligado' if led_state else 'desligado'}",
+        "raspberry_id": raspberry_id,
+        "led_type": led_type,
+        "pin": pin_to_use,
+        "status": command.status.upper(),
+        "gpio_available": GPIO_AVAILABLE,
+        "timestamp": datetime.utcnow()
+    }
+
+def _save_led_control(db: Session, raspberry_id: str, led_type: str, pin: int, led_state: bool):
+    """Grava status, histórico e snapshot de um comando de LED em um único commit"""
     device = db.query(DeviceStatus).filter(DeviceStatus.raspberry_id == raspberry_id).first()
     
     if device:
@@ -147,67 +235,184 @@ def control_led(command: LEDCommand, db: Session = Depends(get_db)):
     history = LEDHistory(
         raspberry_id=raspberry_id,
         led_type=led_type,
-        pin=pin_to_use,
-        action=command.status.upper()
+        pin=pin,
+        action="ON" if led_state else "OFF"
     )
     
     db.add(history)
-    db.commit()
+    # Snapshot contínuo do status do dispositivo, na mesma transação
+    db.add(device_status_snapshot(device))
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+@app.post("/api/led/batch", tags=["LED Control"])
+async def control_led_batch(command: LEDBatchCommand, db: Session = Depends(get_db)):
+    """
+    Aplica várias mudanças de LED em uma requisição (ex.: painéis de status).
+    Pinos já no estado pedido não são reescritos; o histórico é gravado com um
+    único insert em lote e tudo é confirmado em um único commit.
+    """
+    raspberry_id = command.raspberry_id
+    if not command.changes:
+        raise HTTPException(status_code=400, detail="changes não pode ser vazio")
+
+    # Valida o lote inteiro antes de tocar no GPIO
+    resolved = []
+    for index, item in enumerate(command.changes):
+        led_type = (item.led_type or "external").lower()
+        status = item.status.upper()
+        if led_type not in ["internal", "external"]:
+            raise HTTPException(status_code=400, detail=f"changes[{index}]: led_type deve ser 'internal' ou 'external'")
+        if status not in ["ON", "OFF"]:
+            raise HTTPException(status_code=400, detail=f"changes[{index}]: status deve ser 'ON' ou 'OFF'")
+        pin = item.pin if item.pin is not None else GPIOController.get_pin(led_type)
+        if pin < 0 or pin > 40:
+            raise HTTPException(status_code=400, detail=f"changes[{index}]: pino fora do intervalo permitido")
+        resolved.append((led_type, pin, status))
 
-    # Salvar snapshot contínuo do status do dispositivo
     try:
-        if device:
-            snapshot = DeviceStatusHistory(
-                raspberry_id=device.raspberry_id,
-                led_internal_status=device.led_internal_status,
-                led_external_status=device.led_external_status,
-                wifi_status=device.wifi_status,
-                mem_usage=device.mem_usage,
-                cpu_temp=device.cpu_temp,
-                cpu_percent=device.cpu_percent,
-                gpio_used_count=device.gpio_used_count,
-                spi_buses=device.spi_buses,
-                i2c_buses=device.i2c_buses,
-                usb_devices_count=device.usb_devices_count,
-                net_bytes_sent=device.net_bytes_sent,
-                net_bytes_recv=device.net_bytes_recv,
-                net_ifaces=device.net_ifaces,
-                rfid_reader_status=device.rfid_reader_status,
-                last_rfid_read=device.last_rfid_read,
-                servo_status=device.servo_status or "closed"
-            )
-            db.add(snapshot)
-            db.commit()
+        for _, pin, _ in resolved:
+            get_pattern_engine().stop_pin(pin, "override")
+        results = await get_hw_executor().run(
+            GPIOController.set_leds, [(pin, status == "ON") for _, pin, status in resolved], name="set_leds"
+        )
     except Exception as e:
-        print(f"[DeviceHistory] Falha ao salvar snapshot: {e}")
-    
+        raise _hardware_error(e)
+
+    now = datetime.utcnow()
+    await run_in_threadpool(_save_led_batch, db, raspberry_id, resolved, now)
+    for led_type, pin, status in resolved:
+        publish_event("led", {
+            "raspberry_id": raspberry_id, "led_type": led_type, "pin": pin,
+            "action": status, "status": status
+        }, raspberry_id)
+
+    for result, (led_type, _, status) in zip(results, resolved):
+        result["led_type"] = led_type
+        result["status"] = status
+
     return {
-        "message": f"LED {led_type} {'ligado' if led_state else 'desligado'}",
         "raspberry_id": raspberry_id,
-        "led_type": led_type,
-        "pin": pin_to_use,
-        "status": command.status.upper(),
+        "applied": len(results),
+        "changed": sum(1 for result in results if result["changed"]),
+        "results": results,
         "gpio_available": GPIO_AVAILABLE,
-        "timestamp": datetime.utcnow()
+        "timestamp": now
     }
 
+def _save_led_batch(db: Session, raspberry_id: str, resolved: list, now: datetime):
+    """Grava status, histórico e snapshot de um lote de LEDs em um único commit"""
+    # O último comando de cada tipo define o status do dispositivo
+    final_state = {led_type: status == "ON" for led_type, _, status in resolved}
+
+    device = db.query(DeviceStatus).filter(DeviceStatus.raspberry_id == raspberry_id).first()
+    if device:
+        if "internal" in final_state:
+            device.led_internal_status = final_state["internal"]
+        if "external" in final_state:
+            device.led_external_status = final_state["external"]
+        device.last_update = now
+    else:
+        device = DeviceStatus(
+            raspberry_id=raspberry_id,
+            led_internal_status=final_state.get("internal", False),
+            led_external_status=final_state.get("external", False)
+        )
+        db.add(device)
+
+    db.execute(insert(LEDHistory), [
+        {"raspberry_id": raspberry_id, "led_type": led_type, "pin": pin, "action": status, "timestamp": now}
+        for led_type, pin, status in resolved
+    ])
+    db.add(device_status_snapshot(device))
+    db.commit()
+
+@app.post("/api/led/pattern", tags=["LED Control"])
+async def start_led_pattern(command: LEDPatternCommand):
+    """
+    Inicia um padrão no servidor: blink (on_ms/off_ms), fade (brilho por PWM em
+    period_ms) ou sequence (steps). repeat nulo repete até ser parado. Apenas o
+    início e o fim do padrão são gravados no histórico.
+    """
+    led_type = (command.led_type or "external").lower()
+    if led_type not in ["internal", "external"]:
+        raise HTTPException(status_code=400, detail="led_type deve ser 'internal' ou 'external'")
+    if command.final_status.upper() not in ["ON", "OFF"]:
+        raise HTTPException(status_code=400, detail="final_status deve ser 'ON' ou 'OFF'")
+    pin = command.pin if command.pin is not None else GPIOController.get_pin(led_type)
+    if pin < 0 or pin > 40:
+        raise HTTPException(status_code=400, detail="Pino fora do intervalo permitido")
+
+    kind = command.pattern.lower()
+    if kind == "blink":
+        cycle = blink_cycle(command.on_ms, command.off_ms)
+    elif kind == "fade":
+        cycle = fade_cycle(command.period_ms)
+    elif kind == "sequence":
+        if not command.steps:
+            raise HTTPException(status_code=400, detail="sequence exige steps")
+        cycle = []
+        for index, step in enumerate(command.steps):
+            if step.level is not None:
+                if not 0 <= step.level <= 100:
+                    raise HTTPException(status_code=400, detail=f"steps[{index}]: level deve estar entre 0 e 100")
+                cycle.append(("level", step.level, step.duration_ms / 1000.0))
+            elif step.status and step.status.upper() in ["ON", "OFF"]:
+                cycle.append(("set", 1 if step.status.upper() == "ON" else 0, step.duration_ms / 1000.0))
+            else:
+                raise HTTPException(status_code=400, detail=f"steps[{index}]: informe status ON/OFF ou level")
+    else:
+        raise HTTPException(status_code=400, detail="pattern deve ser 'blink', 'fade' ou 'sequence'")
+
+    try:
+        # A reserva do pino (GPIO.setup) também roda na thread de hardware
+        await get_hw_executor().run(GPIOController.led_handle, pin, name="reserve_led")
+    except Exception as e:
+        raise _hardware_error(e)
+
+    try:
+        return get_pattern_engine().start(
+            pin, kind, cycle, repeat=command.repeat,
+            final_state=command.final_status.upper() == "ON",
+            raspberry_id=command.raspberry_id, led_type=led_type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/led/patterns", tags=["LED Control"])
+def list_led_patterns():
+    """Padrões ativos e estatísticas da roda de tempo"""
+    engine = get_pattern_engine()
+    return {"active": engine.active(), "stats": engine.get_stats()}
+
+@app.delete("/api/led/pattern/{pattern_id}", tags=["LED Control"])
+def stop_led_pattern(pattern_id: int):
+    """Para o padrão e aplica o estado final (final_status)"""
+    stopped = get_pattern_engine().stop(pattern_id)
+    if stopped is None:
+        raise HTTPException(status_code=404, detail="Padrão não encontrado")
+    return {"message": "Padrão parado", "pattern": stopped}
+
 @app.post("/api/led/{led_type}/on", tags=["LED Control"])
-def led_on(
+async def led_on(
     led_type: str,
     raspberry_id: str = Query("1", description="ID da Raspberry Pi"),
     pin: Optional[int] = Query(None, description="Número do pino GPIO (BCM) a ser usado"),
     db: Session = Depends(get_db)
 ):
-    return control_led(LEDCommand(status="ON", raspberry_id=raspberry_id, led_type=led_type, pin=pin), db)
+    return await control_led(LEDCommand(status="ON", raspberry_id=raspberry_id, led_type=led_type, pin=pin), db)
 
 @app.post("/api/led/{led_type}/off", tags=["LED Control"])
-def led_off(
+async def led_off(
     led_type: str,
     raspberry_id: str = Query("1", description="ID da Raspberry Pi"),
     pin: Optional[int] = Query(None, description="Número do pino GPIO (BCM) a ser usado"),
     db: Session = Depends(get_db)
 ):
-    return control_led(LEDCommand(status="OFF", raspberry_id=raspberry_id, led_type=led_type, pin=pin), db)
+    return await control_led(LEDCommand(status="OFF", raspberry_id=raspberry_id, led_type=led_type, pin=pin), db)
 
 @app.get("/api/led/status", tags=["LED Control"])
 def get_led_status(
@@ -233,27 +438,30 @@ def get_led_history(
     limit: int = Query(50, le=500),
     db: Session = Depends(get_db)
 ):
-    query = db.query(LEDHistory)
+    columns = schema_columns(LEDHistory, LEDHistoryResponse)
+    query = db.query(*columns)
     
     if raspberry_id:
         query = query.filter(LEDHistory.raspberry_id == raspberry_id)
     if led_type:
         query = query.filter(LEDHistory.led_type == led_type)
     
-    history = query.order_by(LEDHistory.timestamp.desc()).limit(limit).all()
-    return history
+    return query_response(query.order_by(LEDHistory.timestamp.desc()).limit(limit), columns)
 
 # ==================== RFID ENDPOINTS ====================
 
-@app.post("/api/rfid/read", tags=["RFID"])
-def receive_rfid_read(read_event: RFIDReadEvent, db: Session = Depends(get_db)):
-    """
-    Recebe evento de leitura RFID.
-    Pode ser chamado pelo hardware da Raspberry ou usado para testes.
-    """
+def _decide_rfid_read(db: Session, read_event: RFIDReadEvent) -> dict:
+    """Decisão de acesso da leitura (só leitura do banco: nenhuma transação fica aberta)"""
+    tag = db.query(RFIDTag).filter(RFIDTag.uid == read_event.uid).first()
+    tag_name = tag.name if tag else read_event.tag_name or "<Sem nome>"
+    access_engine = get_access_engine()
+    if tag_name:
+        access_engine.set_tag_name(read_event.uid, tag_name)
+    return access_engine.decide(read_event.uid, read_event.raspberry_id)
+
+def _save_rfid_read(db: Session, read_event: RFIDReadEvent, door_opened: bool):
+    """Grava tag, leitura, status, abertura e snapshot em uma única transação"""
     try:
-        # Logar no terminal a leitura recebida
-        print(f"[RFID] Evento recebido UID={read_event.uid} Nome={read_event.tag_name} Raspberry={read_event.raspberry_id}")
         # Salvar ou atualizar tag no banco
         tag = db.query(RFIDTag).filter(RFIDTag.uid == read_event.uid).first()
         if not tag:
@@ -287,72 +495,85 @@ def receive_rfid_read(read_event: RFIDReadEvent, db: Session = Depends(get_db)):
                 last_rfid_read=datetime.utcnow()
             )
             db.add(device)
-        
+
+        # Registrar abertura no histórico (só com o ack do daemon)
+        if door_opened:
+            door_open = DoorOpenHistory(
+                raspberry_id=read_event.raspberry_id,
+                rfid_uid=read_event.uid,
+                tag_name=read_event.tag_name or "<Sem nome>"
+            )
+            db.add(door_open)
+            
+            # Atualizar apenas last_door_open, mas manter servo_status como "closed"
+            device.last_door_open = datetime.utcnow()
+            # Não atualiza servo_status aqui - sempre fica "closed" no banco
+
+        # Snapshot contínuo do status do dispositivo (linha já carregada, sem nova consulta)
+        db.add(device_status_snapshot(device))
+
         db.commit()
+        return tag.name, read_history.timestamp
+    except Exception:
+        db.rollback()
+        raise
+
+@app.post("/api/rfid/read", tags=["RFID"])
+async def receive_rfid_read(read_event: RFIDReadEvent, db: Session = Depends(get_db)):
+    """
+    Recebe evento de leitura RFID.
+    Pode ser chamado pelo hardware da Raspberry ou usado para testes.
+    """
+    try:
+        # Logar no terminal a leitura recebida
+        print(f"[RFID] Evento recebido UID={read_event.uid} Nome={read_event.tag_name} Raspberry={read_event.raspberry_id}")
+
+        # Repetição da mesma tag dentro da janela de supressão: sem escritas nem servo
+        rfid = get_rfid_handler()
+        if rfid and not rfid.suppressor.should_process(read_event.raspberry_id, read_event.uid):
+            return {
+                "status": "suppressed",
+                "message": f"Leitura repetida da tag {read_event.uid} ignorada",
+                "tag_name": read_event.tag_name,
+                "timestamp": datetime.utcnow()
+            }
+
+        decision = await run_in_threadpool(_decide_rfid_read, db, read_event)
 
-        # Acionar servo para abrir a porta quando RFID é detectado
+        # Acionar servo para abrir a porta quando RFID é detectado e o acesso é permitido.
+        # O ack é aguardado no event loop: nenhuma thread do servidor fica presa no daemon
         servo = get_servo_handler()
-        if servo:
+        servo_outcome = None
+        if servo and decision["allowed"]:
             print(f"[Servo] Tag RFID detectada via endpoint, abrindo porta...")
-            servo.open_door(hold_time=5.0)
-            
-            # Registrar abertura no histórico
-            try:
-                door_open = DoorOpenHistory(
-                    raspberry_id=read_event.raspberry_id,
-                    rfid_uid=read_event.uid,
-                    tag_name=read_event.tag_name or "<Sem nome>"
-                )
-                db.add(door_open)
-                
-                # Atualizar apenas last_door_open, mas manter servo_status como "closed"
-                if device:
-                    device.last_door_open = datetime.utcnow()
-                    # Não atualiza servo_status aqui - sempre fica "closed" no banco
-                
-                db.commit()
-            except Exception as e:
-                print(f"[Servo] Erro ao registrar abertura: {e}")
-                db.rollback()
-
-        # Snapshot contínuo do status do dispositivo
-        try:
-            device_snapshot_source = db.query(DeviceStatus).filter(
-                DeviceStatus.raspberry_id == read_event.raspberry_id
-            ).first()
-            if device_snapshot_source:
-                snapshot = DeviceStatusHistory(
-                    raspberry_id=device_snapshot_source.raspberry_id,
-                    led_internal_status=device_snapshot_source.led_internal_status,
-                    led_external_status=device_snapshot_source.led_external_status,
-                    wifi_status=device_snapshot_source.wifi_status,
-                    mem_usage=device_snapshot_source.mem_usage,
-                    cpu_temp=device_snapshot_source.cpu_temp,
-                    cpu_percent=device_snapshot_source.cpu_percent,
-                    gpio_used_count=device_snapshot_source.gpio_used_count,
-                    spi_buses=device_snapshot_source.spi_buses,
-                    i2c_buses=device_snapshot_source.i2c_buses,
-                    usb_devices_count=device_snapshot_source.usb_devices_count,
-                    net_bytes_sent=device_snapshot_source.net_bytes_sent,
-                    net_bytes_recv=device_snapshot_source.net_bytes_recv,
-                    net_ifaces=device_snapshot_source.net_ifaces,
-                    rfid_reader_status=device_snapshot_source.rfid_reader_status,
-                    last_rfid_read=device_snapshot_source.last_rfid_read,
-                    servo_status=device_snapshot_source.servo_status or "closed"
-                )
-                db.add(snapshot)
-                db.commit()
-        except Exception as e:
-            print(f"[DeviceHistory] Snapshot após RFID falhou: {e}")
+            servo_outcome, future = servo.request_open(hold_time=5.0)
+            if future is not None and not await _await_servo(future):
+                servo_outcome = OUTCOME_FAILED
+
+        tag_name, read_at = await run_in_threadpool(
+            _save_rfid_read, db, read_event, servo_outcome in ACCEPTED_OUTCOMES
+        )
+
+        publish_event("rfid", {
+            "uid": read_event.uid,
+            "tag_name": tag_name,
+            "raspberry_id": read_event.raspberry_id,
+            "timestamp": read_at,
+            "access_allowed": decision["allowed"],
+            "servo_outcome": servo_outcome,
+        }, read_event.raspberry_id)
+        observe_rfid_read(read_event.raspberry_id)
         
         return {
             "status": "success",
             "message": f"Tag {read_event.uid} lida com sucesso",
             "tag_name": read_event.tag_name,
+            "access_allowed": decision["allowed"],
+            "access_reason": decision["reason"],
+            "servo_outcome": servo_outcome,
             "timestamp": datetime.utcnow()
         }
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao processar leitura: {str(e)}")
 
 @app.post("/api/rfid/tag", response_model=RFIDTagResponse, tags=["RFID"])
@@ -374,6 +595,7 @@ def create_or_update_rfid_tag(tag_data: RFIDTagCreate, db: Session = Depends(get
         
         db.commit()
         db.refresh(tag)
+        get_access_engine().set_tag_name(tag.uid, tag.name)
         
         return tag
     except Exception as e:
@@ -382,11 +604,16 @@ def create_or_update_rfid_tag(tag_data: RFIDTagCreate, db: Session = Depends(get
 
 @app.get("/api/rfid/tags", response_model=List[RFIDTagResponse], tags=["RFID"])
 def list_rfid_tags(
+    request: Request,
+    response: Response,
     raspberry_id: Optional[str] = Query(None, description="Filtrar por Raspberry ID"),
     limit: int = Query(100, le=1000),
     db: Session = Depends(get_db)
 ):
     """Lista todas as tags RFID cadastradas"""
+    not_modified = _not_modified(request, response, "tags", f"{raspberry_id or '*'}.{limit}")
+    if not_modified:
+        return not_modified
     query = db.query(RFIDTag)
     
     if raspberry_id:
@@ -414,7 +641,11 @@ def delete_rfid_tag(uid: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Tag não encontrada")
     
     db.delete(tag)
+    # Revogar acessos da tag removida
+    db.query(AccessRule).filter(AccessRule.tag_uid == uid).delete()
+    db.query(AccessGroupMember).filter(AccessGroupMember.tag_uid == uid).delete()
     db.commit()
+    get_access_engine().remove_tag(uid)
     
     return {"message": f"Tag {uid} deletada com sucesso"}
 
@@ -427,7 +658,8 @@ def get_rfid_read_history(
     db: Session = Depends(get_db)
 ):
     """Obtém histórico de leituras RFID"""
-    query = db.query(RFIDReadHistory)
+    columns = schema_columns(RFIDReadHistory, RFIDReadHistoryResponse)
+    query = db.query(*columns)
     
     # Filtrar por data
     since = datetime.utcnow() - timedelta(hours=hours)
@@ -439,15 +671,19 @@ def get_rfid_read_history(
     if uid:
         query = query.filter(RFIDReadHistory.uid == uid)
     
-    history = query.order_by(RFIDReadHistory.timestamp.desc()).limit(limit).all()
-    return history
+    return query_response(query.order_by(RFIDReadHistory.timestamp.desc()).limit(limit), columns)
 
 @app.get("/api/rfid/last", tags=["RFID"])
 def get_last_rfid_read(
+    request: Request,
+    response: Response,
     raspberry_id: str = Query(..., description="Raspberry ID"),
     db: Session = Depends(get_db)
 ):
     """Retorna a última leitura RFID para a Raspberry especificada"""
+    not_modified = _not_modified(request, response, f"rfid_last:{raspberry_id}")
+    if not_modified:
+        return not_modified
     record = db.query(RFIDReadHistory).filter(
         RFIDReadHistory.raspberry_id == raspberry_id
     ).order_by(RFIDReadHistory.timestamp.desc()).first()
@@ -461,6 +697,22 @@ def get_last_rfid_read(
         "timestamp": record.timestamp
     }
 
+@app.get("/api/rfid/suppression", tags=["RFID"])
+def get_rfid_suppression_stats():
+    """Estatísticas da janela de supressão de leituras repetidas"""
+    rfid = get_rfid_handler()
+    if not rfid:
+        raise HTTPException(status_code=503, detail="RFID não disponível")
+    return rfid.suppressor.get_stats()
+
+@app.get("/api/rfid/pipeline", tags=["RFID"])
+def get_rfid_pipeline_stats():
+    """Estado das filas e contadores do pipeline de leitura RFID"""
+    pipeline = get_rfid_pipeline()
+    if not pipeline:
+        raise HTTPException(status_code=503, detail="Pipeline RFID não iniciado")
+    return pipeline.get_stats()
+
 @app.get("/api/rfid/history.csv", tags=["RFID"])
 def export_rfid_history_csv(
     raspberry_id: Optional[str] = Query(None),
@@ -518,17 +770,17 @@ def export_database_zip(db: Session = Depends(get_db)):
         # Device Status (current)
         rows = db.query(DeviceStatus).order_by(DeviceStatus.last_update.desc()).all()
         buffer = io.StringIO(); writer = csv.writer(buffer)
-        writer.writerow(["id","raspberry_id","led_internal_status","led_external_status","wifi_status","mem_usage","cpu_temp","cpu_percent","gpio_used_count","spi_buses","i2c_buses","usb_devices_count","net_bytes_sent","net_bytes_recv","net_ifaces","rfid_reader_status","last_rfid_read","last_update"]) 
+        writer.writerow(["id","raspberry_id","led_internal_status","led_external_status","wifi_status","mem_used_mb","cpu_temp_c","cpu_percent","gpio_used_count","spi_buses","i2c_buses","usb_devices_count","net_bytes_sent","net_bytes_recv","net_ifaces","rfid_reader_status","last_rfid_read","last_update"]) 
         for r in rows:
-            writer.writerow([r.id, r.raspberry_id, r.led_internal_status, r.led_external_status, r.wifi_status, r.mem_usage, r.cpu_temp, r.cpu_percent, r.gpio_used_count, r.spi_buses, r.i2c_buses, r.usb_devices_count, r.net_bytes_sent, r.net_bytes_recv, r.net_ifaces, r.rfid_reader_status, r.last_rfid_read.isoformat() if r.last_rfid_read else "", r.last_update.isoformat()])
+            writer.writerow([r.id, r.raspberry_id, r.led_internal_status, r.led_external_status, r.wifi_status, r.mem_used_mb, r.cpu_temp_c, r.cpu_percent, r.gpio_used_count, r.spi_buses, r.i2c_buses, r.usb_devices_count, r.net_bytes_sent, r.net_bytes_recv, r.net_ifaces, r.rfid_reader_status, r.last_rfid_read.isoformat() if r.last_rfid_read else "", r.last_update.isoformat()])
         zf.writestr("device_status.csv", buffer.getvalue())
 
         # Device Status History
         rows = db.query(DeviceStatusHistory).order_by(DeviceStatusHistory.timestamp.desc()).all()
         buffer = io.StringIO(); writer = csv.writer(buffer)
-        writer.writerow(["id","raspberry_id","led_internal_status","led_external_status","wifi_status","mem_usage","cpu_temp","cpu_percent","gpio_used_count","spi_buses","i2c_buses","usb_devices_count","net_bytes_sent","net_bytes_recv","net_ifaces","rfid_reader_status","last_rfid_read","timestamp"]) 
+        writer.writerow(["id","raspberry_id","led_internal_status","led_external_status","wifi_status","mem_used_mb","cpu_temp_c","cpu_percent","gpio_used_count","spi_buses","i2c_buses","usb_devices_count","net_bytes_sent","net_bytes_recv","net_ifaces","rfid_reader_status","last_rfid_read","timestamp"]) 
         for r in rows:
-            writer.writerow([r.id, r.raspberry_id, r.led_internal_status, r.led_external_status, r.wifi_status, r.mem_usage, r.cpu_temp, r.cpu_percent, r.gpio_used_count, r.spi_buses, r.i2c_buses, r.usb_devices_count, r.net_bytes_sent, r.net_bytes_recv, r.net_ifaces, r.rfid_reader_status, r.last_rfid_read.isoformat() if r.last_rfid_read else "", r.timestamp.isoformat()])
+            writer.writerow([r.id, r.raspberry_id, r.led_internal_status, r.led_external_status, r.wifi_status, r.mem_used_mb, r.cpu_temp_c, r.cpu_percent, r.gpio_used_count, r.spi_buses, r.i2c_buses, r.usb_devices_count, r.net_bytes_sent, r.net_bytes_recv, r.net_ifaces, r.rfid_reader_status, r.last_rfid_read.isoformat() if r.last_rfid_read else "", r.timestamp.isoformat()])
         zf.writestr("device_status_history.csv", buffer.getvalue())
 
     mem.seek(0)
@@ -565,10 +817,225 @@ def get_rfid_stats(
         "timestamp": datetime.utcnow()
     }
 
+# ==================== ACCESS CONTROL ENDPOINTS ====================
+
+def _validate_access_rule(rule_data: AccessRuleCreate):
+    if bool(rule_data.tag_uid) == bool(rule_data.group_name):
+        raise HTTPException(status_code=400, detail="Informe tag_uid ou group_name (apenas um)")
+    if rule_data.weekdays is not None and not 0 <= rule_data.weekdays <= 127:
+        raise HTTPException(status_code=400, detail="weekdays deve estar entre 0 e 127")
+    for minute in (rule_data.start_minute, rule_data.end_minute):
+        if minute is not None and not 0 <= minute <= 1440:
+            raise HTTPException(status_code=400, detail="start_minute/end_minute devem estar entre 0 e 1440")
+
+@app.post("/api/access/rules", response_model=AccessRuleResponse, tags=["Access Control"])
+def create_access_rule(rule_data: AccessRuleCreate, db: Session = Depends(get_db)):
+    """Cria uma regra de acesso (por tag ou por grupo) e recompila apenas essa regra"""
+    _validate_access_rule(rule_data)
+
+    try:
+        rule = AccessRule(**rule_data.dict())
+        rule.door_id = rule.door_id or "*"
+        db.add(rule)
+        db.commit()
+        db.refresh(rule)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao salvar regra: {str(e)}")
+
+    get_access_engine().add_rule_from_row(rule)
+    return rule
+
+@app.put("/api/access/rules/{rule_id}", response_model=AccessRuleResponse, tags=["Access Control"])
+def update_access_rule(rule_id: int, rule_data: AccessRuleCreate, db: Session = Depends(get_db)):
+    """Atualiza uma regra de acesso existente"""
+    rule = db.query(AccessRule).filter(AccessRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Regra não encontrada")
+    _validate_access_rule(rule_data)
+
+    for field, value in rule_data.dict().items():
+        setattr(rule, field, value)
+    rule.door_id = rule.door_id or "*"
+    db.commit()
+    db.refresh(rule)
+
+    get_access_engine().add_rule_from_row(rule)
+    return rule
+
+@app.get("/api/access/rules", response_model=List[AccessRuleResponse], tags=["Access Control"])
+def list_access_rules(
+    door_id: Optional[str] = Query(None, description="Filtrar por porta (raspberry_id)"),
+    db: Session = Depends(get_db)
+):
+    """Lista as regras de acesso cadastradas"""
+    query = db.query(AccessRule)
+    if door_id:
+        query = query.filter(AccessRule.door_id == door_id)
+    return query.order_by(AccessRule.id).all()
+
+@app.delete("/api/access/rules/{rule_id}", tags=["Access Control"])
+def delete_access_rule(rule_id: int, db: Session = Depends(get_db)):
+    """Remove uma regra de acesso"""
+    rule = db.query(AccessRule).filter(AccessRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Regra não encontrada")
+
+    db.delete(rule)
+    db.commit()
+    get_access_engine().remove_rule(rule_id)
+
+    return {"message": f"Regra {rule_id} removida com sucesso"}
+
+@app.post("/api/access/groups/{group_name}/members", tags=["Access Control"])
+def add_access_group_member(group_name: str, member: AccessGroupMemberCreate, db: Session = Depends(get_db)):
+    """Adiciona uma tag a um grupo de acesso"""
+    exists = db.query(AccessGroupMember).filter(
+        AccessGroupMember.group_name == group_name,
+        AccessGroupMember.tag_uid == member.uid
+    ).first()
+    if not exists:
+        db.add(AccessGroupMember(group_name=group_name, tag_uid=member.uid))
+        db.commit()
+
+    get_access_engine().add_member(group_name, member.uid)
+    return {"message": f"Tag {member.uid} adicionada ao grupo {group_name}"}
+
+@app.get("/api/access/groups/{group_name}/members", tags=["Access Control"])
+def list_access_group_members(group_name: str, db: Session = Depends(get_db)):
+    """Lista as tags de um grupo de acesso"""
+    members = db.query(AccessGroupMember).filter(AccessGroupMember.group_name == group_name).all()
+    return {"group_name": group_name, "members": [m.tag_uid for m in members]}
+
+@app.delete("/api/access/groups/{group_name}/members/{uid}", tags=["Access Control"])
+def remove_access_group_member(group_name: str, uid: str, db: Session = Depends(get_db)):
+    """Remove uma tag de um grupo de acesso"""
+    deleted = db.query(AccessGroupMember).filter(
+        AccessGroupMember.group_name == group_name,
+        AccessGroupMember.tag_uid == uid
+    ).delete()
+    db.commit()
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Membro não encontrado")
+
+    get_access_engine().remove_member(group_name, uid)
+    return {"message": f"Tag {uid} removida do grupo {group_name}"}
+
+@app.get("/api/access/check", tags=["Access Control"])
+def check_access(
+    uid: str = Query(..., description="UID da tag"),
+    raspberry_id: str = Query("1", description="Porta (raspberry_id)")
+):
+    """Avalia o acesso de uma tag sem acionar a fechadura"""
+    return get_access_engine().decide(uid, raspberry_id)
+
+@app.get("/api/access/decisions", tags=["Access Control"])
+def get_access_decisions(limit: int = Query(50, le=500)):
+    """Retorna as decisões de acesso mais recentes com o tempo de avaliação"""
+    engine = get_access_engine()
+    return {
+        "stats": engine.stats(),
+        "decisions": engine.recent_decisions(limit)
+    }
+
+# ==================== ALERT ENDPOINTS ====================
+
+def _validate_alert_rule(rule_data: AlertRuleCreate):
+    error = validate_rule(rule_data.kind, rule_data.metric, rule_data.op, rule_data.threshold,
+                          rule_data.clear_threshold, rule_data.duration_s, rule_data.window_s)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+@app.post("/api/alerts/rules", response_model=AlertRuleResponse, tags=["Alerts"])
+def create_alert_rule(rule_data: AlertRuleCreate, db: Session = Depends(get_db)):
+    """Cria uma regra de alerta e compila apenas essa regra"""
+    _validate_alert_rule(rule_data)
+
+    try:
+        rule = AlertRule(**rule_data.dict())
+        rule.raspberry_id = rule.raspberry_id or "*"
+        db.add(rule)
+        db.commit()
+        db.refresh(rule)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao salvar regra: {str(e)}")
+
+    get_alert_engine().add_rule_from_row(rule)
+    return rule
+
+@app.put("/api/alerts/rules/{rule_id}", response_model=AlertRuleResponse, tags=["Alerts"])
+def update_alert_rule(rule_id: int, rule_data: AlertRuleCreate, db: Session = Depends(get_db)):
+    """Atualiza uma regra de alerta (os alertas abertos dela são liberados e reavaliados)"""
+    rule = db.query(AlertRule).filter(AlertRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Regra não encontrada")
+    _validate_alert_rule(rule_data)
+
+    for field, value in rule_data.dict().items():
+        setattr(rule, field, value)
+    rule.raspberry_id = rule.raspberry_id or "*"
+    db.commit()
+    db.refresh(rule)
+
+    get_alert_engine().add_rule_from_row(rule)
+    return rule
+
+@app.get("/api/alerts/rules", response_model=List[AlertRuleResponse], tags=["Alerts"])
+def list_alert_rules(db: Session = Depends(get_db)):
+    """Lista as regras de alerta cadastradas"""
+    return db.query(AlertRule).order_by(AlertRule.id).all()
+
+@app.delete("/api/alerts/rules/{rule_id}", tags=["Alerts"])
+def delete_alert_rule(rule_id: int, db: Session = Depends(get_db)):
+    """Remove uma regra de alerta e libera os alertas abertos dela"""
+    rule = db.query(AlertRule).filter(AlertRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Regra não encontrada")
+
+    db.delete(rule)
+    db.commit()
+    get_alert_engine().remove_rule(rule_id)
+
+    return {"message": f"Regra {rule_id} removida com sucesso"}
+
+@app.get("/api/alerts", response_model=List[AlertResponse], tags=["Alerts"])
+def get_alerts(
+    status: Optional[str] = Query(None, description="firing ou resolved"),
+    raspberry_id: Optional[str] = None,
+    rule_id: Optional[int] = None,
+    limit: int = Query(100, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Histórico de alertas (mais recentes primeiro)"""
+    columns = schema_columns(Alert, AlertResponse)
+    query = db.query(*columns)
+    if status:
+        query = query.filter(Alert.status == status)
+    if raspberry_id:
+        query = query.filter(Alert.raspberry_id == raspberry_id)
+    if rule_id is not None:
+        query = query.filter(Alert.rule_id == rule_id)
+    return query_response(query.order_by(Alert.started_at.desc()).limit(limit), columns)
+
+@app.get("/api/alerts/active", tags=["Alerts"])
+def get_active_alerts():
+    """Alertas disparados e pendentes no motor (sem consultar o banco)"""
+    return get_alert_engine().active()
+
 # ==================== SERVO (FECHADURA) ENDPOINTS ====================
 
+async def _await_servo(future) -> bool:
+    """Aguarda o ack do daemon sem bloquear o event loop"""
+    try:
+        return bool(await asyncio.wait_for(
+            asyncio.wrap_future(future), get_servo_handler().timeout * 2
+        ))
+    except Exception:
+        return False
+
 @app.post("/api/servo/open", tags=["Servo Control"])
-def open_door(
+async def open_door(
     command: ServoCommand,
     db: Session = Depends(get_db)
 ):
@@ -580,15 +1047,28 @@ def open_door(
     if command.action != "open":
         raise HTTPException(status_code=400, detail="Ação deve ser 'open'")
     
-    success = servo.open_door(hold_time=command.hold_time or 5.0)
+    outcome, future = servo.request_open(hold_time=command.hold_time or 5.0)
+    if future is not None and not await _await_servo(future):
+        outcome = OUTCOME_FAILED
     
-    if not success:
-        raise HTTPException(status_code=500, detail="Erro ao abrir porta")
+    if outcome not in ACCEPTED_OUTCOMES:
+        raise HTTPException(status_code=500, detail=f"Erro ao abrir porta ({outcome})")
     
-    # Registrar no histórico
+    await run_in_threadpool(_save_manual_open, db, command.raspberry_id or "1")
+    
+    return {
+        "status": "success",
+        "message": f"Porta aberta por {command.hold_time or 5.0} segundos",
+        "outcome": outcome,
+        "raspberry_id": command.raspberry_id or "1",
+        "timestamp": datetime.utcnow()
+    }
+
+def _save_manual_open(db: Session, raspberry_id: str):
+    """Registra a abertura manual no histórico e no status do dispositivo"""
     try:
         door_open = DoorOpenHistory(
-            raspberry_id=command.raspberry_id or "1",
+            raspberry_id=raspberry_id,
             rfid_uid="manual",
             tag_name="Comando manual"
         )
@@ -596,7 +1076,7 @@ def open_door(
         
         # Atualizar status do dispositivo
         device = db.query(DeviceStatus).filter(
-            DeviceStatus.raspberry_id == command.raspberry_id or "1"
+            DeviceStatus.raspberry_id == raspberry_id
         ).first()
         if device:
             device.servo_status = "open"
@@ -604,7 +1084,7 @@ def open_door(
             device.last_update = datetime.utcnow()
         else:
             device = DeviceStatus(
-                raspberry_id=command.raspberry_id or "1",
+                raspberry_id=raspberry_id,
                 servo_status="open",
                 last_door_open=datetime.utcnow()
             )
@@ -614,11 +1094,21 @@ def open_door(
     except Exception as e:
         print(f"[Servo] Erro ao registrar abertura manual: {e}")
         db.rollback()
-    
+
+@app.post("/api/servo/close", tags=["Servo Control"])
+async def close_door():
+    """Fecha a porta imediatamente (cancela o tempo de abertura restante)"""
+    servo = get_servo_handler()
+    if not servo:
+        raise HTTPException(status_code=503, detail="Servo não disponível")
+
+    future = servo.request_close()
+    if future is None or not await _await_servo(future):
+        raise HTTPException(status_code=500, detail="Erro ao fechar porta")
+
     return {
         "status": "success",
-        "message": f"Porta aberta por {command.hold_time or 5.0} segundos",
-        "raspberry_id": command.raspberry_id or "1",
+        "message": "Porta fechada",
         "timestamp": datetime.utcnow()
     }
 
@@ -641,23 +1131,29 @@ def get_door_open_history(
     db: Session = Depends(get_db)
 ):
     """Obtém histórico de aberturas da porta"""
-    query = db.query(DoorOpenHistory)
+    columns = schema_columns(DoorOpenHistory, DoorOpenHistoryResponse)
+    query = db.query(*columns)
     
     if raspberry_id:
         query = query.filter(DoorOpenHistory.raspberry_id == raspberry_id)
     
-    history = query.order_by(DoorOpenHistory.timestamp.desc()).limit(limit).all()
-    return history
+    return query_response(query.order_by(DoorOpenHistory.timestamp.desc()).limit(limit), columns)
 
 # ==================== DEVICE STATUS ENDPOINTS ====================
 
 @app.get("/api/devices/status", response_model=List[DeviceStatusResponse], tags=["Device Status"])
-def get_all_devices_status(db: Session = Depends(get_db)):
-    devices = db.query(DeviceStatus).all()
-    return [DeviceStatusResponse.from_orm(device) for device in devices]
+def get_all_devices_status(request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = _not_modified(request, response, "devices")
+    if not_modified:
+        return not_modified
+    columns = schema_columns(DeviceStatus, DeviceStatusResponse)
+    return query_response(db.query(*columns), columns, headers=dict(response.headers))
 
 @app.get("/api/devices/{raspberry_id}/status", response_model=DeviceStatusResponse, tags=["Device Status"])
-def get_device_status(raspberry_id: str, db: Session = Depends(get_db)):
+def get_device_status(raspberry_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = _not_modified(request, response, f"device:{raspberry_id}")
+    if not_modified:
+        return not_modified
     device = db.query(DeviceStatus).filter(DeviceStatus.raspberry_id == raspberry_id).first()
     
     if not device:
@@ -665,6 +1161,118 @@ def get_device_status(raspberry_id: str, db: Session = Depends(get_db)):
     
     return DeviceStatusResponse.from_orm(device)
 
+@app.get("/api/devices/outages", response_model=List[DeviceOutageResponse], tags=["Device Status"])
+def get_device_outages(
+    raspberry_id: Optional[str] = None,
+    hours: float = Query(24 * 7, gt=0, le=24 * 365),
+    open_only: bool = Query(False, description="Apenas nós ainda offline"),
+    limit: int = Query(100, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Intervalos sem heartbeat detectados pelo tracker de liveness (mais recentes primeiro)"""
+    columns = schema_columns(DeviceOutage, DeviceOutageResponse)
+    query = db.query(*columns).filter(DeviceOutage.started_at >= datetime.utcnow() - timedelta(hours=hours))
+    if raspberry_id:
+        query = query.filter(DeviceOutage.raspberry_id == raspberry_id)
+    if open_only:
+        query = query.filter(DeviceOutage.ended_at.is_(None))
+    return query_response(query.order_by(DeviceOutage.started_at.desc()).limit(limit), columns)
+
+# ==================== DASHBOARD ENDPOINTS ====================
+
+@app.get("/api/dashboard", tags=["Dashboard"])
+def get_dashboard(
+    raspberry_id: Optional[str] = Query(None, description="Dispositivo selecionado (padrão: o primeiro)"),
+    messages: int = Query(50, ge=0, le=200, description="Mensagens em tempo real recentes"),
+    db: Session = Depends(get_db)
+):
+    """
+    Tudo que o dashboard carrega em uma resposta: dispositivos, status do
+    selecionado, mensagens recentes, última leitura RFID, servo e contadores
+    das últimas 24h. Mensagens, servo e última leitura vêm da memória; o resto
+    sai de uma única consulta (contadores como subconsultas escalares ligadas
+    à lista de dispositivos).
+    """
+    since = datetime.utcnow() - timedelta(hours=24)
+
+    # Sem dispositivo informado, os contadores usam o primeiro (mesma ordem da lista)
+    selected = raspberry_id
+    if selected is None:
+        selected = select(DeviceStatus.raspberry_id).order_by(DeviceStatus.id).limit(1).scalar_subquery()
+
+    def count_since(model, timestamp_column):
+        return select(func.count()).select_from(model).where(
+            timestamp_column >= since, model.raspberry_id == selected
+        ).scalar_subquery()
+
+    columns = [
+        count_since(RFIDReadHistory, RFIDReadHistory.timestamp).label("rfid_reads"),
+        select(func.count(func.distinct(RFIDReadHistory.uid))).where(
+            RFIDReadHistory.timestamp >= since, RFIDReadHistory.raspberry_id == selected
+        ).scalar_subquery().label("unique_tags"),
+        count_since(DoorOpenHistory, DoorOpenHistory.timestamp).label("door_opens"),
+        count_since(LEDHistory, LEDHistory.timestamp).label("led_actions"),
+    ]
+
+    # Última leitura: do barramento de eventos; após um restart, da mesma consulta
+    last_rfid = event_bus.latest("rfid", raspberry_id) if raspberry_id is not None else None
+    if last_rfid is None:
+        last_read = select(RFIDReadHistory).where(
+            RFIDReadHistory.raspberry_id == selected
+        ).order_by(RFIDReadHistory.timestamp.desc()).limit(1).subquery()
+        columns += [
+            select(last_read.c.uid).scalar_subquery().label("last_uid"),
+            select(last_read.c.tag_name).scalar_subquery().label("last_tag_name"),
+            select(last_read.c.raspberry_id).scalar_subquery().label("last_raspberry_id"),
+            select(last_read.c.timestamp).scalar_subquery().label("last_timestamp"),
+        ]
+
+    # Uma linha de contadores com LEFT JOIN nos dispositivos: ainda retorna sem dispositivos
+    stats = select(*columns).subquery()
+    rows = db.query(stats, DeviceStatus).select_from(stats).outerjoin(
+        DeviceStatus, true()
+    ).order_by(DeviceStatus.id).all()
+
+    counters = rows[0]
+    devices = [row.DeviceStatus for row in rows if row.DeviceStatus is not None]
+    if raspberry_id is None and devices:
+        raspberry_id = devices[0].raspberry_id
+
+    if last_rfid is None:
+        last_rfid = {"exists": False}
+        if counters.last_uid is not None:
+            last_rfid = {
+                "exists": True,
+                "uid": counters.last_uid,
+                "tag_name": counters.last_tag_name,
+                "raspberry_id": counters.last_raspberry_id,
+                "timestamp": counters.last_timestamp,
+            }
+    else:
+        last_rfid = {"exists": True, **last_rfid}
+
+    servo = get_servo_handler()
+    device_statuses = [DeviceStatusResponse.from_orm(d) for d in devices]
+    return {
+        "raspberry_id": raspberry_id,
+        "devices": device_statuses,
+        "device": next((d for d in device_statuses if d.raspberry_id == raspberry_id), None),
+        "realtime": {
+            "count": len(received_messages),
+            "data": received_messages[-messages:] if messages else [],
+        },
+        "last_rfid": last_rfid,
+        "servo": servo.get_cached_status() if servo else None,
+        "counters_24h": {
+            "rfid_reads": counters.rfid_reads,
+            "unique_tags": counters.unique_tags,
+            "door_opens": counters.door_opens,
+            "led_actions": counters.led_actions,
+        },
+        "gpio_available": GPIO_AVAILABLE,
+        "timestamp": datetime.utcnow()
+    }
+
 @app.get("/api/devices/{raspberry_id}/status/history", response_model=List[DeviceStatusHistoryResponse], tags=["Device Status"])
 def get_device_status_history(
     raspberry_id: str,
@@ -673,11 +1281,120 @@ def get_device_status_history(
     db: Session = Depends(get_db)
 ):
     since = datetime.utcnow() - timedelta(hours=hours)
-    rows = db.query(DeviceStatusHistory).filter(
+    # Tuplas de colunas + orjson: sem entidades ORM nem validação por linha
+    columns = schema_columns(DeviceStatusHistory, DeviceStatusHistoryResponse)
+    query = db.query(*columns).filter(
         DeviceStatusHistory.raspberry_id == raspberry_id,
         DeviceStatusHistory.timestamp >= since
-    ).order_by(DeviceStatusHistory.timestamp.desc()).limit(limit).all()
-    return rows
+    ).order_by(DeviceStatusHistory.timestamp.desc()).limit(limit)
+    return query_response(query, columns)
+
+@app.get("/api/devices/{raspberry_id}/metrics/recent", tags=["Device Status"])
+def get_recent_metrics(
+    raspberry_id: str,
+    minutes: float = Query(60, gt=0, description="Janela (limitada a TIMESERIES_HOURS)"),
+    step: Optional[float] = Query(None, ge=1, description="Tamanho do balde em segundos"),
+    points: Optional[int] = Query(None, ge=1, le=5000, description="Alternativa a step: número aproximado de pontos"),
+    aggregation: str = Query("mean", description="mean, min, max ou last"),
+    fields: Optional[str] = Query(None, description="Métricas separadas por vírgula (padrão: todas)")
+):
+    """
+    Séries recentes do dispositivo direto da memória (sem consultar o banco),
+    com downsampling e percentis (p50/p95/p99) das amostras da janela
+    """
+    if timeseries_store is None:
+        raise HTTPException(status_code=503, detail="Séries recentes indisponíveis (NumPy não instalado)")
+    if aggregation not in TIMESERIES_AGGREGATIONS:
+        raise HTTPException(status_code=400, detail=f"aggregation inválida. Use: {', '.join(TIMESERIES_AGGREGATIONS)}")
+    selected = None
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in TIMESERIES_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Métricas desconhecidas: {', '.join(unknown)}")
+
+    minutes = min(minutes, timeseries_store.hours * 60)
+    if step is None and points:
+        step = max(1.0, minutes * 60 / points)
+    result = timeseries_store.query(raspberry_id, minutes, step=step, aggregation=aggregation, fields=selected)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Sem amostras recentes para este dispositivo")
+    return result
+
+# ==================== ANALYTICS ENDPOINTS ====================
+
+@app.get("/api/analytics/fleet", tags=["Analytics"])
+def get_fleet_analytics(
+    days: float = Query(7, gt=0, le=365),
+    fields: Optional[str] = Query(None, description="Métricas separadas por vírgula (padrão: todas)"),
+    pcts: str = Query("50,95,99", description="Percentis separados por vírgula"),
+    raspberry_id: Optional[str] = Query(None, description="Restringe a um dispositivo"),
+    histograms: bool = Query(True, description="Inclui o histograma da frota por métrica"),
+    rank_by: str = Query("cpu_temp_c", description="Métrica usada no ranking"),
+    rank_stat: str = Query("p95", description="Estatística do ranking (pNN, mean ou max)"),
+    top: int = Query(5, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Percentis, médias e histogramas por dispositivo e da frota sobre o
+    histórico de status, processado em blocos com NumPy, e os dispositivos
+    com maior valor da estatística escolhida (ex.: p95 da temperatura)
+    """
+    if not ANALYTICS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Análises indisponíveis (NumPy não instalado)")
+    selected = [field.strip() for field in fields.split(",") if field.strip()] if fields else list(ANALYTICS_FIELDS)
+    unknown = [field for field in selected + [rank_by] if field not in ANALYTICS_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Métricas desconhecidas: {', '.join(unknown)}")
+    try:
+        percentiles = [float(pct) for pct in pcts.split(",") if pct.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="pcts deve ser uma lista de números")
+    if not percentiles or any(pct < 0 or pct > 100 for pct in percentiles):
+        raise HTTPException(status_code=400, detail="Percentis devem estar entre 0 e 100")
+    if rank_by not in selected:
+        selected.append(rank_by)
+
+    since = datetime.utcnow() - timedelta(days=days)
+    started = time.perf_counter()
+    report = fleet_health(
+        db.connection(), since, fields=selected, pcts=percentiles,
+        raspberry_ids=[raspberry_id] if raspberry_id else None, histograms=histograms
+    )
+    report["ranking"] = {
+        "field": rank_by,
+        "stat": rank_stat,
+        "devices": rank_devices(report, rank_by, rank_stat, top),
+    }
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return report
+
+@app.get("/api/anomalies", response_model=List[AnomalyResponse], tags=["Analytics"])
+def get_anomalies(
+    raspberry_id: Optional[str] = None,
+    metric: Optional[str] = None,
+    hours: float = Query(24, gt=0, le=24 * 365),
+    limit: int = Query(100, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Anomalias de saúde detectadas pelo consumer (mais recentes primeiro)"""
+    if metric is not None and metric not in ANOMALY_METRICS:
+        raise HTTPException(status_code=400, detail=f"Métrica desconhecida: {metric}")
+    columns = schema_columns(Anomaly, AnomalyResponse)
+    query = db.query(*columns).filter(Anomaly.timestamp >= datetime.utcnow() - timedelta(hours=hours))
+    if raspberry_id:
+        query = query.filter(Anomaly.raspberry_id == raspberry_id)
+    if metric:
+        query = query.filter(Anomaly.metric == metric)
+    return query_response(query.order_by(Anomaly.timestamp.desc()).limit(limit), columns)
+
+@app.get("/api/devices/{raspberry_id}/anomalies/baseline", tags=["Analytics"])
+def get_anomaly_baseline(raspberry_id: str):
+    """Linha de base atual do detector (média, desvio e inclinação EWMA por métrica)"""
+    baseline = anomaly_detector.baseline(raspberry_id)
+    if baseline is None:
+        raise HTTPException(status_code=404, detail="Dispositivo sem amostras desde o início do servidor")
+    return {"raspberry_id": raspberry_id, "metrics": baseline}
 
 # ==================== REAL-TIME DATA ENDPOINTS ====================
 
@@ -699,6 +1416,166 @@ def post_data(data: dict):
     received_messages.append(data)
     return {"status": "received", "data": data}
 
+# ==================== CHANGES (SYNC INCREMENTAL) ENDPOINTS ====================
+
+CHANGE_ENTITIES = ("rfid_tag", "device", "door_open")
+
+@app.get("/api/changes", tags=["Changes"])
+def get_changes(
+    since: int = Query(0, ge=0, description="Último seq já aplicado pelo cliente"),
+    limit: int = Query(500, ge=1, le=5000),
+    entity: Optional[str] = Query(None, description="rfid_tag, device ou door_open"),
+    raspberry_id: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Mudanças de tags, dispositivos (inclui estado dos LEDs) e aberturas de porta
+    com seq > since, em ordem. Inserções trazem a linha inteira e atualizações só
+    as colunas alteradas. O cliente guarda next_since e repete enquanto has_more;
+    reset=true indica que mudanças após since já foram descartadas e é preciso
+    recarregar as listas completas.
+    """
+    if entity is not None and entity not in CHANGE_ENTITIES:
+        raise HTTPException(status_code=400, detail=f"entity deve ser um de: {', '.join(CHANGE_ENTITIES)}")
+
+    # Limite lido antes das mudanças: seqs gravados depois ficam para a próxima chamada
+    oldest, high_water = db.query(func.min(ChangeLog.seq), func.max(ChangeLog.seq)).one()
+    high_water = high_water or 0
+
+    query = db.query(ChangeLog).filter(ChangeLog.seq > since, ChangeLog.seq <= high_water)
+    if entity:
+        query = query.filter(ChangeLog.entity == entity)
+    if raspberry_id:
+        query = query.filter(ChangeLog.raspberry_id == raspberry_id)
+    rows = query.order_by(ChangeLog.seq).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "changes": [
+            {
+                "seq": row.seq,
+                "entity": row.entity,
+                "key": row.key,
+                "op": row.op,
+                "raspberry_id": row.raspberry_id,
+                "data": json.loads(row.data or "{}"),
+                "timestamp": row.timestamp,
+            }
+            for row in rows
+        ],
+        "next_since": rows[-1].seq if has_more else max(since, high_water),
+        "has_more": has_more,
+        "high_water": high_water,
+        "reset": oldest is not None and since < oldest - 1,
+    }
+
+# ==================== EVENTS (PUSH) ENDPOINTS ====================
+
+SSE_HEARTBEAT = 15.0  # s sem eventos até enviar um comentário (mantém proxies abertos)
+
+@app.get("/api/events", tags=["Events"])
+async def stream_events(
+    request: Request,
+    topics: Optional[str] = Query(None, description="Tópicos separados por vírgula: device_status, realtime, rfid, servo, led"),
+    raspberry_id: Optional[str] = Query(None, description="Apenas eventos deste dispositivo (e os globais)"),
+    last_event_id: Optional[str] = Query(None, description="Retomar após este id (o header Last-Event-ID tem prioridade)")
+):
+    """
+    Stream Server-Sent Events com as mudanças de status, leituras RFID, servo e
+    LEDs. Não consulta o banco: o estado inicial vem da API REST e o stream
+    mantém o dashboard atualizado. Um evento "reset" indica que não foi possível
+    retomar e o cliente deve recarregar o estado completo.
+    """
+    topic_set = None
+    if topics:
+        topic_set = {topic.strip() for topic in topics.split(",") if topic.strip()}
+        unknown = topic_set - set(EVENT_TOPICS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Tópicos desconhecidos: {', '.join(sorted(unknown))}")
+
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    subscription, replay, reset = event_bus.subscribe(topic_set, raspberry_id, resume_from)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            if reset:
+                yield reset.encode()
+            for event in replay:
+                yield event.encode()
+            # Assinante lento demais é desconectado; o EventSource reconecta e retoma pelo id
+            while not subscription.overflowed:
+                event = await subscription.get(SSE_HEARTBEAT)
+                if event is not None:
+                    yield event.encode()
+                elif await request.is_disconnected():
+                    break
+                else:
+                    yield ": ping\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.get("/api/events/stats", tags=["Events"])
+def get_event_stats():
+    """Assinantes conectados, eventos publicados e tamanho do buffer de retomada"""
+    return event_bus.get_stats()
+
+# ==================== HARDWARE ENDPOINTS ====================
+
+@app.get("/api/hardware/pins", tags=["Hardware"])
+def get_pin_reservations():
+    """Tabela de reservas de pinos do HAL (dono, direção e último valor escrito)"""
+    hal = get_hal()
+    return {
+        "gpio_available": GPIO_AVAILABLE,
+        "mode": hal.mode_name,
+        **hal.stats(),
+        "pins": hal.reservations(),
+    }
+
+# ==================== METRICS ENDPOINTS ====================
+
+@app.get("/api/metrics/latency", tags=["Metrics"])
+def get_latency_metrics(slowest: int = Query(10, le=100)):
+    """Latência tag -> porta: histogramas por estágio e eventos recentes mais lentos"""
+    return latency_recorder.snapshot(slowest=slowest)
+
+@app.get("/api/metrics/hardware", tags=["Metrics"])
+def get_hardware_metrics():
+    """Executor de hardware: profundidade da fila, prazos vencidos e tempos de execução"""
+    return {
+        "executor": get_hw_executor().get_stats(),
+        "led_patterns_dropped_steps": get_pattern_engine().get_stats()["dropped_steps"],
+    }
+
+@app.get("/api/metrics/timeseries", tags=["Metrics"])
+def get_timeseries_metrics():
+    """Store de séries recentes: dispositivos, amostras e memória alocada"""
+    if timeseries_store is None:
+        return {"numpy": False}
+    return timeseries_store.get_stats()
+
+@app.get("/api/metrics/anomalies", tags=["Metrics"])
+def get_anomaly_metrics():
+    """Detector de anomalias: parâmetros, dispositivos acompanhados e contagem de alertas"""
+    return anomaly_detector.get_stats()
+
+@app.get("/api/metrics/liveness", tags=["Metrics"])
+def get_liveness_metrics():
+    """Tracker de liveness: nós online/offline, tamanho do heap e atraso do sweeper"""
+    return get_liveness_tracker().get_stats()
+
+@app.get("/api/metrics/alerts", tags=["Metrics"])
+def get_alert_metrics():
+    """Motor de alertas: regras por tipo, avaliações por mensagem e prazos no heap"""
+    return get_alert_engine().get_stats()
+
 # ==================== HEALTH CHECK ENDPOINTS ====================
 
 @app.get("/", tags=["Health Check"])
@@ -774,8 +1651,13 @@ def get_stats(db: Session = Depends(get_db)):
 @app.on_event("shutdown")
 def shutdown_event():
     print("Desligando API...")
+    cleanup_pattern_engine()
+    cleanup_alert_engine()
+    cleanup_liveness_tracker()
+    cleanup_hw_executor()
     GPIOController.cleanup()
     cleanup_rfid()
+    cleanup_rfid_pipeline()
     cleanup_servo()
 
 
@@ -0,0 +1,119 @@
+"""
+Migrações do esquema SQLite
+
+create_all só cria as tabelas que ainda não existem; mudanças em tabelas já
+existentes (bancos que já estão rodando nas Raspberries) são aplicadas aqui.
+A última migração aplicada fica em PRAGMA user_version e cada migração roda
+uma única vez, em ordem. Os passos são idempotentes: uma migração
+interrompida pode ser executada de novo com segurança.
+"""
+
+from sqlalchemy import inspect, text
+
+from database import parse_mem_mb, parse_temp_c
+
+BACKFILL_BATCH = 5000
+
+
+def _columns(conn, table: str) -> set:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn, table: str, name: str, ddl_type: str) -> bool:
+    if name in _columns(conn, table):
+        return False
+    conn.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN {name} {ddl_type}')
+    return True
+
+
+def _numeric_health_metrics(conn):
+    """
+    mem_used_mb / cpu_temp_c numéricos no lugar de "512 MB" / "48.2°C"
+
+    As colunas de texto antigas continuam no arquivo (o SQLite antigo das
+    Raspberries não tem DROP COLUMN), mas deixam de ser lidas e gravadas.
+    """
+    for table in ("device_status", "device_status_history"):
+        # Tabela criada já no formato novo: nada a converter
+        if not {"mem_usage", "cpu_temp"} <= _columns(conn, table):
+            continue
+        _add_column(conn, table, "mem_used_mb", "FLOAT")
+        _add_column(conn, table, "cpu_temp_c", "FLOAT")
+
+        # Backfill por faixas de id: não carrega o histórico inteiro na memória
+        select_batch = text(
+            f"SELECT id, mem_usage, cpu_temp FROM {table} "
+            "WHERE id > :last AND mem_used_mb IS NULL AND cpu_temp_c IS NULL "
+            "ORDER BY id LIMIT :batch"
+        )
+        update = text(f"UPDATE {table} SET mem_used_mb = :mem, cpu_temp_c = :temp WHERE id = :id")
+        last_id, updated = 0, 0
+        while True:
+            rows = conn.execute(select_batch, {"last": last_id, "batch": BACKFILL_BATCH}).all()
+            if not rows:
+                break
+            values = [
+                {"id": row_id, "mem": parse_mem_mb(mem_usage), "temp": parse_temp_c(cpu_temp)}
+                for row_id, mem_usage, cpu_temp in rows
+            ]
+            conn.execute(update, values)
+            last_id = rows[-1][0]
+            updated += len(rows)
+        if updated:
+            print(f"[Migrations] {table}: {updated} linhas convertidas para colunas numéricas")
+
+
+# Colunas da telemetria e o valor usado quando a linha antiga não tem o dado
+TELEMETRY_DEFAULTS = {
+    "mem_used_mb": "NULL",
+    "mem_percent": "0.0",
+    "cpu_temp_c": "NULL",
+    "cpu_percent": "0.0",
+    "net_bytes_sent": "0",
+    "net_bytes_recv": "0",
+    "last_update": "CURRENT_TIMESTAMP",
+}
+
+
+def _split_device_telemetry(conn):
+    """
+    Cria a linha de device_telemetry de cada dispositivo a partir de device_status
+
+    DeviceStatus é mapeado sobre o join das duas tabelas: um dispositivo sem
+    linha de telemetria não aparece nas consultas. As colunas quentes antigas
+    de device_status ficam no arquivo, sem uso.
+    """
+    existing = _columns(conn, "device_status")
+    values = ", ".join(
+        f"COALESCE({name}, {default})" if name in existing else default
+        for name, default in TELEMETRY_DEFAULTS.items()
+    )
+    result = conn.execute(text(
+        f"INSERT INTO device_telemetry (raspberry_id, {', '.join(TELEMETRY_DEFAULTS)}) "
+        f"SELECT raspberry_id, {values} FROM device_status "
+        "WHERE raspberry_id IS NOT NULL "
+        "AND raspberry_id NOT IN (SELECT raspberry_id FROM device_telemetry)"
+    ))
+    if result.rowcount:
+        print(f"[Migrations] device_telemetry: {result.rowcount} dispositivos copiados de device_status")
+
+
+# (versão, descrição, função) - nunca renumerar nem remover uma migração já publicada
+MIGRATIONS = [
+    (1, "métricas de memória e temperatura numéricas", _numeric_health_metrics),
+    (2, "telemetria separada do status do dispositivo", _split_device_telemetry),
+]
+
+
+def run_migrations(engine):
+    """Aplica as migrações pendentes (chamado por init_db após o create_all)"""
+    with engine.connect() as conn:
+        current = conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+        print(f"[Migrations] Versão {version} aplicada: {description}")
@@ -10,15 +10,17 @@ def get_system_info():
     """Coleta informações do sistema ampliadas"""
     try:
         mem = psutil.virtual_memory()
-        mem_usage = f"{int(mem.used / (1024**2))} MB"
+        mem_used_mb = round(mem.used / (1024**2), 1)
+        mem_usage = f"{int(mem_used_mb)} MB"
         mem_percent = float(mem.percent)
         cpu_percent = psutil.cpu_percent(interval=0)
 
         try:
             with open("/sys/class/thermal/thermal_zone0/temp", "r") as f:
-                temp = float(f.read()) / 1000.0
-                cpu_temp = f"{temp:.1f}°C"
+                cpu_temp_c = float(f.read()) / 1000.0
+                cpu_temp = f"{cpu_temp_c:.1f}°C"
         except:
+            cpu_temp_c = None
             cpu_temp = "N/A"
 
         wifi_status = "online" if psutil.net_if_stats().get("wlan0") else "unknown"
@@ -37,9 +39,12 @@ def get_system_info():
         gpio_used_count = 0
 
         return {
+            # Texto mantido para servidores antigos; o servidor atual grava os valores numéricos
             "mem_usage": mem_usage,
+            "mem_used_mb": mem_used_mb,
             "mem_percent": mem_percent,
             "cpu_temp": cpu_temp,
+            "cpu_temp_c": cpu_temp_c,
             "cpu_percent": cpu_percent,
             "wifi_status": wifi_status,
             "gpio_used_count": gpio_used_count,
@@ -3,35 +3,142 @@ RFID Handler CORRIGIDO para Raspberry Pi 5
 Gerencia leitura de tags RFID SEM conflitar com GPIO
 """
 
+import os
 import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 from typing import Optional, Callable
 from database import SessionLocal, RFIDTag, RFIDReadHistory, DeviceStatus
+from latency import latency_recorder
+from hal import get_hal
 import socket
 
 try:
-    from pirc522 import RFID
+    # pirc522 real ou leitor simulado, conforme HW_BACKEND
+    from hardware import load_rfid_class
+    RFID = load_rfid_class()
     RFID_AVAILABLE = True
-except ImportError:
+except (ImportError, RuntimeError):
     RFID_AVAILABLE = False
     print("[RFID] pirc522 não disponível - rodando em modo simulação")
 
 
+# Janela padrão (segundos) de supressão de leituras repetidas da mesma tag
+DEFAULT_SUPPRESS_WINDOW = float(os.getenv("RFID_SUPPRESS_WINDOW", "3.0"))
+
+# Pinos BCM do RC522 (além de SPI0/CE0) e dono na tabela de reservas do HAL
+RFID_OWNER = "rfid"
+RFID_PIN_RST = 25
+RFID_PIN_IRQ = 24
+
+
+class ReadSuppressor:
+    """
+    Janela de supressão de leituras repetidas por UID e por leitora
+
+    Enquanto a tag permanece sobre a leitora, o polling a lê várias vezes por
+    segundo. Cada (leitora, UID) fica em um cache ordenado pelo último instante
+    em que foi visto; leituras dentro da janela apenas incrementam um contador,
+    sem gerar escritas no banco nem comandos para a fechadura. A janela é
+    deslizante: enquanto o cartão continuar sendo apresentado, continua suprimido.
+    """
+
+    def __init__(self, window: float = DEFAULT_SUPPRESS_WINDOW, max_entries: int = 1024):
+        """
+        Args:
+            window: Janela de supressão em segundos (0 desativa)
+            max_entries: Tamanho máximo do cache (entradas mais antigas são descartadas)
+        """
+        self.window = window
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (reader_id, uid) -> [primeira leitura, última leitura, leituras suprimidas]
+        self._entries: "OrderedDict[tuple, list]" = OrderedDict()
+        self.accepted = 0
+        self.suppressed = 0
+        self.evicted = 0
+
+    def should_process(self, reader_id: str, uid: str, now: Optional[float] = None) -> bool:
+        """Retorna True para uma nova apresentação, False se for repetição dentro da janela"""
+        if self.window <= 0:
+            self.accepted += 1
+            return True
+        if now is None:
+            now = time.monotonic()
+        key = (reader_id, uid)
+
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1] = now
+                entry[2] += 1
+                self._entries.move_to_end(key)
+                self.suppressed += 1
+                return False
+
+            self._entries[key] = [now, now, 0]
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+            self.accepted += 1
+            return True
+
+    def _evict(self, now: float):
+        """Remove entradas expiradas (o cache está ordenado pela última leitura)"""
+        limit = now - self.window
+        entries = self._entries
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if entry[1] > limit:
+                break
+            entries.popitem(last=False)
+            self.evicted += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            self._evict(time.monotonic())
+            active = [
+                {"reader_id": key[0], "uid": key[1], "suppressed_reads": entry[2]}
+                for key, entry in self._entries.items()
+            ]
+        total = self.accepted + self.suppressed
+        return {
+            "window_seconds": self.window,
+            "accepted": self.accepted,
+            "suppressed": self.suppressed,
+            "evicted": self.evicted,
+            "suppression_ratio": round(self.suppressed / total, 3) if total else 0.0,
+            "active": active,
+        }
+
+
 class RFIDHandler:
     """Handler para gerenciar sensor RFID"""
     
-    def __init__(self, raspberry_id: Optional[str] = None):
+    def __init__(self, raspberry_id: Optional[str] = None, suppress_window: Optional[float] = None):
         self.raspberry_id = raspberry_id or socket.gethostname()
         self.reader = None
         self.util = None
         self.running = False
         self.read_callback: Optional[Callable] = None
+        self.pipeline = None
+        self.suppressor = ReadSuppressor(
+            DEFAULT_SUPPRESS_WINDOW if suppress_window is None else suppress_window
+        )
         
         if RFID_AVAILABLE:
             try:
                 # IMPORTANTE: pirc522 gerencia GPIO internamente
                 # Não fazer GPIO.cleanup() aqui - deixar pirc522 gerenciar
-                self.reader = RFID()
+                # O HAL reserva SPI0/CE0 e os pinos RST (BCM25) e IRQ (BCM24) e
+                # informa ao driver o modo de numeração e os números correspondentes
+                hal = get_hal()
+                spi = hal.spi_device(RFID_OWNER, bus=0, device=0,
+                                     pins={"rst": RFID_PIN_RST, "irq": RFID_PIN_IRQ})
+                self.reader = RFID(pin_mode=hal.mode, pin_rst=spi.channel("rst"),
+                                   pin_irq=spi.channel("irq"))
                 self.util = self.reader.util()
                 self.util.debug = False
                 print(f"[RFID] Sensor inicializado com sucesso para {self.raspberry_id}")
@@ -42,6 +149,14 @@ class RFIDHandler:
     def set_read_callback(self, callback: Callable):
         """Define função callback para quando uma tag for lida"""
         self.read_callback = callback
+
+    def set_pipeline(self, pipeline):
+        """
+        Entrega as leituras a um pipeline em estágios (ver rfid_pipeline.py).
+        Com pipeline, a thread de polling apenas detecta o UID; nome, decisão,
+        acionamento e persistência acontecem nos estágios seguintes.
+        """
+        self.pipeline = pipeline
     
     def load_tag_name(self, uid_str: str) -> str:
         """Carrega nome da tag do banco de dados"""
@@ -123,9 +238,28 @@ class RFIDHandler:
             (error, uid) = self.reader.anticoll()
             if error:
                 return None
+            detected = latency_recorder.start(label="reader")
             
             uid_str = "-".join(f"{x:02X}" for x in uid)
+
+            # Mesma tag ainda sobre a leitora: apenas conta a repetição
+            if not self.suppressor.should_process(self.raspberry_id, uid_str):
+                return None
+
             self.util.set_tag(uid)
+
+            if self.pipeline:
+                now = datetime.utcnow()
+                event = {
+                    "uid": uid_str,
+                    "tag_name": None,
+                    "raspberry_id": self.raspberry_id,
+                    "timestamp": now.isoformat(),
+                    "read_at": now,
+                    "trace": detected
+                }
+                self.pipeline.submit(event)
+                return event
             
             # Carregar nome salvo
             tag_name = self.load_tag_name(uid_str)
@@ -188,10 +322,10 @@ class RFIDHandler:
 # Instância global
 _rfid_handler: Optional[RFIDHandler] = None
 
-def init_rfid_handler(raspberry_id: Optional[str] = None) -> RFIDHandler:
+def init_rfid_handler(raspberry_id: Optional[str] = None, suppress_window: Optional[float] = None) -> RFIDHandler:
     """Inicializa o handler global RFID"""
     global _rfid_handler
-    _rfid_handler = RFIDHandler(raspberry_id)
+    _rfid_handler = RFIDHandler(raspberry_id, suppress_window)
     return _rfid_handler
 
 def get_rfid_handler() -> Optional[RFIDHandler]:
@@ -0,0 +1,233 @@
+"""
+Pipeline de leitura RFID em estágios
+
+    leitura (thread de polling) -> decisão/acionamento -> persistência em lote
+
+A thread de polling apenas detecta o UID e o entrega por uma fila sem lock
+(queue.SimpleQueue) ao estágio de decisão, que resolve o nome da tag em memória,
+decide o acesso e aciona a fechadura. Só depois o evento segue para o estágio de
+escrita, que agrupa várias leituras em uma única transação no SQLite. Assim a
+latência tag -> porta não depende da velocidade do banco.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database import SessionLocal, RFIDReadHistory, DoorOpenHistory, DeviceStatus
+from event_bus import publish_event
+from alerts import observe_rfid_read
+
+_STOP = object()
+
+
+class RFIDPipeline:
+    """Pipeline de leitura RFID com persistência desacoplada"""
+
+    def __init__(self, actuate: Callable[[dict], Optional[dict]],
+                 name_lookup: Optional[Callable[[str], str]] = None,
+                 batch_size: int = 64, flush_interval: float = 0.25):
+        """
+        Args:
+            actuate: Estágio de decisão/acionamento. Recebe o evento e retorna
+                um dict opcional ({"door_opened": bool, ...})
+            name_lookup: Resolve o nome da tag sem acessar o banco
+            batch_size: Máximo de eventos por transação de escrita
+            flush_interval: Tempo máximo (s) que um evento espera pelo lote
+        """
+        self.actuate = actuate
+        self.name_lookup = name_lookup or (lambda uid: "")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._events: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writes: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._threads: List[threading.Thread] = []
+        self.running = False
+
+        self.submitted = 0
+        self.actuated = 0
+        self.persisted = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.last_batch_ms = 0.0
+
+    def start(self):
+        """Inicia as threads dos estágios de decisão e de escrita"""
+        if self.running:
+            return
+        self.running = True
+        self._threads = [
+            threading.Thread(target=self._decision_loop, name="rfid-decision", daemon=True),
+            threading.Thread(target=self._writer_loop, name="rfid-writer", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        print("[RFID Pipeline] Estágios de decisão e escrita iniciados")
+
+    def stop(self, timeout: float = 2.0):
+        """Para os estágios, gravando o que ainda estiver na fila"""
+        if not self.running:
+            return
+        self.running = False
+        self._events.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, event: dict):
+        """Chamado pela thread de leitura: entrega o UID detectado sem bloquear"""
+        self.submitted += 1
+        self._events.put(event)
+
+    # ---------- Estágio de decisão/acionamento ----------
+
+    def _decision_loop(self):
+        while True:
+            event = self._events.get()
+            if event is _STOP:
+                self._writes.put(_STOP)
+                return
+            try:
+                if not event.get("tag_name"):
+                    event["tag_name"] = self.name_lookup(event["uid"]) or ""
+                trace = event.get("trace")
+                if trace:
+                    trace.mark("name_lookup")
+                print(f"[RFID] Tag lida UID={event['uid']} Nome={event['tag_name']}")
+                outcome = self.actuate(event) or {}
+                self.actuated += 1
+            except Exception as e:
+                print(f"[RFID Pipeline] Erro no estágio de decisão: {e}")
+                outcome = {}
+            # Publicado antes da gravação: o dashboard não espera o lote do banco
+            publish_event("rfid", {
+                "uid": event["uid"],
+                "tag_name": event.get("tag_name") or None,
+                "raspberry_id": event["raspberry_id"],
+                "timestamp": event.get("read_at") or datetime.utcnow(),
+                "access_allowed": (outcome.get("access") or {}).get("allowed"),
+                "servo_outcome": outcome.get("servo_outcome"),
+            }, event["raspberry_id"])
+            observe_rfid_read(event["raspberry_id"])
+            self._writes.put((event, outcome))
+
+    # ---------- Estágio de escrita em lote ----------
+
+    def _writer_loop(self):
+        while True:
+            item = self._writes.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._writes.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._persist(batch)
+            if stop:
+                return
+
+    def _persist(self, batch: List[Tuple[dict, dict]]):
+        """Grava um lote de leituras (e aberturas) em uma única transação"""
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            # raspberry_id -> (última leitura, última abertura)
+            device_updates: Dict[str, List[Optional[datetime]]] = {}
+            for event, outcome in batch:
+                read_at = event.get("read_at") or datetime.utcnow()
+                tag_name = event.get("tag_name") or ""
+                raspberry_id = event["raspberry_id"]
+                db.add(RFIDReadHistory(
+                    uid=event["uid"],
+                    tag_name=tag_name,
+                    raspberry_id=raspberry_id,
+                    timestamp=read_at
+                ))
+                update = device_updates.setdefault(raspberry_id, [None, None])
+                update[0] = read_at
+
+                if outcome.get("door_opened"):
+                    db.add(DoorOpenHistory(
+                        raspberry_id=raspberry_id,
+                        rfid_uid=event["uid"],
+                        tag_name=tag_name or "<Sem nome>",
+                        timestamp=outcome.get("opened_at") or read_at
+                    ))
+                    update[1] = outcome.get("opened_at") or read_at
+
+            devices = db.query(DeviceStatus).filter(
+                DeviceStatus.raspberry_id.in_(list(device_updates))
+            ).all()
+            for device in devices:
+                last_read, last_open = device_updates[device.raspberry_id]
+                device.last_rfid_read = last_read
+                device.rfid_reader_status = "online"
+                if last_open is not None:
+                    device.last_door_open = last_open
+                    device.last_update = datetime.utcnow()
+
+            db.commit()
+            self.persisted += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.write_errors += 1
+            print(f"[RFID Pipeline] Erro ao gravar lote de {len(batch)} leituras: {e}")
+            db.rollback()
+        finally:
+            db.close()
+            self.last_batch_ms = (time.perf_counter() - start) * 1000.0
+            for event, _ in batch:
+                trace = event.get("trace")
+                if trace:
+                    trace.mark("db_persist")
+
+    def get_stats(self) -> dict:
+        return {
+            "running": self.running,
+            "submitted": self.submitted,
+            "actuated": self.actuated,
+            "persisted": self.persisted,
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+            "pending_decision": self._events.qsize(),
+            "pending_write": self._writes.qsize(),
+            "last_batch_ms": round(self.last_batch_ms, 2),
+        }
+
+
+# Instância global
+_rfid_pipeline: Optional[RFIDPipeline] = None
+
+def init_rfid_pipeline(actuate: Callable[[dict], Optional[dict]],
+                       name_lookup: Optional[Callable[[str], str]] = None) -> RFIDPipeline:
+    """Inicializa e inicia o pipeline global de leitura RFID"""
+    global _rfid_pipeline
+    _rfid_pipeline = RFIDPipeline(actuate, name_lookup)
+    _rfid_pipeline.start()
+    return _rfid_pipeline
+
+def get_rfid_pipeline() -> Optional[RFIDPipeline]:
+    """Retorna a instância global do pipeline RFID"""
+    return _rfid_pipeline
+
+def cleanup_rfid_pipeline():
+    """Para o pipeline gravando as leituras pendentes"""
+    global _rfid_pipeline
+    if _rfid_pipeline:
+        _rfid_pipeline.stop()
+        _rfid_pipeline = None
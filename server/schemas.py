@@ -1,7 +1,8 @@
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional, List
-import json
+from fast_json import parse_json_list
+from database import FORMATTED_COLUMNS
 
 class LEDCommand(BaseModel):
     status: str
@@ -9,6 +10,36 @@ class LEDCommand(BaseModel):
     led_type: Optional[str] = "external"
     pin: Optional[int] = None
 
+class LEDBatchItem(BaseModel):
+    """Uma mudança de LED dentro de um lote"""
+    status: str
+    led_type: Optional[str] = "external"
+    pin: Optional[int] = None
+
+class LEDBatchCommand(BaseModel):
+    """Schema para aplicar várias mudanças de LED em uma requisição"""
+    raspberry_id: Optional[str] = "1"
+    changes: List[LEDBatchItem]
+
+class LEDPatternStep(BaseModel):
+    """Passo de uma sequência: status ON/OFF ou level (brilho 0-100 por PWM)"""
+    status: Optional[str] = None
+    level: Optional[float] = None
+    duration_ms: int
+
+class LEDPatternCommand(BaseModel):
+    """Schema para iniciar um padrão de LED (blink, fade ou sequence)"""
+    pattern: str
+    raspberry_id: Optional[str] = "1"
+    led_type: Optional[str] = "external"
+    pin: Optional[int] = None
+    on_ms: int = 500
+    off_ms: int = 500
+    period_ms: int = 2000
+    steps: Optional[List[LEDPatternStep]] = None
+    repeat: Optional[int] = None
+    final_status: str = "OFF"
+
 class LEDHistoryResponse(BaseModel):
     id: int
     raspberry_id: str
@@ -61,9 +92,11 @@ class DeviceStatusResponse(BaseModel):
     led_internal_status: bool
     led_external_status: bool
     wifi_status: str
-    mem_usage: str
+    mem_usage: str  # formatado a partir de mem_used_mb
+    mem_used_mb: Optional[float] = None
     mem_percent: float  # Novo campo adicionado
-    cpu_temp: str
+    cpu_temp: str  # formatado a partir de cpu_temp_c
+    cpu_temp_c: Optional[float] = None
     cpu_percent: float
     gpio_used_count: int
     spi_buses: int
@@ -84,7 +117,9 @@ class DeviceStatusResponse(BaseModel):
     @classmethod
     def from_orm(cls, obj):
         data = obj.__dict__.copy()
-        data['net_ifaces'] = json.loads(data.get('net_ifaces', '[]'))
+        data['net_ifaces'] = parse_json_list(data.get('net_ifaces'))
+        for name, (column, formatter) in FORMATTED_COLUMNS.items():
+            data[name] = formatter(data.get(column))
         return cls(**data)
 
 class DeviceStatusHistoryResponse(BaseModel):
@@ -94,7 +129,9 @@ class DeviceStatusHistoryResponse(BaseModel):
     led_external_status: bool
     wifi_status: str
     mem_usage: str
+    mem_used_mb: Optional[float] = None
     cpu_temp: str
+    cpu_temp_c: Optional[float] = None
     cpu_percent: float
     gpio_used_count: int
     spi_buses: int
@@ -122,6 +159,80 @@ class DoorOpenHistoryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class DeviceOutageResponse(BaseModel):
+    """Schema para intervalos sem heartbeat"""
+    id: int
+    raspberry_id: str
+    started_at: datetime
+    detected_at: datetime
+    ended_at: Optional[datetime]
+    duration_s: Optional[float]
+
+    class Config:
+        from_attributes = True
+
+class AnomalyResponse(BaseModel):
+    """Schema para anomalias de saúde detectadas"""
+    id: int
+    raspberry_id: str
+    metric: str
+    kind: str
+    value: float
+    expected: Optional[float]
+    score: Optional[float]
+    threshold: Optional[float]
+    timestamp: datetime
+
+    class Config:
+        from_attributes = True
+
+class AlertRuleCreate(BaseModel):
+    """Schema para criar/atualizar regra de alerta"""
+    name: str
+    kind: str = "threshold"  # threshold, silence ou rate
+    metric: Optional[str] = None
+    op: Optional[str] = ">"
+    threshold: Optional[float] = None
+    clear_threshold: Optional[float] = None
+    duration_s: Optional[float] = 0.0
+    window_s: Optional[float] = 60.0
+    raspberry_id: Optional[str] = "*"
+    enabled: Optional[bool] = True
+
+class AlertRuleResponse(BaseModel):
+    """Schema para resposta de regra de alerta"""
+    id: int
+    name: str
+    kind: str
+    metric: Optional[str]
+    op: str
+    threshold: Optional[float]
+    clear_threshold: Optional[float]
+    duration_s: float
+    window_s: float
+    raspberry_id: str
+    enabled: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class AlertResponse(BaseModel):
+    """Schema para alertas disparados"""
+    id: int
+    rule_id: int
+    rule_name: str
+    raspberry_id: str
+    metric: Optional[str]
+    value: Optional[float]
+    threshold: Optional[float]
+    status: str
+    started_at: datetime
+    resolved_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
 class ServoCommand(BaseModel):
     """Schema para comando do servo"""
     action: str  # "open" para abrir a porta
@@ -129,3 +240,36 @@ class ServoCommand(BaseModel):
     raspberry_id: Optional[str] = "1"
 
 
+
+class AccessRuleCreate(BaseModel):
+    """Schema para criar/atualizar regra de acesso"""
+    door_id: Optional[str] = "*"  # raspberry_id da porta ou "*" para todas
+    tag_uid: Optional[str] = None
+    group_name: Optional[str] = None
+    weekdays: Optional[int] = 127  # bit 0 = segunda ... bit 6 = domingo
+    start_minute: Optional[int] = 0
+    end_minute: Optional[int] = 1440
+    valid_from: Optional[datetime] = None
+    valid_until: Optional[datetime] = None
+    enabled: Optional[bool] = True
+
+class AccessRuleResponse(BaseModel):
+    """Schema para resposta de regra de acesso"""
+    id: int
+    door_id: str
+    tag_uid: Optional[str]
+    group_name: Optional[str]
+    weekdays: int
+    start_minute: int
+    end_minute: int
+    valid_from: Optional[datetime]
+    valid_until: Optional[datetime]
+    enabled: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class AccessGroupMemberCreate(BaseModel):
+    """Schema para adicionar tag a um grupo de acesso"""
+    uid: str
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Daemon do atuador da fechadura (servo SG90)
+
+Processo de longa duração que mantém um ServoSG90 já inicializado (GPIO e PWM
+configurados uma única vez) e recebe comandos da API por um socket Unix local.
+Evita iniciar um interpretador e reconfigurar o GPIO a cada abertura da porta.
+
+Execute com: sudo python3 servo_daemon.py [--pin 12] [--socket /run/servo/servo_daemon.sock] [--group servo]
+
+Acesso: o socket fica em um diretório do root (0750) e tem modo 0660 com o
+grupo SERVO_GROUP (padrão "servo"), ao qual o usuário da API deve pertencer
+(sudo groupadd servo && sudo usermod -aG servo <usuário da API>). Cada
+conexão é conferida por SO_PEERCRED: só root, o próprio usuário do daemon e
+membros do grupo enviam comandos. Sem o grupo, o socket fica 0600.
+
+Protocolo: uma mensagem JSON por linha.
+    {"cmd": "open", "hold_time": 5.0}  -> abre e fecha após hold_time (0/None mantém aberta)
+    {"cmd": "close"}                    -> fecha imediatamente
+    {"cmd": "status"}                   -> estado atual
+Resposta (ack): {"ok": true, "cmd": "...", "state": "open|closed", "motion_ms": ..., ...}
+O ack de open/close só é enviado depois que o pulso do novo ângulo foi
+aplicado ao servo; motion_ms é a espera por esse passo do agendador.
+"""
+
+import argparse
+import grp
+import json
+import os
+import pwd
+import socket
+import socketserver
+import stat
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sg90_servo import ServoSG90, GPIO_AVAILABLE, SETTLE_TIME, get_motion_scheduler
+
+SERVO_AVAILABLE = GPIO_AVAILABLE
+if not SERVO_AVAILABLE:
+    print("[Servo Daemon] RPi.GPIO não disponível - rodando em modo simulação")
+
+DEFAULT_SOCKET_PATH = os.getenv("SERVO_SOCKET", "/run/servo/servo_daemon.sock")
+DEFAULT_SOCKET_GROUP = os.getenv("SERVO_GROUP", "servo")
+OPEN_ANGLE = 180
+CLOSED_ANGLE = 90
+COMMAND_TIMEOUT = 1.0  # espera máxima (s) pelo pulso antes de responder com erro
+
+
+class ServoActuator:
+    """Mantém o servo inicializado e executa comandos open/close/status"""
+
+    def __init__(self, gpio_pin: int = 12):
+        self.gpio_pin = gpio_pin
+        self.servo = None
+        self.state = "closed"
+        self.close_deadline: Optional[float] = None
+        self.last_open_time: Optional[datetime] = None
+        self.commands = 0
+        self._lock = threading.Lock()
+        # Fechamento agendado no mesmo heap de deadlines dos movimentos do servo
+        self.scheduler = get_motion_scheduler()
+        self._close_entry = None
+        self._close_generation = 0
+
+        if SERVO_AVAILABLE:
+            try:
+                self.servo = ServoSG90(gpio_pin, initial_angle=CLOSED_ANGLE)
+                print(f"[Servo Daemon] ✓ Servo inicializado no pino {gpio_pin}")
+            except Exception as e:
+                print(f"[Servo Daemon] ✗ Erro ao inicializar servo: {e}")
+                self.servo = None
+
+    def _move(self, angle: int, wait: bool = True) -> float:
+        """
+        Agenda o movimento (pulso imediato, alívio do PWM depois)
+
+        Com wait=True aguarda o pulso ser aplicado pela thread do agendador,
+        sem esperar o alívio do PWM. Retorna a espera em ms.
+        """
+        start = time.monotonic()
+        if self.servo:
+            commanded = threading.Event() if wait else None
+            self.servo.move(angle, on_command=commanded.set if wait else None)
+            if wait and not commanded.wait(COMMAND_TIMEOUT):
+                raise RuntimeError(f"pulso de {angle}° não aplicado em {COMMAND_TIMEOUT}s")
+        else:
+            print(f"[Servo Daemon] [SIMULAÇÃO] Servo -> {angle}°")
+        return (time.monotonic() - start) * 1000.0
+
+    def open(self, hold_time: Optional[float]) -> dict:
+        with self._lock:
+            self.commands += 1
+            motion_ms = 0.0
+            if self.state != "open":
+                motion_ms = self._move(OPEN_ANGLE)
+                self.state = "open"
+            self.last_open_time = datetime.utcnow()
+
+            # Reabertura com a porta aberta apenas reagenda o fechamento
+            self._cancel_close_locked()
+            if hold_time and hold_time > 0:
+                generation = self._close_generation
+                self.close_deadline = time.time() + hold_time
+                self._close_entry = self.scheduler.call_later(
+                    hold_time, lambda: self._timed_close(generation)
+                )
+            else:
+                self.close_deadline = None
+            return {**self._status_locked(), "motion_ms": round(motion_ms, 3)}
+
+    def _timed_close(self, generation: int):
+        with self._lock:
+            # Ignora timers substituídos por uma reabertura enquanto aguardavam o lock
+            if generation == self._close_generation:
+                # Roda na thread do agendador: não pode aguardar o próprio passo
+                self._close_locked(wait=False)
+
+    def close(self) -> dict:
+        with self._lock:
+            self.commands += 1
+            return self._close_locked()
+
+    def _cancel_close_locked(self):
+        if self._close_entry:
+            self._close_entry.cancel()
+            self._close_entry = None
+        self._close_generation += 1
+
+    def _close_locked(self, wait: bool = True) -> dict:
+        self._cancel_close_locked()
+        motion_ms = 0.0
+        if self.state != "closed":
+            motion_ms = self._move(CLOSED_ANGLE, wait)
+            self.state = "closed"
+        self.close_deadline = None
+        return {**self._status_locked(), "motion_ms": round(motion_ms, 3)}
+
+    def status(self) -> dict:
+        with self._lock:
+            return self._status_locked()
+
+    def _status_locked(self) -> dict:
+        return {
+            "state": self.state,
+            "gpio_pin": self.gpio_pin,
+            "hardware": self.servo is not None,
+            "close_deadline": self.close_deadline,
+            "last_open_time": self.last_open_time.isoformat() if self.last_open_time else None,
+            "commands": self.commands,
+        }
+
+    def cleanup(self):
+        with self._lock:
+            self._cancel_close_locked()
+            if self.servo:
+                self.servo.cancel()
+                self.servo.command_angle(CLOSED_ANGLE)
+                time.sleep(SETTLE_TIME)
+                self.servo.cleanup()
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    """Uma conexão pode enviar vários comandos (um JSON por linha)"""
+
+    def handle(self):
+        actuator: ServoActuator = self.server.actuator
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                cmd = request.get("cmd")
+                if cmd == "open":
+                    result = actuator.open(request.get("hold_time"))
+                elif cmd == "close":
+                    result = actuator.close()
+                elif cmd == "status":
+                    result = actuator.status()
+                else:
+                    raise ValueError(f"comando desconhecido: {cmd}")
+                response = {"ok": True, "cmd": cmd, **result}
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode())
+            self.wfile.flush()
+
+
+def _group_id(name: Optional[str]) -> Optional[int]:
+    if not name:
+        return None
+    try:
+        return grp.getgrnam(name).gr_gid
+    except KeyError:
+        print(f"[Servo Daemon] ⚠️  Grupo '{name}' não existe - socket acessível só por root e pelo daemon")
+        return None
+
+
+def _prepare_socket_dir(socket_path: str, gid: Optional[int]):
+    """
+    Diretório do socket do próprio usuário do daemon, sem escrita para outros
+
+    Um diretório de outro dono (ou um link simbólico) poderia ter o socket
+    pré-criado ou trocado por outro usuário: nesse caso o daemon não inicia.
+    """
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(directory, mode=0o750, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.geteuid():
+        raise PermissionError(f"{directory} deve ser um diretório do usuário do daemon")
+    if gid is not None:
+        os.chown(directory, -1, gid)
+    os.chmod(directory, 0o750)
+
+    if os.path.lexists(socket_path):
+        if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+            raise PermissionError(f"{socket_path} existe e não é um socket")
+        os.unlink(socket_path)
+
+
+class ServoDaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, actuator: ServoActuator, group: Optional[str] = None):
+        self.gid = _group_id(group)
+        _prepare_socket_dir(socket_path, self.gid)
+        # umask restritivo: o socket nunca existe com permissões abertas, nem entre o bind e o chmod
+        previous = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _CommandHandler)
+        finally:
+            os.umask(previous)
+        if self.gid is not None:
+            os.chown(socket_path, -1, self.gid)
+            os.chmod(socket_path, 0o660)
+        self.actuator = actuator
+
+    def verify_request(self, request, client_address) -> bool:
+        """Confere o usuário do processo cliente (SO_PEERCRED) antes de aceitar comandos"""
+        if not hasattr(socket, "SO_PEERCRED"):
+            return True  # fora do Linux valem só as permissões do socket
+        _, uid, gid = struct.unpack("3i", request.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+        ))
+        if uid in (0, os.geteuid()):
+            return True
+        if self.gid is not None:
+            if gid == self.gid:
+                return True
+            try:
+                if pwd.getpwuid(uid).pw_name in grp.getgrgid(self.gid).gr_mem:
+                    return True
+            except KeyError:
+                pass
+        print(f"[Servo Daemon] ✗ Conexão recusada do uid {uid} (gid {gid})")
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daemon do atuador da fechadura (servo SG90)")
+    parser.add_argument("--pin", type=int, default=12, help="Pino GPIO (BCM) do servo")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Caminho do socket Unix")
+    parser.add_argument("--group", default=DEFAULT_SOCKET_GROUP, help="Grupo com acesso ao socket (usuário da API)")
+    args = parser.parse_args()
+
+    actuator = ServoActuator(args.pin)
+    server = ServoDaemonServer(args.socket, actuator, group=args.group)
+    print(f"[Servo Daemon] Aguardando comandos em {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[Servo Daemon] Encerrando...")
+    finally:
+        server.server_close()
+        actuator.cleanup()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,115 +3,280 @@ Handler para controle do servo motor SG90 (fechadura)
 
 Controla o servo no pino 12 para simular abertura de porta
 
-VERSÃO 2: Executa script diagnostico_servo.py via subprocess
+VERSÃO 3: Envia comandos ao daemon do atuador (servo_daemon.py) por socket Unix.
+O daemon mantém o ServoSG90 inicializado, então abrir a porta não exige mais
+iniciar um interpretador e reconfigurar o GPIO a cada leitura.
+
+Os comandos passam por uma fila com um único consumidor: aberturas duplicadas
+ainda na fila são mescladas e uma abertura com a porta já aberta apenas estende
+o prazo de fechamento, sem ciclos extras do servo.
 """
 
-import threading
-import subprocess
+import json
 import os
-from typing import Optional
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Optional, Tuple
 from datetime import datetime
-from database import SessionLocal
+
+from hal import get_hal
+from event_bus import publish_event
+
+# Mesmo caminho padrão usado pelo servo_daemon.py
+DEFAULT_SOCKET_PATH = os.getenv("SERVO_SOCKET", "/run/servo/servo_daemon.sock")
+
+# Dono do pino do servo na tabela de reservas do HAL
+SERVO_OWNER = "servo"
+
+# Resultados possíveis de um pedido de abertura
+OUTCOME_OPENED = "opened"      # porta estava fechada: novo ciclo do servo
+OUTCOME_EXTENDED = "extended"  # porta já aberta: apenas estende o fechamento
+OUTCOME_MERGED = "merged"      # mesclado com uma abertura ainda na fila
+OUTCOME_DROPPED = "dropped"    # fila cheia: pedido descartado
+OUTCOME_FAILED = "failed"      # daemon não confirmou (apenas com wait=True)
+ACCEPTED_OUTCOMES = (OUTCOME_OPENED, OUTCOME_EXTENDED, OUTCOME_MERGED)
 
 class ServoHandler:
-    """Handler para gerenciar servo motor (fechadura) via script externo"""
+    """Handler para gerenciar servo motor (fechadura) via daemon do atuador"""
 
-    def __init__(self, gpio_pin: int = 12, script_path: str = None):
+    def __init__(self, gpio_pin: int = 12, socket_path: str = None, timeout: float = 2.0,
+                 max_queue: int = 16):
         """
         Inicializa o handler do servo
 
         Args:
             gpio_pin: Pino GPIO onde o servo está conectado (padrão: 12)
-            script_path: Caminho para o script de controle do servo
+            socket_path: Caminho do socket Unix do daemon do atuador
+            timeout: Tempo máximo (s) para aguardar o ack do daemon
+            max_queue: Máximo de comandos pendentes na fila do atuador
         """
         self.gpio_pin = gpio_pin
+        # O pino é acionado pelo daemon; reservá-lo aqui impede que a API o use para LEDs
+        get_hal().reserve_external(gpio_pin, SERVO_OWNER)
+        self.socket_path = socket_path or DEFAULT_SOCKET_PATH
+        self.timeout = timeout
         self.is_open = False
         self.is_moving = False
         self.last_open_time: Optional[datetime] = None
-        
-        # Determinar caminho do script
-        if script_path is None:
-            # Assumir que está no mesmo diretório
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            self.script_path = os.path.join(current_dir, "diagnostico_servo.py")
-        else:
-            self.script_path = script_path
-        
-        # Verificar se script existe
-        if os.path.exists(self.script_path):
-            print(f"[Servo Handler] Script encontrado: {self.script_path}")
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+        # Fila de comandos (consumidor único) e estado usado para mesclar aberturas
+        self.max_queue = max_queue
+        self.close_deadline: Optional[float] = None
+        self._queue: deque = deque()
+        self._pending_open: Optional[dict] = None
+        self._cond = threading.Condition()
+        self._running = True
+        self.counters = {
+            OUTCOME_OPENED: 0, OUTCOME_EXTENDED: 0, OUTCOME_MERGED: 0, OUTCOME_DROPPED: 0,
+            "sent": 0, "failed": 0, "max_depth": 0
+        }
+        self._worker = threading.Thread(target=self._consume, name="servo-commands", daemon=True)
+        self._worker.start()
+
+        status = self._send({"cmd": "status"})
+        if status:
+            print(f"[Servo Handler] Daemon do atuador conectado: {self.socket_path}")
         else:
-            print(f"[Servo Handler] ⚠️  Script não encontrado: {self.script_path}")
-        
+            print(f"[Servo Handler] ⚠️  Daemon do atuador não encontrado em {self.socket_path}")
+            print("[Servo Handler] Inicie com: sudo python3 servo_daemon.py")
+
         print(f"[Servo Handler] Inicializado no pino GPIO {gpio_pin}")
 
-    def open_door(self, hold_time: float = 5.0) -> bool:
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+
+    def _disconnect(self):
+        for resource in (self._reader, self._sock):
+            try:
+                if resource:
+                    resource.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+    def _send(self, request: dict) -> Optional[dict]:
+        """Envia um comando ao daemon e aguarda o ack (conexão persistente)"""
+        payload = (json.dumps(request) + "\n").encode()
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._sock.sendall(payload)
+                    line = self._reader.readline()
+                    if not line:
+                        raise ConnectionError("daemon fechou a conexão")
+                    response = json.loads(line)
+                    if not response.get("ok"):
+                        print(f"[Servo] ✗ Daemon recusou {request.get('cmd')}: {response.get('error')}")
+                        return None
+                    return response
+                except (OSError, ConnectionError, ValueError) as e:
+                    self._disconnect()
+                    if attempt == 1:
+                        print(f"[Servo] ✗ Daemon do atuador indisponível: {e}")
+        return None
+
+    def _apply_state(self, response: dict):
+        self.is_open = response.get("state") == "open"
+
+    # ---------- Fila de comandos ----------
+
+    def _enqueue_locked(self, command: dict) -> bool:
+        if len(self._queue) >= self.max_queue:
+            return False
+        self._queue.append(command)
+        self.counters["max_depth"] = max(self.counters["max_depth"], len(self._queue))
+        self._cond.notify()
+        return True
+
+    def request_open(self, hold_time: float = 5.0, trace=None) -> Tuple[str, Optional[Future]]:
+        """
+        Enfileira um pedido de abertura e retorna o resultado determinístico
+
+        O resultado é o previsto na hora do enfileiramento; só vale como
+        abertura depois que o future resolver True (ack do daemon).
+
+        Returns:
+            (resultado, future do ack do daemon ou None se descartado)
+        """
+        now = time.time()
+        hold_until = now + hold_time
+        if trace:
+            trace.expect("actuator_done")
+
+        with self._cond:
+            pending = self._pending_open
+            if pending is not None:
+                # Abertura ainda não enviada: mescla, ficando com o maior prazo
+                pending["hold_until"] = max(pending["hold_until"], hold_until)
+                if trace:
+                    pending["traces"].append(trace)
+                pending["outcomes"].append(OUTCOME_MERGED)
+                outcome, future = OUTCOME_MERGED, pending["future"]
+            else:
+                door_open = self.close_deadline is not None and now < self.close_deadline
+                command = {"cmd": "open", "hold_until": hold_until, "future": Future(),
+                           "traces": [trace] if trace else [], "outcomes": []}
+                if not self._enqueue_locked(command):
+                    self.counters[OUTCOME_DROPPED] += 1
+                    print("[Servo] ✗ Fila do atuador cheia, pedido de abertura descartado")
+                    if trace:
+                        trace.mark("actuator_done")
+                    return OUTCOME_DROPPED, None
+                self._pending_open = command
+                outcome = OUTCOME_EXTENDED if door_open else OUTCOME_OPENED
+                command["outcomes"].append(outcome)
+                future = command["future"]
+
+            # Os contadores de opened/extended/merged só sobem com o ack do daemon (_consume)
+            self.close_deadline = max(self.close_deadline or 0.0, hold_until)
+
+        print(f"[Servo] → Pedido de abertura por {hold_time}s: {outcome}")
+        return outcome, future
+
+    def open_door(self, hold_time: float = 5.0, trace=None, wait: bool = False) -> str:
         """
         Abre a fechadura (gira o servo para 180°) e mantém por hold_time segundos
-        
-        Executa o script diagnostico_servo.py via subprocess
+
+        Uma abertura com a porta já aberta estende o prazo de fechamento e
+        pedidos duplicados ainda na fila são mesclados.
 
         Args:
             hold_time: Tempo em segundos para manter a porta aberta (padrão: 5)
+            trace: LatencyTrace opcional da leitura que originou a abertura
+            wait: Aguarda o ack do daemon antes de retornar
 
         Returns:
-            bool: True se a operação foi bem-sucedida
+            str: "opened", "extended", "merged", "dropped" ou "failed"
         """
-        if self.is_moving:
-            print("[Servo] Servo já está em movimento, ignorando comando")
-            return False
+        outcome, future = self.request_open(hold_time, trace)
+        if wait and future is not None:
+            try:
+                if not future.result(timeout=self.timeout * 2):
+                    return OUTCOME_FAILED
+            except Exception:
+                return OUTCOME_FAILED
+        return outcome
+
+    def request_close(self) -> Optional[Future]:
+        """Enfileira o fechamento; retorna o future do ack ou None se a fila estiver cheia"""
+        command = {"cmd": "close", "future": Future(), "traces": [], "outcomes": []}
+        with self._cond:
+            if not self._enqueue_locked(command):
+                self.counters[OUTCOME_DROPPED] += 1
+                return None
+            self.close_deadline = None
+        return command["future"]
 
-        if not os.path.exists(self.script_path):
-            print(f"[Servo] ⚠️  Script não encontrado: {self.script_path}")
+    def close_door(self) -> bool:
+        """Fecha a fechadura imediatamente (após os comandos já enfileirados)"""
+        future = self.request_close()
+        if future is None:
+            return False
+        try:
+            return bool(future.result(timeout=self.timeout * 2))
+        except Exception:
             return False
 
-        self.is_moving = True
+    def _consume(self):
+        """Consumidor único: envia os comandos ao daemon na ordem da fila"""
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                command = self._queue.popleft()
+                if command is self._pending_open:
+                    self._pending_open = None
+                self.is_moving = True
 
-        def open_thread():
-            try:
-                print(f"[Servo] → Executando script: {self.script_path}")
-                self.is_open = True
-                self.last_open_time = datetime.utcnow()
-
-                # Executar script com sudo
-                result = subprocess.run(
-                    ["sudo", "python3", self.script_path],
-                    capture_output=True,
-                    text=True,
-                    timeout=30  # Timeout de 30 segundos
-                )
-
-                # Exibir saída do script
-                if result.stdout:
-                    print("[Servo] Saída do script:")
-                    for line in result.stdout.split('\n'):
-                        if line.strip():
-                            print(f"  {line}")
-
-                if result.returncode == 0:
-                    print("[Servo] ✓ Script executado com sucesso")
+            request = {"cmd": command["cmd"]}
+            if command["cmd"] == "open":
+                request["hold_time"] = max(0.1, command["hold_until"] - time.time())
+            for trace in command["traces"]:
+                trace.mark("actuator_command")
+
+            response = self._send(request)
+            self.counters["sent"] += 1
+            if response:
+                self._apply_state(response)
+                for outcome in command["outcomes"]:
+                    self.counters[outcome] += 1
+                if command["cmd"] == "open":
+                    self.last_open_time = datetime.utcnow()
                 else:
-                    print(f"[Servo] ✗ Script falhou com código {result.returncode}")
-                    if result.stderr:
-                        print(f"[Servo] Erro: {result.stderr}")
-
-                self.is_open = False
-                print(f"[Servo] ← Porta fechada novamente")
-
-            except subprocess.TimeoutExpired:
-                print(f"[Servo] ✗ Timeout ao executar script (>30s)")
-                self.is_open = False
-            except Exception as e:
-                print(f"[Servo] ✗ Erro ao executar script: {e}")
-                self.is_open = False
-            finally:
-                self.is_moving = False
-
-        # Executa em thread separada para não bloquear
-        thread = threading.Thread(target=open_thread, daemon=True)
-        thread.start()
+                    print("[Servo] ← Porta fechada")
+            else:
+                self.counters["failed"] += 1
+                if command["cmd"] == "open":
+                    with self._cond:
+                        self.close_deadline = None
 
-        return True
+            self.is_moving = False
+            # O daemon só confirma depois de aplicar o pulso: o estágio inclui o início do movimento
+            for trace in command["traces"]:
+                trace.mark("actuator_done")
+            command["future"].set_result(response is not None)
+            publish_event("servo", {
+                "cmd": command["cmd"],
+                "ok": response is not None,
+                "is_open": self.is_open,
+                "close_deadline": response.get("close_deadline") if response else None,
+                "motion_ms": response.get("motion_ms") if response else None,
+            })
 
     def get_status(self) -> dict:
         """
@@ -120,17 +285,41 @@ class ServoHandler:
         Returns:
             dict: Status do servo (is_open, is_moving, last_open_time)
         """
+        response = self._send({"cmd": "status"})
+        if response:
+            self._apply_state(response)
+        return {
+            "is_open": self.is_open,
+            "is_moving": self.is_moving,
+            "last_open_time": self.last_open_time.isoformat() if self.last_open_time else None,
+            "close_deadline": response.get("close_deadline") if response else None,
+            "queue_depth": len(self._queue),
+            "counters": dict(self.counters),
+            "gpio_pin": self.gpio_pin,
+            "available": response is not None,
+            "hardware": bool(response and response.get("hardware")),
+            "socket_path": self.socket_path
+        }
+
+    def get_cached_status(self) -> dict:
+        """Status conhecido pelo handler (último ack do daemon), sem consultar o daemon"""
         return {
             "is_open": self.is_open,
             "is_moving": self.is_moving,
             "last_open_time": self.last_open_time.isoformat() if self.last_open_time else None,
+            "close_deadline": self.close_deadline,
+            "queue_depth": len(self._queue),
+            "counters": dict(self.counters),
             "gpio_pin": self.gpio_pin,
-            "available": os.path.exists(self.script_path),
-            "script_path": self.script_path
         }
 
     def cleanup(self):
-        """Libera recursos do servo (nenhum recurso persistente nesta versão)"""
+        """Fecha a conexão com o daemon (o daemon continua rodando)"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        with self._lock:
+            self._disconnect()
         print("[Servo] Handler limpo")
 
 
@@ -138,11 +327,11 @@ class ServoHandler:
 _servo_handler: Optional[ServoHandler] = None
 
 
-def init_servo_handler(gpio_pin: int = 12, script_path: str = None) -> ServoHandler:
+def init_servo_handler(gpio_pin: int = 12, socket_path: str = None) -> ServoHandler:
     """Inicializa o handler global do servo"""
     global _servo_handler
     print(f"[Servo Handler] Inicializando no pino GPIO {gpio_pin}...")
-    _servo_handler = ServoHandler(gpio_pin, script_path)
+    _servo_handler = ServoHandler(gpio_pin, socket_path)
     return _servo_handler
 
 
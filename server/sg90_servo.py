@@ -1,13 +1,111 @@
 """
 Biblioteca FINAL CORRIGIDA para controle de servo motor SG90 usando RPi.GPIO
 
-COMPATÍVEL COM PIRC522 - não reconfigura GPIO se já estiver configurado
+COMPATÍVEL COM PIRC522 - modo de numeração e pino ficam a cargo do HAL (hal.py)
 
 CORREÇÃO: Mantém PWM ativo durante TODA a movimentação
+
+Movimentos não bloqueantes (move, ramp, hold_until) são agendados como
+mudanças de duty cycle em um MotionScheduler: uma única thread com heap de
+deadlines que pode acionar vários servos ao mesmo tempo.
 """
 
-import RPi.GPIO as GPIO
+# Sem GPIO o agendador de movimentos continua utilizável (ex.: daemon em simulação)
+from hal import get_hal, GPIO_AVAILABLE, ServoHandle
+import heapq
+import itertools
+import threading
 import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, List, Optional
+
+SETTLE_TIME = 0.5  # Tempo para o servo completar um movimento
+
+
+class _ScheduledCall:
+    """Entrada do heap de deadlines (cancelável)"""
+
+    __slots__ = ("deadline", "seq", "callback", "cancelled")
+
+    def __init__(self, deadline: float, seq: int, callback: Callable[[], None]):
+        self.deadline = deadline
+        self.seq = seq
+        self.callback = callback
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class MotionScheduler:
+    """
+    Agendador de movimentos: uma thread de timer com heap de deadlines
+
+    Cada mudança de duty cycle é uma entrada no heap (deadline em
+    time.monotonic()). O número de threads não depende de quantos servos ou
+    movimentos estão ativos.
+    """
+
+    def __init__(self):
+        self._heap: List[_ScheduledCall] = []
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+
+    def call_at(self, deadline: float, callback: Callable[[], None]) -> _ScheduledCall:
+        """Agenda callback para o instante deadline (time.monotonic())"""
+        entry = _ScheduledCall(deadline, next(self._seq), callback)
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="servo-motion", daemon=True)
+                self._thread.start()
+            # Só acorda a thread se a nova entrada for a próxima a vencer
+            if self._heap[0] is entry:
+                self._cond.notify()
+        return entry
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> _ScheduledCall:
+        return self.call_at(time.monotonic() + delay, callback)
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(1 for entry in self._heap if not entry.cancelled)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap and self._heap[0].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0].deadline - time.monotonic()
+                    if delay <= 0:
+                        entry = heapq.heappop(self._heap)
+                        break
+                    self._cond.wait(delay)
+            try:
+                entry.callback()
+            except Exception as e:
+                print(f"[Servo] Erro em movimento agendado: {e}")
+
+
+_motion_scheduler: Optional[MotionScheduler] = None
+_motion_scheduler_lock = threading.Lock()
+
+def get_motion_scheduler() -> MotionScheduler:
+    """Retorna o agendador de movimentos compartilhado pelo processo"""
+    global _motion_scheduler
+    with _motion_scheduler_lock:
+        if _motion_scheduler is None:
+            _motion_scheduler = MotionScheduler()
+        return _motion_scheduler
+
 
 class ServoSG90:
     """
@@ -20,43 +118,32 @@ class ServoSG90:
     - Pulso para 180°: ~2ms (12.5% duty cycle)
     """
 
-    def __init__(self, gpio_pin, initial_angle=90):
+    def __init__(self, gpio_pin, initial_angle=90, scheduler=None):
         """
         Inicializa o servo motor
 
         Args:
             gpio_pin (int): Número do pino GPIO (numeração BCM)
             initial_angle (int): Ângulo inicial (0-180)
+            scheduler (MotionScheduler): Agendador dos movimentos não bloqueantes
+                (padrão: agendador compartilhado do processo)
         """
         self.gpio_pin = gpio_pin
-        self.frequency = 50  # 50Hz para servos
+        self.frequency = ServoHandle.FREQUENCY  # 50Hz para servos
         self.pwm = None
+        self.scheduler = scheduler or get_motion_scheduler()
+        self._motion_lock = threading.Lock()
+        self._motion: Optional[Future] = None
+        self._motion_entries: List[_ScheduledCall] = []
+
+        if not GPIO_AVAILABLE:
+            raise RuntimeError("RPi.GPIO não disponível")
 
         try:
-            # Verificar se GPIO já está configurado
-            current_mode = GPIO.getmode()
-
-            if current_mode is None:
-                # GPIO ainda não configurado - configurar em BCM
-                GPIO.setmode(GPIO.BCM)
-                GPIO.setwarnings(False)
-                print(f"[Servo] GPIO configurado em modo BCM")
-            elif current_mode == GPIO.BCM:
-                # Já está em BCM (perfeito!)
-                GPIO.setwarnings(False)
-                print(f"[Servo] GPIO já estava em modo BCM (compatível)")
-            elif current_mode == GPIO.BOARD:
-                # Já está em BOARD - manter e continuar
-                GPIO.setwarnings(False)
-                print(f"[Servo] ⚠️  GPIO em modo BOARD, mas continuando...")
-
-            # Configurar pino (funciona independente do modo)
-            GPIO.setup(self.gpio_pin, GPIO.OUT)
-            print(f"[Servo] Pino {gpio_pin} configurado como OUTPUT")
-
-            # Inicializar PWM
-            self.pwm = GPIO.PWM(self.gpio_pin, self.frequency)
-            
+            # Reserva o pino e cria o PWM de 50Hz pelo HAL (modo e conflitos tratados lá)
+            self.pwm = get_hal().servo(self.gpio_pin)
+            print(f"[Servo] Pino {gpio_pin} reservado para o servo (PWM {self.frequency}Hz)")
+
             # IMPORTANTE: Iniciar PWM e MANTER LIGADO
             self.pwm.start(0)  # Começa em 0 para evitar movimento brusco inicial
             
@@ -80,13 +167,8 @@ class ServoSG90:
         Returns:
             float: Duty cycle em porcentagem
         """
-        # Limitar ângulo entre 0 e 180
-        angle = max(0, min(180, angle))
-        
-        # Mapear ângulo para duty cycle
-        # 0° = 2.5% (1ms), 90° = 7.5% (1.5ms), 180° = 12.5% (2ms)
-        duty_cycle = 2.5 + (angle / 180.0) * 10
-        return duty_cycle
+        # 0° = 2.5% (1ms), 90° = 7.5% (1.5ms), 180° = 12.5% (2ms), limitado a 0-180
+        return ServoHandle.angle_to_duty(angle)
 
     def _set_angle(self, angle):
         """
@@ -98,12 +180,168 @@ class ServoSG90:
         duty_cycle = self._angle_to_duty_cycle(angle)
         
         # CORREÇÃO: Mudar duty cycle e MANTER por tempo suficiente
-        self.pwm.ChangeDutyCycle(duty_cycle)
+        self.pwm.set_duty(duty_cycle)
         time.sleep(0.5)  # Tempo para o servo completar o movimento
         
         # Opcional: Reduzir duty cycle para economizar energia e reduzir ruído
         # mas NÃO zerar completamente
-        self.pwm.ChangeDutyCycle(0)
+        self.pwm.set_duty(0)
+
+    def command_angle(self, angle):
+        """
+        Envia o pulso para o ângulo especificado sem aguardar o movimento
+
+        Usado pelo daemon do atuador, que confirma o comando imediatamente
+        e agenda o alívio do PWM (release) separadamente.
+
+        Args:
+            angle (int): Ângulo desejado (0-180)
+        """
+        self.pwm.set_duty(self._angle_to_duty_cycle(angle))
+        self.current_angle = angle
+
+    def release(self):
+        """Zera o duty cycle após o movimento (reduz ruído e consumo)"""
+        self.pwm.set_duty(0)
+
+    # ---------- Movimentos não bloqueantes ----------
+
+    def _new_motion(self) -> Future:
+        """Cancela o movimento pendente (o último comando vence) e inicia outro"""
+        with self._motion_lock:
+            self._cancel_locked()
+            motion = Future()
+            entries: List[_ScheduledCall] = []
+            self._motion = motion
+            self._motion_entries = entries
+
+        def on_done(future):
+            if future.cancelled():
+                for entry in entries:
+                    entry.cancel()
+
+        motion.add_done_callback(on_done)
+        return motion
+
+    def _schedule(self, motion: Future, deadline: float, step: Callable[[], None]):
+        def run():
+            if not motion.done():
+                step()
+
+        entry = self.scheduler.call_at(deadline, run)
+        with self._motion_lock:
+            if self._motion is motion:
+                self._motion_entries.append(entry)
+            else:
+                entry.cancel()
+
+    @staticmethod
+    def _finish(motion: Future, result):
+        try:
+            motion.set_result(result)
+        except InvalidStateError:
+            pass  # cancelado enquanto o último passo executava
+
+    def _cancel_locked(self):
+        for entry in self._motion_entries:
+            entry.cancel()
+        if self._motion is not None:
+            self._motion.cancel()
+        self._motion = None
+        self._motion_entries = []
+
+    def cancel(self):
+        """Cancela o movimento pendente (o servo permanece no ângulo atual)"""
+        with self._motion_lock:
+            self._cancel_locked()
+
+    def move(self, angle, settle=SETTLE_TIME, on_command: Optional[Callable[[], None]] = None) -> Future:
+        """
+        Move para o ângulo sem bloquear; o PWM é zerado após settle segundos
+
+        Args:
+            on_command: Chamado na thread do agendador logo após o pulso ser aplicado
+
+        Returns:
+            Future: resolvida com o ângulo quando o movimento termina
+        """
+        motion = self._new_motion()
+        now = time.monotonic()
+
+        def command():
+            self.command_angle(angle)
+            if on_command:
+                on_command()
+
+        self._schedule(motion, now, command)
+
+        def done():
+            self.release()
+            self._finish(motion, angle)
+
+        self._schedule(motion, now + settle, done)
+        return motion
+
+    def hold_until(self, deadline) -> Future:
+        """
+        Mantém o pulso do ângulo atual até deadline (time.monotonic()) e então zera o PWM
+
+        Returns:
+            Future: resolvida com o ângulo no deadline
+        """
+        motion = self._new_motion()
+        angle = self.current_angle
+        self._schedule(motion, time.monotonic(), lambda: self.command_angle(angle))
+
+        def done():
+            self.release()
+            self._finish(motion, angle)
+
+        self._schedule(motion, deadline, done)
+        return motion
+
+    def ramp(self, angle, duration=1.0, steps=20) -> Future:
+        """
+        Movimento suave até o ângulo: steps mudanças de duty cycle ao longo de duration
+
+        Returns:
+            Future: resolvida com o ângulo ao final da rampa
+        """
+        motion = self._new_motion()
+        start_angle = self.current_angle
+        now = time.monotonic()
+        steps = max(1, int(steps))
+        for i in range(1, steps + 1):
+            target = start_angle + (angle - start_angle) * i / steps
+            self._schedule(motion, now + duration * i / steps,
+                           lambda target=target: self.command_angle(target))
+
+        def done():
+            self.release()
+            self._finish(motion, angle)
+
+        self._schedule(motion, now + duration + SETTLE_TIME, done)
+        return motion
+
+    def move_and_return(self, angle, hold_time=5, return_to=None) -> Future:
+        """
+        Versão não bloqueante de move_to_angle_and_return
+
+        Returns:
+            Future: resolvida quando o servo volta ao ângulo original
+        """
+        motion = self._new_motion()
+        original = self.current_angle if return_to is None else return_to
+        now = time.monotonic()
+        self._schedule(motion, now, lambda: self.command_angle(angle))
+        self._schedule(motion, now + SETTLE_TIME + hold_time, lambda: self.command_angle(original))
+
+        def done():
+            self.release()
+            self._finish(motion, original)
+
+        self._schedule(motion, now + 2 * SETTLE_TIME + hold_time, done)
+        return motion
 
     def move_to_angle_and_return(self, angle, hold_time=5):
         """
@@ -120,7 +358,7 @@ class ServoSG90:
         
         # Mover para o ângulo alvo
         duty_cycle = self._angle_to_duty_cycle(angle)
-        self.pwm.ChangeDutyCycle(duty_cycle)
+        self.pwm.set_duty(duty_cycle)
         time.sleep(0.5)  # Aguardar movimento completar
         self.current_angle = angle
 
@@ -133,21 +371,22 @@ class ServoSG90:
         
         # Retornar à posição original
         duty_cycle_original = self._angle_to_duty_cycle(original_angle)
-        self.pwm.ChangeDutyCycle(duty_cycle_original)
+        self.pwm.set_duty(duty_cycle_original)
         time.sleep(0.5)  # Aguardar retorno completar
         self.current_angle = original_angle
         
         # Reduzir duty cycle após retornar
-        self.pwm.ChangeDutyCycle(0)
+        self.pwm.set_duty(0)
         
         print("[Servo] Movimento concluído!")
 
     def cleanup(self):
         """Libera os recursos do servo"""
         try:
+            self.cancel()
             if self.pwm:
-                self.pwm.stop()
-            GPIO.cleanup(self.gpio_pin)
+                self.pwm.release()
+                self.pwm = None
             print(f"[Servo] Pino {self.gpio_pin} liberado")
         except Exception as e:
             print(f"[Servo] Erro ao liberar recursos: {e}")
@@ -0,0 +1,245 @@
+"""
+Séries temporais recentes por dispositivo, em memória
+
+Cada dispositivo tem um buffer circular de capacidade fixa (últimas
+TIMESERIES_HOURS horas no intervalo do publisher) em formato struct-of-arrays:
+um vetor de timestamps (float64) e uma linha float32 por métrica. A memória
+por dispositivo é alocada uma vez e não cresce.
+
+O consumer alimenta o store a cada heartbeat; os gráficos de janela recente
+são servidos daqui (recorte, downsampling e percentis vetorizados com NumPy)
+em vez de consultar device_status_history no SQLite.
+
+As taxas de rede (bytes/s) são derivadas dos contadores acumulados; uma
+reinicialização do contador (delta negativo) vira um ponto sem valor (NaN).
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    print("[Timeseries] NumPy não disponível - séries recentes desativadas")
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Métricas armazenadas (uma linha do buffer cada)
+FIELDS = ("cpu_temp_c", "cpu_percent", "mem_percent", "mem_used_mb", "rx_rate", "tx_rate")
+AGGREGATIONS = ("mean", "min", "max", "last")
+
+TIMESERIES_HOURS = float(os.getenv("TIMESERIES_HOURS", "6"))
+TIMESERIES_INTERVAL = float(os.getenv("TIMESERIES_INTERVAL", "1"))  # segundos entre heartbeats
+# Diferença máxima aceita entre o relógio da Raspberry e o do servidor
+MAX_CLOCK_SKEW = 300.0
+
+
+class DeviceSeries:
+    """Buffer circular de amostras de um dispositivo"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((len(FIELDS), capacity), np.nan, dtype=np.float32)
+        self.head = 0  # próxima posição de escrita
+        self.size = 0
+        self.dropped = 0  # amostras fora de ordem descartadas
+        self._last_net = None  # (ts, bytes_sent, bytes_recv)
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self.ts.nbytes + self.values.nbytes
+
+    def append(self, ts: float, sample: dict) -> bool:
+        """Adiciona uma amostra; descarta timestamps que não avançam (reentregas da fila)"""
+        with self._lock:
+            if self.size and ts <= self.ts[self.head - 1]:
+                self.dropped += 1
+                return False
+
+            rx_rate = tx_rate = None
+            sent, recv = sample.get("net_bytes_sent"), sample.get("net_bytes_recv")
+            if sent is not None and recv is not None:
+                if self._last_net is not None:
+                    last_ts, last_sent, last_recv = self._last_net
+                    elapsed = ts - last_ts
+                    if elapsed > 0 and sent >= last_sent and recv >= last_recv:
+                        tx_rate = (sent - last_sent) / elapsed
+                        rx_rate = (recv - last_recv) / elapsed
+                self._last_net = (ts, sent, recv)
+
+            row = dict(sample, rx_rate=rx_rate, tx_rate=tx_rate)
+            index = self.head
+            self.ts[index] = ts
+            for i, field in enumerate(FIELDS):
+                value = row.get(field)
+                self.values[i, index] = np.nan if value is None else value
+            self.head = (index + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            return True
+
+    def window(self, since: float, until: Optional[float] = None):
+        """Cópia ordenada (ts, values) das amostras em [since, until]"""
+        with self._lock:
+            # Dois trechos ordenados: [head:] (mais antigo, só com o buffer cheio) e [:head]
+            if self.size < self.capacity:
+                segments = ((0, self.size),)
+            else:
+                segments = ((self.head, self.capacity), (0, self.head))
+            # Busca binária em cada trecho: só a janela pedida é copiada
+            slices = []
+            for first, last in segments:
+                part = self.ts[first:last]
+                start = first + np.searchsorted(part, since, side="left")
+                end = last if until is None else first + np.searchsorted(part, until, side="right")
+                if end > start:
+                    slices.append((start, end))
+            if not slices:
+                return self.ts[:0].copy(), self.values[:, :0].copy()
+            if len(slices) == 1:
+                start, end = slices[0]
+                return self.ts[start:end].copy(), self.values[:, start:end].copy()
+            return (np.concatenate([self.ts[start:end] for start, end in slices]),
+                    np.concatenate([self.values[:, start:end] for start, end in slices], axis=1))
+
+
+def downsample(ts, values, step: float, aggregation: str = "mean"):
+    """
+    Agrupa as amostras em baldes de step segundos (vetorizado)
+
+    Returns:
+        (início de cada balde, valores agregados [métrica, balde]); baldes sem
+        amostras não aparecem e valores só com NaN continuam NaN
+    """
+    if len(ts) == 0:
+        return ts, values
+    buckets = np.floor(ts / step).astype(np.int64)
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    valid = ~np.isnan(values)
+    if aggregation == "last":
+        ends = np.append(starts[1:], len(ts)) - 1
+        result = values[:, ends]
+    elif aggregation == "mean":
+        sums = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=1)
+        counts = np.add.reduceat(valid, starts, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = (sums / counts).astype(np.float32)
+    else:
+        # fmin/fmax ignoram NaN enquanto houver algum valor no balde
+        reducer = np.fmin if aggregation == "min" else np.fmax
+        result = reducer.reduceat(values, starts, axis=1)
+    return buckets[starts] * step, result
+
+
+def percentiles(values, pcts: Iterable[float], fields: Iterable[str] = FIELDS) -> Dict[str, List[Optional[float]]]:
+    """Percentis por métrica ignorando NaN: {métrica: [p1, p2, ...]}"""
+    pcts = list(pcts)
+    result = {}
+    for field in fields:
+        row = values[FIELDS.index(field)]
+        row = row[~np.isnan(row)]
+        result[field] = to_list(np.percentile(row, pcts)) if len(row) else [None] * len(pcts)
+    return result
+
+
+def to_list(array, decimals: int = 3) -> List[Optional[float]]:
+    """Vetor NumPy -> lista JSON (NaN vira None)"""
+    rounded = np.round(np.asarray(array, dtype=np.float64), decimals)
+    return [None if value != value else value for value in rounded.tolist()]
+
+
+class TimeSeriesStore:
+    """Séries recentes de todos os dispositivos"""
+
+    def __init__(self, hours: float = TIMESERIES_HOURS, interval: float = TIMESERIES_INTERVAL):
+        self.hours = hours
+        self.capacity = max(1, int(hours * 3600 / interval))
+        self._series: Dict[str, DeviceSeries] = {}
+        self._lock = threading.Lock()
+        self.appended = 0
+
+    def series(self, raspberry_id: str) -> Optional[DeviceSeries]:
+        return self._series.get(raspberry_id)
+
+    def append(self, raspberry_id: str, ts: float, sample: dict) -> bool:
+        series = self._series.get(raspberry_id)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(raspberry_id, DeviceSeries(self.capacity))
+        added = series.append(ts, sample)
+        if added:
+            self.appended += 1
+        return added
+
+    def query(self, raspberry_id: str, minutes: float, step: Optional[float] = None,
+              aggregation: str = "mean", fields: Optional[Iterable[str]] = None,
+              pcts: Iterable[float] = (50, 95, 99)) -> Optional[dict]:
+        """
+        Janela recente de um dispositivo, com downsampling opcional
+
+        Percentis são calculados sobre as amostras brutas da janela, não sobre
+        os baldes. Retorna None se o dispositivo não tem amostras.
+        """
+        series = self._series.get(raspberry_id)
+        if series is None:
+            return None
+        now = time.time()
+        selected = [field for field in FIELDS if fields is None or field in fields]
+        ts, values = series.window(now - minutes * 60)
+        stats = percentiles(values, pcts, selected)
+        if step:
+            ts, values = downsample(ts, values, step, aggregation)
+        return {
+            "raspberry_id": raspberry_id,
+            "since": now - minutes * 60,
+            "step": step,
+            "aggregation": aggregation if step else None,
+            "points": len(ts),
+            "t": (np.round(ts * 1000).astype(np.int64)).tolist(),  # epoch em ms
+            "series": {field: to_list(values[FIELDS.index(field)]) for field in selected},
+            "percentiles": {"pcts": list(pcts), **stats},
+        }
+
+    def get_stats(self) -> dict:
+        devices = list(self._series.items())
+        return {
+            "numpy": NUMPY_AVAILABLE,
+            "hours": self.hours,
+            "capacity_per_device": self.capacity,
+            "devices": len(devices),
+            "appended": self.appended,
+            "bytes": sum(series.nbytes for _, series in devices),
+            "per_device": {
+                rid: {"samples": series.size, "dropped": series.dropped}
+                for rid, series in devices
+            },
+        }
+
+
+# Instância global (None sem NumPy)
+timeseries_store: Optional[TimeSeriesStore] = TimeSeriesStore() if NUMPY_AVAILABLE else None
+
+def sample_time(ts) -> float:
+    """Timestamp do publisher, ou o horário de chegada se ausente ou com o relógio muito fora"""
+    now = time.time()
+    if not isinstance(ts, (int, float)) or isinstance(ts, bool) or abs(ts - now) > MAX_CLOCK_SKEW:
+        return now
+    return float(ts)
+
+def record_sample(raspberry_id: str, ts, sample: dict):
+    """
+    Registra um heartbeat no store global sem deixar uma falha afetar o consumer
+
+    Usa o timestamp do publisher (as taxas de rede continuam corretas quando a
+    fila entrega um acúmulo de mensagens de uma vez); ver sample_time.
+    """
+    if timeseries_store is None or raspberry_id is None:
+        return
+    try:
+        timeseries_store.append(str(raspberry_id), sample_time(ts), sample)
+    except Exception as e:
+        print(f"[Timeseries] Falha ao registrar amostra de {raspberry_id}: {e}")
@@ -0,0 +1,101 @@
+"""
+Versões por recurso para GETs condicionais (ETag / If-None-Match)
+
+Cada recurso (lista de dispositivos, um dispositivo, tags, última leitura RFID
+de uma Raspberry) tem um contador em memória incrementado quando uma transação
+que o altera é confirmada. O ETag é derivado do contador, não do conteúdo:
+responder 304 custa uma consulta a um dicionário, sem tocar no banco.
+
+Os incrementos são coletados no flush e aplicados só após o commit. Assim um
+cliente nunca recebe o ETag novo junto com dados ainda não confirmados; um
+rollback apenas descarta os incrementos pendentes. A época (início do processo)
+entra no ETag para que versões de execuções anteriores nunca coincidam.
+
+Pressupõe que as escritas nessas tabelas passam pelo SessionLocal deste
+processo (API, consumer e pipeline RFID rodam todos aqui).
+"""
+
+import threading
+import time
+from urllib.parse import quote
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event
+
+from database import SessionLocal, DeviceStatus, RFIDTag, RFIDReadHistory
+
+
+class ResourceVersions:
+    """Contadores de versão por chave de recurso"""
+
+    def __init__(self):
+        self.epoch = format(int(time.time()), "x")
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+
+    def bump(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+    def version(self, key: str) -> int:
+        return self._versions.get(key, 0)
+
+    def etag(self, key: str, variant: Optional[str] = None) -> str:
+        """ETag fraco; variant distingue representações (ex.: filtros da query)"""
+        suffix = f"-{variant}" if variant else ""
+        # quote: ids vindos da URL podem ter aspas ou espaços, inválidos em um ETag
+        return 'W/"' + quote(f"{key}-{self.epoch}-{self.version(key)}{suffix}", safe=":-.*") + '"'
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._versions)
+
+
+resource_versions = ResourceVersions()
+
+
+def matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparação fraca do If-None-Match (lista separada por vírgulas ou *)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def _resource_keys(obj) -> Iterable[str]:
+    if isinstance(obj, DeviceStatus):
+        return ("devices", f"device:{obj.raspberry_id}")
+    if isinstance(obj, RFIDTag):
+        return ("tags",)
+    if isinstance(obj, RFIDReadHistory):
+        return (f"rfid_last:{obj.raspberry_id}",)
+    return ()
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect(session, flush_context):
+    pending = session.info.setdefault("version_bumps", set())
+    for objects in (session.new, session.dirty, session.deleted):
+        for obj in objects:
+            pending.update(_resource_keys(obj))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply(session):
+    pending = session.info.pop("version_bumps", None)
+    if pending:
+        resource_versions.bump(pending)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard(session, previous_transaction):
+    session.info.pop("version_bumps", None)